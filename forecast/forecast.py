@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Any
+from matrices.flow_matrix import FlowMatrix
+from matrices.registry import SectorRegistry, sector_registry as default_sector_registry
 
 class FlowBalancer:
     """
@@ -46,6 +49,10 @@ class FlowBalancer:
             After calling `balance()`, this attribute stores an intermediate
             DataFrame used in the balancing process. It is assigned inside
             `balance()` and may be inspected after balancing completes.
+
+        sector_registry (SectorRegistry):
+            The sector vocabulary used by `from_sector_array` and
+            `to_sector_array`. Defaults to the process-wide registry.
     """
     # TODO: Create typehint
     def __init__(
@@ -58,7 +65,8 @@ class FlowBalancer:
         total_row: str = "Totalj",
         decimal_places: int = 3,
         target_threshold: float = 1e-6,
-        max_iterations: int = 100
+        max_iterations: int = 100,
+        sector_registry: SectorRegistry = None
     ) -> None:
         """
         Initialize a FlowBalancer object.
@@ -82,6 +90,8 @@ class FlowBalancer:
                 if the DataFrame is balanced. Defaults to 1e-6.
             max_iterations (int, optional): Max number of balancing iterations.
                 Defaults to 100.
+            sector_registry (SectorRegistry, optional): The sector vocabulary
+                of aligned arrays. Defaults to the process-wide registry.
         """
         self.dataframe = dataframe
         self.monitoring_sectors = monitoring_sectors
@@ -92,11 +102,81 @@ class FlowBalancer:
         self.sector_col_name = sector_col_name
         self.total_col = total_col
         self.total_row = total_row
+        self.sector_registry = default_sector_registry if sector_registry is None else sector_registry
         
         
         # Initialize the dataframe with the 'verif_equi' column
         self.dataframe = self.generate_equilibrium_condition(self.dataframe)
 
+    @classmethod
+    def from_sector_array(
+        cls,
+        values: np.ndarray,
+        monitoring_sectors: List[str],
+        sector_correction: Dict[str, Dict[str, float]],
+        sector_col_name: str,
+        sectors: List[str] = None,
+        sector_registry: SectorRegistry = None,
+        total_col: str = "Totali",
+        total_row: str = "Totalj",
+        **kwargs: Any
+    ) -> "FlowBalancer":
+        """
+        Create a FlowBalancer from a sectors x sectors array aligned to the
+        sector registry, adding the total row and column.
+
+        Args:
+            values (np.ndarray): The flows, aligned to the sector registry.
+            monitoring_sectors (list of str): Sectors to be balanced.
+            sector_correction (dict): Correction factors for each year.
+            sector_col_name (str): Name of the sector label column.
+            sectors (list of str, optional): The sectors to keep, in order.
+                Defaults to the monitoring sectors and the sectors with a
+                non-zero flow, in registry order.
+            sector_registry (SectorRegistry, optional): The registry the
+                values are aligned to. Defaults to the process-wide registry.
+            total_col (str, optional): Name of the total purchases column.
+                Defaults to "Totali".
+            total_row (str, optional): Label of the total sales row.
+                Defaults to "Totalj".
+            **kwargs: Other arguments of FlowBalancer.
+
+        Returns:
+            FlowBalancer: The balancer over the selected sectors.
+        """
+        sector_registry = default_sector_registry if sector_registry is None else sector_registry
+        if sectors is None:
+            flows = sector_registry.to_pandas(values).to_numpy() != 0
+            active = flows.any(axis=0) | flows.any(axis=1) | sector_registry.sectors.isin(monitoring_sectors)
+            sectors = sector_registry.sectors[active].tolist()
+
+        flow_matrix = FlowMatrix(sector_registry.select(values, sectors), sectors, sectors)
+        dataframe = flow_matrix.with_totals(total_row, total_col).to_pandas()
+        dataframe = dataframe.rename_axis(sector_col_name).reset_index()
+
+        return cls(dataframe, monitoring_sectors, sector_correction, sector_col_name,
+                   total_col=total_col, total_row=total_row, sector_registry=sector_registry, **kwargs)
+
+    def to_sector_array(self, dataframe: pd.DataFrame = None) -> np.ndarray:
+        """
+        Lay the sector flows of a DataFrame, without totals, on the sector
+        registry axis.
+
+        Args:
+            dataframe (pd.DataFrame, optional): A DataFrame in the layout of
+                `dataframe`, such as the result of `balance()`. Defaults to
+                `dataframe`.
+
+        Returns:
+            np.ndarray: Array of shape (sectors, sectors) over the registry.
+        """
+        dataframe = self.dataframe if dataframe is None else dataframe
+
+        rows = dataframe[dataframe[self.sector_col_name] != self.total_row]
+        columns = dataframe.columns.difference([self.sector_col_name, self.total_col, self.total_row, "verif_equi"], sort=False)
+
+        return self.sector_registry.align(rows[columns].to_numpy(dtype=float), rows[self.sector_col_name], columns)
+
 
     def generate_fixed_dataframe(
         self,
@@ -121,39 +201,31 @@ class FlowBalancer:
         Returns:
             pd.DataFrame: The modified DataFrame with applied sector corrections
             and recalculated totals.
+
+        Raises:
+            KeyError: If a sector of the correction year is not a column of
+                the DataFrame.
         """
         # Remove the last row (total) and any existing columns for total_purchase or verif_equi
         temp_dataframe = dataframe.iloc[:-1].drop(
             columns=[total_purchase, "verif_equi"],
             errors="ignore"
         )
+        flow_matrix = FlowMatrix.from_pandas(temp_dataframe, label_columns=[sell_sector_name])
 
-        # Apply the sector corrections for the given year:
-        for key_sector, val_sector in self.sector_correction[correction_year].items():
-            temp_dataframe[key_sector] = temp_dataframe[key_sector] * val_sector
-
-        # Sum across rows for the appended final row
-        row_to_append = (
-            temp_dataframe.drop(columns=sell_sector_name)
-            .apply(sum, axis=0)
-            .to_frame()
-            .T
-        )
-
-        # Concatenate instead of using .append()
-        temp_dataframe = pd.concat([temp_dataframe, row_to_append], ignore_index=True)
-
-        # Fill in the last row's sell_sector_name column
-        temp_dataframe[sell_sector_name] = temp_dataframe[sell_sector_name].fillna(
-            total_sale
-        )
+        # Apply the sector corrections for the given year as one column scaling:
+        correction = pd.Series(self.sector_correction[correction_year], dtype=float)
+        unknown_sectors = correction.index.difference(flow_matrix.columns)
+        if not unknown_sectors.empty:
+            raise KeyError(f"Correction sectors not in the DataFrame: {', '.join(map(str, unknown_sectors))}")
+        factors = correction.reindex(flow_matrix.columns).fillna(1.0).to_numpy()
+        flow_matrix = flow_matrix * factors
 
-        # Now recalculate the total_purchase column
-        temp_dataframe[total_purchase] = temp_dataframe.drop(
-            columns=sell_sector_name
-        ).apply(sum, axis=1)
+        # Append the total sales row (column sums) and recalculate the total_purchase column
+        flow_matrix = flow_matrix.with_totals(total_sale, total_purchase)
 
-        return temp_dataframe
+        # Restore the original column order, labels first
+        return flow_matrix.to_pandas(index_as_columns=True)[temp_dataframe.columns.tolist() + [total_purchase]]
 
 
     def generate_equilibrium_condition(self, dataframe: pd.DataFrame) -> pd.DataFrame:
@@ -1,12 +1,18 @@
 import pandas as pd
 from typing import Dict, Any, Tuple, Union
+import numpy as np
+from matrices.flow_matrix import FlowMatrix
+from matrices.registry import SectorRegistry, sector_registry as default_sector_registry
 
 class InputOutputMatrix:
     def __init__(self,
                  value_forecast_data: Dict[str, Any],
                  quantity_forecast_data: Dict[str, Any],
                  parametric_matrix_quantity: Dict[str, pd.DataFrame],
-                 price_formation_matrix: Dict[str, pd.DataFrame]) -> None:
+                 price_formation_matrix: Dict[str, pd.DataFrame],
+                 sector_registry: SectorRegistry = None) -> None:
+        """The parametric and price formation matrices are DataFrames or arrays aligned to the sector registry."""
+        self.sector_registry = default_sector_registry if sector_registry is None else sector_registry
         self.value_forecast_data = value_forecast_data
         self.quantity_forecast_data = quantity_forecast_data
         self.parametric_matrix_quantity = parametric_matrix_quantity
@@ -16,15 +22,8 @@ class InputOutputMatrix:
                                   reference_value: int,
                                   parameter_matrix: pd.DataFrame) -> pd.DataFrame:
         """Generates a reference matrix by multiplying numeric values by a reference value."""
-        non_numeric_columns = parameter_matrix.select_dtypes(include='O').columns.tolist()
-        numeric_matrix = parameter_matrix.drop(columns=non_numeric_columns)
-        reference_matrix = reference_value * numeric_matrix
-
-        for column in non_numeric_columns:
-            reference_matrix[column] = parameter_matrix[column].values
-
-        column_order = non_numeric_columns + numeric_matrix.columns.tolist()
-        return reference_matrix[column_order]
+        reference_matrix = reference_value * self._to_flow_matrix(parameter_matrix)
+        return self._to_dataframe(reference_matrix, self._has_label_columns(parameter_matrix))
 
     def generate_iom(self,
                      product: str,
@@ -33,12 +32,60 @@ class InputOutputMatrix:
         value_forecast, quantity_forecast = self._retrieve_forecast(product, year)
         price_forecast = value_forecast / quantity_forecast
 
-        price_matrix = self.generate_reference_matrix(price_forecast, self.price_formation_matrix[product])
-        quantity_matrix = self.generate_reference_matrix(quantity_forecast, self.parametric_matrix_quantity[product])
+        price_matrix = price_forecast * self._to_flow_matrix(self.price_formation_matrix[product])
+        quantity_matrix = quantity_forecast * self._to_flow_matrix(self.parametric_matrix_quantity[product])
+
+        value_matrix = self._multiply_common_columns(price_matrix, quantity_matrix)
+
+        return self._to_dataframe(value_matrix, self._has_label_columns(self.price_formation_matrix[product]))
+
+    def generate_iom_array(self,
+                           product: str,
+                           year: Union[str, int]) -> np.ndarray:
+        """Generates the IOM for a specific product and year as an array aligned to the sector registry."""
+        value_forecast, quantity_forecast = self._retrieve_forecast(product, year)
+        price_forecast = value_forecast / quantity_forecast
+
+        price_matrix = price_forecast * self._to_flow_matrix(self.price_formation_matrix[product])
+        quantity_matrix = quantity_forecast * self._to_flow_matrix(self.parametric_matrix_quantity[product])
+
+        value_matrix = self._multiply_common_columns(price_matrix, quantity_matrix)
+        if value_matrix.index.nlevels > 1:
+            raise ValueError("The matrices must have a single label column to be aligned to the sector registry.")
 
-        value_matrix = self._calculate_value_matrix(price_matrix, quantity_matrix)
+        return self.sector_registry.align(value_matrix.values, value_matrix.index, value_matrix.columns)
 
-        return value_matrix
+    def _to_flow_matrix(self, matrix: Union[pd.DataFrame, np.ndarray]) -> FlowMatrix:
+        """Converts a DataFrame to a FlowMatrix, using its non-numeric columns as row labels.
+
+        An array is read as a sectors x sectors matrix aligned to the sector registry."""
+        if isinstance(matrix, np.ndarray):
+            return FlowMatrix.from_pandas(self.sector_registry.to_pandas(matrix))
+        non_numeric_columns = matrix.select_dtypes(include='O').columns.tolist()
+        return FlowMatrix.from_pandas(matrix, label_columns=non_numeric_columns)
+
+    def _has_label_columns(self, matrix: Union[pd.DataFrame, np.ndarray]) -> bool:
+        """Whether _to_flow_matrix lifts non-numeric columns of the matrix into its row labels."""
+        return isinstance(matrix, pd.DataFrame) and not matrix.select_dtypes(include='O').columns.empty
+
+    def _to_dataframe(self, matrix: FlowMatrix, has_label_columns: bool) -> pd.DataFrame:
+        """Converts a FlowMatrix back to a DataFrame, moving the row labels back to the leading columns
+        when they were lifted from the input's non-numeric columns, and keeping them as the index otherwise."""
+        return matrix.to_pandas(index_as_columns=has_label_columns)
+
+    def _multiply_common_columns(self,
+                                 price_matrix: FlowMatrix,
+                                 quantity_matrix: FlowMatrix) -> FlowMatrix:
+        """Multiplies the columns present in both matrices, keeping the price matrix labels.
+
+        Quantity rows are matched to price rows by label; price rows without a quantity row get NaN."""
+        common_columns = price_matrix.columns.intersection(quantity_matrix.columns)
+
+        rows = quantity_matrix.index.get_indexer(price_matrix.index)
+        quantity_values = quantity_matrix.select(columns=common_columns).values[rows]
+        quantity_values[rows < 0] = np.nan
+
+        return price_matrix.select(columns=common_columns) * quantity_values
 
     def _retrieve_forecast(self,
                            product: str,
@@ -57,23 +104,9 @@ class InputOutputMatrix:
                                 price_matrix: pd.DataFrame,
                                 quantity_matrix: pd.DataFrame) -> pd.DataFrame:
         """Calculates the value matrix based on price and quantity matrices."""
-        # Identify non-numeric columns separately
-        non_numeric_columns_price = price_matrix.select_dtypes(include='O').columns.tolist()
-        non_numeric_columns_quantity = quantity_matrix.select_dtypes(include='O').columns.tolist()
-
-        # Get only numeric columns
-        price_matrix_num = price_matrix.drop(columns=non_numeric_columns_price)
-        quantity_matrix_num = quantity_matrix.drop(columns=non_numeric_columns_quantity)
-
-        # Ensure columns are aligned for multiplication
-        common_columns = price_matrix_num.columns.intersection(quantity_matrix_num.columns)
-        value_matrix_num = price_matrix_num[common_columns] * quantity_matrix_num[common_columns]
-
-        # Add non-numeric columns back (prioritizing columns from the price matrix)
-        value_matrix = value_matrix_num.copy()
-        for column in non_numeric_columns_price:
-            value_matrix[column] = price_matrix[column].values
+        # Non-numeric columns become the row labels (prioritizing the ones from the price matrix)
+        value_matrix = self._multiply_common_columns(self._to_flow_matrix(price_matrix),
+                                                     self._to_flow_matrix(quantity_matrix))
 
         # Reorder columns: non-numeric first
-        column_order = non_numeric_columns_price + value_matrix_num.columns.tolist()
-        return value_matrix[column_order]
+        return self._to_dataframe(value_matrix, self._has_label_columns(price_matrix))
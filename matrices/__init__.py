@@ -1 +1,5 @@
-from .matrices import Matrices
\ No newline at end of file
+from .matrices import Matrices
+from .flow_matrix import FlowMatrix, SparseFlowMatrix
+from .chunked import ChunkedMatrices
+from .store import MatrixStore
+from .registry import SectorRegistry
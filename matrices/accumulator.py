@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+from matrices.quantile import GroupedQuantileSketch, QuantileSketch
+
+
+ROW_COUNT = "__rows__"
+
+
+class FlowAccumulator:
+    """
+    Running sums and counts of transactions, grouped by a set of key fields.
+
+    Each update groups a chunk of transactions and folds it into a compact
+    table with one row per observed key combination, so the memory used is
+    proportional to the number of groups, not to the number of transactions.
+    That table is not bounded: it grows with every new key combination, and
+    each fold regroups it whole, so an update costs time proportional to the
+    groups accumulated so far plus the rows of the chunk.
+    Sums and non-missing counts are enough to answer 'sum' and 'mean' for any
+    slice of the keys. When a quantile capacity is given, a grouped
+    QuantileSketch per field also answers 'median' and 'quantile'.
+
+    Attributes:
+        keys (list): The grouping fields, e.g. product, sectors and locations.
+        fields (list): The accumulated numeric fields.
+        table (pd.DataFrame): Indexed by the keys, with the sum and count of each field and the row count.
+        sketches (dict): {field: GroupedQuantileSketch}, empty if quantiles are not tracked.
+    """
+    def __init__(self, keys: list, fields: list, quantile_k: int = None) -> None:
+        """
+        Initializes an empty accumulator.
+
+        Args:
+            keys (list): The grouping fields.
+            fields (list): The numeric fields to accumulate.
+            quantile_k (int, optional): Capacity of the quantile sketches. Defaults to None (no quantiles).
+        """
+        self.keys = list(keys)
+        self.fields = list(fields)
+        self.quantile_k = quantile_k
+        self.table = pd.DataFrame(columns=self.fields + [self._count_column(field) for field in self.fields] + [ROW_COUNT],
+                                  index=pd.MultiIndex.from_arrays([[]] * len(self.keys), names=self.keys),
+                                  dtype=float)
+        self.sketches = {field: GroupedQuantileSketch(self.keys, field, k=quantile_k) for field in self.fields} if quantile_k else {}
+
+    @staticmethod
+    def _count_column(field: str) -> str:
+        return f"{field}__count"
+
+    @property
+    def empty(self) -> bool:
+        """Whether no transaction was accumulated yet."""
+        return self.table.empty
+
+    def update(self, df: pd.DataFrame) -> "FlowAccumulator":
+        """
+        Folds a chunk of transactions into the accumulator.
+
+        Rows with a missing key are kept in a group of their own, so they
+        still count when that key is summed over; aggregate only drops them
+        for the keys it filters or groups by.
+
+        Args:
+            df (pd.DataFrame): The chunk, with the key fields and the accumulated fields.
+
+        Returns:
+            FlowAccumulator: The accumulator itself.
+        """
+        if df.empty:
+            return self
+
+        grouped = df.groupby(self.keys, observed=True, sort=False, dropna=False)
+        partial = pd.concat([
+            grouped[self.fields].sum(),
+            grouped[self.fields].count().rename(columns=self._count_column),
+            grouped.size().rename(ROW_COUNT)
+        ], axis=1).astype(float)
+
+        self._fold(partial)
+
+        for sketch in self.sketches.values():
+            sketch.update(df)
+
+        return self
+
+    def merge(self, other: "FlowAccumulator") -> "FlowAccumulator":
+        """
+        Adds the groups of another accumulator with the same keys and fields.
+
+        Args:
+            other (FlowAccumulator): The accumulator to merge.
+
+        Returns:
+            FlowAccumulator: The accumulator itself.
+        """
+        if other.keys != self.keys or other.fields != self.fields:
+            raise ValueError("Only accumulators with the same keys and fields can be merged.")
+
+        self._fold(other.table)
+
+        for field, sketch in other.sketches.items():
+            if field in self.sketches:
+                self.sketches[field].merge(sketch)
+
+        return self
+
+    def _fold(self, partial: pd.DataFrame) -> None:
+        if self.table.empty:
+            self.table = partial.copy()
+            return
+
+        combined = pd.concat([self.table, partial])
+        self.table = combined.groupby(level=list(range(len(self.keys))), sort=False, dropna=False).sum()
+
+    def labels(self, key: str) -> pd.Index:
+        """Returns the labels of a key observed so far."""
+        return self.table.index.get_level_values(key).unique().dropna()
+
+    def aggregate(self,
+                  by: list,
+                  fields: list = None,
+                  aggregate_method: str = 'sum',
+                  quantile: float = 0.5,
+                  **filters) -> pd.DataFrame:
+        """
+        Aggregates a slice of the accumulated groups by some of the keys.
+
+        Args:
+            by (list): The keys kept in the result; the others are summed over.
+            fields (list, optional): The fields to return. Defaults to every accumulated field.
+            aggregate_method (str, optional): 'sum', 'mean', 'median' or 'quantile'. Defaults to 'sum'.
+            quantile (float, optional): The quantile computed by 'quantile'. Defaults to 0.5.
+            **filters: {key: label} equalities selecting the slice.
+
+        Returns:
+            pd.DataFrame: One row per group of ``by`` (sorted), with a column per field. Groups with a missing ``by`` key are dropped.
+
+        Raises:
+            ValueError: If the aggregation method is not valid or needs sketches that are not tracked.
+        """
+        fields = self.fields if fields is None else list(fields)
+        selected = self._select(filters)
+
+        if aggregate_method == 'median':
+            aggregate_method, quantile = 'quantile', 0.5
+
+        if aggregate_method in ('sum', 'mean'):
+            grouped = selected.groupby(level=by, sort=True)
+            result = grouped[fields].sum()
+            if aggregate_method == 'mean':
+                counts = grouped[[self._count_column(field) for field in fields]].sum()
+                result = result / counts.to_numpy()
+        elif aggregate_method == 'quantile':
+            result = self._quantiles(by, fields, quantile, filters)
+        else:
+            raise ValueError(f"The selected aggregate method was not valid: {aggregate_method}. Please select or 'sum' or 'mean' or 'median' or 'quantile'")
+
+        return result.reset_index()
+
+    def totals(self, by: list, **filters) -> pd.DataFrame:
+        """
+        Sums every accumulated column of a slice by some of the keys: the sums, the non-missing counts and the row count.
+
+        Args:
+            by (list): The keys kept in the result; the others are summed over.
+            **filters: {key: label} equalities selecting the slice.
+
+        Returns:
+            pd.DataFrame: One row per group of ``by`` (sorted), with the ``by`` keys as columns. Groups with a missing ``by`` key are dropped.
+        """
+        return self._select(filters).groupby(level=by, sort=True).sum().reset_index()
+
+    def _select(self, filters: dict) -> pd.DataFrame:
+        """Returns the accumulated groups matching {key: label} equalities."""
+        mask = np.ones(len(self.table), dtype=bool)
+        for key, label in filters.items():
+            mask &= (self.table.index.get_level_values(key) == label)
+        return self.table[mask]
+
+    def _quantiles(self, by: list, fields: list, quantile: float, filters: dict) -> pd.DataFrame:
+        """Merges the sketches of the selected groups by ``by`` and returns their quantiles."""
+        if not self.sketches:
+            raise ValueError("Quantiles are not tracked by this accumulator. Set a quantile error to use 'median' or 'quantile'.")
+
+        filter_positions = [(self.keys.index(key), label) for key, label in filters.items()]
+        by_positions = [self.keys.index(key) for key in by]
+
+        columns = {}
+        for field in fields:
+            merged = {}
+            for group, sketch in self.sketches[field].sketches.items():
+                if all(group[position] == label for position, label in filter_positions):
+                    target = tuple(group[position] for position in by_positions)
+                    if any(pd.isna(label) for label in target):
+                        continue
+                    merged.setdefault(target, QuantileSketch(self.quantile_k)).merge(sketch)
+            columns[field] = pd.Series({group: sketch.quantile(quantile) for group, sketch in merged.items()}, dtype=float)
+
+        result = pd.DataFrame(columns, columns=fields)
+        result.index = pd.MultiIndex.from_tuples(list(result.index), names=by)
+        return result.sort_index()
@@ -0,0 +1,231 @@
+import os
+from typing import Iterator
+
+import pandas as pd
+
+from matrices.accumulator import FlowAccumulator
+from matrices.matrices_local import MatricesLocal
+from matrices.quantile import QuantileSketch
+from matrices.registry import SectorRegistry
+
+
+DEFAULT_MEMORY_LIMIT = 256 * 2 ** 20
+
+# Rows read to estimate the memory of one row
+SAMPLE_ROWS = 1000
+
+# A chunk takes at most this fraction of the limit, the rest is left to the groupby of the chunk
+CHUNK_SHARE = 1 / 3
+
+
+def rows_per_chunk(sample: pd.DataFrame, memory_limit: int) -> int:
+    """
+    Returns how many rows like the ones of ``sample`` fit in a chunk under the memory limit.
+
+    Args:
+        sample (pd.DataFrame): A few rows of the file, with the selected columns.
+        memory_limit (int): The memory ceiling in bytes.
+
+    Returns:
+        int: The number of rows per chunk, at least 1.
+    """
+    row_bytes = sample.memory_usage(deep=True, index=False).sum() / max(len(sample), 1)
+    return max(1, int(memory_limit * CHUNK_SHARE / max(row_bytes, 1)))
+
+
+def read_chunks(path: str,
+                columns: list = None,
+                memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                label_columns: list = None) -> Iterator[pd.DataFrame]:
+    """
+    Reads a CSV or Parquet transaction file in chunks that fit in the memory limit.
+
+    Args:
+        path (str): Path to a .csv or .parquet file.
+        columns (list, optional): The columns to read. Defaults to every column.
+        memory_limit (int, optional): The memory ceiling in bytes. Defaults to 256 MiB.
+        label_columns (list, optional): Columns read as text in CSV files, so every chunk has the same labels.
+
+    Yields:
+        pd.DataFrame: The chunks, in file order.
+
+    Raises:
+        ValueError: If the file format is not supported.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+
+    if suffix == '.csv':
+        dtype = {column: str for column in label_columns or []}
+        sample = pd.read_csv(path, usecols=columns, dtype=dtype, nrows=SAMPLE_ROWS)
+        yield from pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=rows_per_chunk(sample, memory_limit))
+
+    elif suffix in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        sample = next(parquet_file.iter_batches(batch_size=SAMPLE_ROWS, columns=columns), None)
+        if sample is None:
+            return
+        batch_size = rows_per_chunk(sample.to_pandas(), memory_limit)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+    else:
+        raise ValueError(f"The file format '{suffix}' cannot be read in chunks. Use a .csv or .parquet file.")
+
+
+class ChunkedMatrices(MatricesLocal):
+    """
+    Matrices of transaction files larger than memory.
+
+    The file is read in chunks under a memory ceiling and folded into a
+    FlowAccumulator keyed by (product, seller sector, buyer sector, seller
+    location, buyer location). The transactions are never held in memory:
+    create_matrices, create_all_matrices, create_pricing_tensor,
+    create_location_tensor, build_product_matrices and the format methods
+    answer from the accumulated sums and counts, with the same results as
+    MatricesLocal on the whole table. create_level_matrices needs the sector
+    levels of each transaction and is not supported.
+
+    memory_limit only bounds the chunks read. The accumulator, and the
+    quantile sketches when quantile_error is set, keep one entry per key
+    combination seen, so they grow with the number of distinct keys and
+    not with the number of rows.
+    """
+    def __init__(
+        self,
+        table_path: str = None,
+        quantity_field: str = "Quantidade",
+        value_field: str = "Valor",
+        seller_sector_agent: str = "SetorDoAgenteQueVendeI",
+        buyer_sector_agent: str = "SetorDoAgenteQueCompraI",
+        seller_local_agent: str = "LocalDoAgenteQueVende",
+        buyer_local_agent: str = "LocalDoAgenteQueCompra",
+        field_product_name: str = 'Produto',
+        backend: str = "dense",
+        quantile_error: float = None,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        fields: list = None,
+        sector_registry: SectorRegistry = None
+    ):
+        """
+        Initializes the ChunkedMatrices object and reads table_path, if given.
+
+        Additional Parameters:
+        ----------
+        memory_limit (int, optional): Memory ceiling in bytes of each chunk read. Default is 256 MiB.
+        fields (list, optional): The numeric fields to accumulate. Default is the quantity and value fields.
+        """
+        super().__init__(
+            quantity_field=quantity_field,
+            value_field=value_field,
+            seller_sector_agent=seller_sector_agent,
+            buyer_sector_agent=buyer_sector_agent,
+            seller_local_agent=seller_local_agent,
+            buyer_local_agent=buyer_local_agent,
+            field_product_name=field_product_name,
+            backend=backend,
+            quantile_error=quantile_error,
+            sector_registry=sector_registry
+        )
+
+        self.memory_limit = memory_limit
+        self.fields = list(fields or [quantity_field, value_field])
+        self.accumulator = FlowAccumulator(
+            self._accumulator_keys(),
+            self.fields,
+            quantile_k=QuantileSketch.k_for_error(quantile_error) if quantile_error is not None else None
+        )
+
+        if table_path:
+            self.read(table_path)
+
+    def read(self, path: str) -> "ChunkedMatrices":
+        """
+        Reads a CSV or Parquet transaction file chunk by chunk into the accumulator.
+
+        Parameters:
+        ----------
+        path (str): Path to the file.
+
+        Returns:
+        ----------
+        (ChunkedMatrices): The object itself.
+        """
+        keys = self._accumulator_keys()
+        for chunk in read_chunks(path, keys + self.fields, self.memory_limit, label_columns=keys):
+            self.append_transactions(chunk)
+        return self
+
+    def append_transactions(self, df_new: pd.DataFrame) -> "ChunkedMatrices":
+        """
+        Folds a chunk of transactions into the accumulator. The rows themselves are not kept.
+
+        Parameters:
+        ----------
+        df_new (pd.DataFrame): The transactions, with the key fields and the accumulated fields.
+
+        Returns:
+        ----------
+        (ChunkedMatrices): The object itself.
+        """
+        if df_new.empty:
+            return self
+
+        self.accumulator.update(df_new)
+        self._invalidate_products(set(df_new[self.field_product_name].dropna().unique()))
+        return self
+
+    def refresh(self) -> "ChunkedMatrices":
+        """
+        Drops the cached matrices and the product graphs. There is no table to encode again: the accumulator holds the data.
+
+        Returns:
+        ----------
+        (ChunkedMatrices): The object itself.
+        """
+        self.clear_cache()
+        return self
+
+    def create_level_matrices(self, *args, **kwargs):
+        """
+        Not supported: the accumulator only keeps the first sector level.
+
+        Raises:
+        ----------
+        NotImplementedError: Always.
+        """
+        raise NotImplementedError("ChunkedMatrices does not keep the sector levels of the transactions, so it cannot create level "
+                                  "matrices. Use create_matrices, create_all_matrices, create_pricing_tensor, create_location_tensor, "
+                                  "build_product_matrices or the format methods, or MatricesLocal on a table held in memory.")
+
+    def build_product_matrices(self,
+                               products: list = None,
+                               n_workers: int = None,
+                               qtt_field: str = '',
+                               val_field: str = ''
+                               ) -> dict:
+        """
+        Builds the matrix set of several products from the accumulator, in-process.
+
+        The products default to every accumulated product, sorted.
+
+        Raises:
+        ----------
+        ValueError: If more than one worker is requested: there is no table to share with them.
+        KeyError: If a product is not found in the accumulated transactions.
+        """
+        if n_workers and n_workers > 1:
+            raise ValueError("ChunkedMatrices builds product matrices in-process only: the transactions are not held in memory "
+                             "to share with workers. Leave n_workers unset.")
+
+        if products is None:
+            products = sorted(self.accumulator.labels(self.field_product_name))
+
+        return super().build_product_matrices(products, None, qtt_field, val_field)
+
+    def _uses_accumulator(self, fields: list, aggregate_method: str) -> bool:
+        """
+        Every request on the class's table is answered by the accumulator, which raises if it cannot.
+        """
+        return True
@@ -1,5 +1,8 @@
 import pandas as pd
 import numpy as np
+from matrices.table_cache import read_table
+from matrices.cost_tensor import CostTensor
+from matrices.registry import SectorRegistry, sector_registry as default_sector_registry
 
 class CostMatrix:
     """
@@ -8,12 +11,17 @@ class CostMatrix:
     Attributes:
         params_matrix (pd.DataFrame): The matrix containing the parameter data.
         inputs_matrix (pd.DataFrame): The matrix containing the coefficient data.
+        sectors (pd.Index): The sector axis, from the sector columns of params_matrix.
+        items (pd.Index): The items with parameter rows, in order of first appearance.
+        sector_registry (SectorRegistry): The sector vocabulary aligned results are laid on.
     """
     def __init__(self, 
                  params_path: str = None,
                  inputs_path: str = None, 
                  params_matrix: pd.DataFrame = None,
-                 inputs_matrix: pd.DataFrame = None):
+                 inputs_matrix: pd.DataFrame = None,
+                 use_cache: bool = False,
+                 sector_registry: SectorRegistry = None):
         """
         Initializes the CostMatrix object.
 
@@ -22,25 +30,82 @@ class CostMatrix:
             inputs_path (str, optional): Path to the coefficient matrix file.
             params_matrix (pd.DataFrame, optional): DataFrame with parameter data.
             inputs_matrix (pd.DataFrame, optional): DataFrame with coefficient data.
+            use_cache (bool, optional): Whether to load the files through a columnar cache stored next to them.
+            sector_registry (SectorRegistry, optional): The sector vocabulary of aligned results. Defaults to the process-wide registry.
         
         Raises:
             ValueError: If neither params_path nor params_matrix is provided.
             ValueError: If neither inputs_path nor inputs_matrix is provided.
         """
+        self.sector_registry = default_sector_registry if sector_registry is None else sector_registry
+
         if params_matrix is not None:
             self.params_matrix = params_matrix
         elif params_path is not None:
-            self.params_matrix = pd.read_excel(params_path)
+            self.params_matrix = read_table(params_path, use_cache=use_cache)
         else:
             raise ValueError("You must provide either 'params_path' or 'params_matrix'.")
 
         if inputs_matrix is not None:
             self.inputs_matrix = inputs_matrix
         elif inputs_path is not None:
-            self.inputs_matrix = pd.read_excel(inputs_path)
+            self.inputs_matrix = read_table(inputs_path, use_cache=use_cache)
         else:
             raise ValueError("You must provide either 'inputs_path' or 'inputs_matrix'.")
 
+    @property
+    def params_matrix(self) -> pd.DataFrame:
+        """The parameter data. Setting it rebuilds the item index."""
+        return self._params_matrix
+
+    @params_matrix.setter
+    def params_matrix(self, params_matrix: pd.DataFrame) -> None:
+        self._params_matrix = params_matrix
+        self._index_params()
+        if getattr(self, '_inputs_matrix', None) is not None:
+            self._index_coefficients()
+
+    @property
+    def inputs_matrix(self) -> pd.DataFrame:
+        """The coefficient data. Setting it gathers the coefficients again."""
+        return self._inputs_matrix
+
+    @inputs_matrix.setter
+    def inputs_matrix(self, inputs_matrix: pd.DataFrame) -> None:
+        self._inputs_matrix = inputs_matrix
+        self._index_coefficients()
+
+    def _index_params(self) -> None:
+        """
+        Sorts the parameter rows into one contiguous block per item.
+
+        The rows of items[i] are _param_values[_block_starts[i]:_block_starts[i] + _block_lengths[i]],
+        and _sector_positions holds the position of their Sector on the sector axis (-1 when the
+        sector has no column). _duplicated flags the items with more than one row for the same Sector.
+        """
+        params = self._params_matrix
+        self.sectors = params.columns[2:]  # Columns starting from the first sector column
+
+        codes, self.items = pd.factorize(params['Item'])
+        order = np.flatnonzero(codes >= 0)  # Rows without an item are never costed
+        order = order[np.argsort(codes[order], kind='stable')]
+
+        self._param_values = params.iloc[:, 2:].to_numpy(dtype=float)[order]
+        self._sector_positions = self.sectors.get_indexer(params['Sector'])[order]
+        self._block_lengths = np.bincount(codes[order], minlength=len(self.items))
+        self._block_starts = np.cumsum(self._block_lengths) - self._block_lengths
+
+        duplicated = params.duplicated(['Item', 'Sector'], keep=False).to_numpy() & (codes >= 0)
+        self._duplicated = np.bincount(codes[duplicated], minlength=len(self.items)) > 0
+        self._item_costs = None
+
+    def _index_coefficients(self) -> None:
+        """Gathers the coefficient of every item into a vector aligned with items."""
+        self._has_coefficient = self.items.isin(self._inputs_matrix.columns)
+        self._coefficients = np.zeros(len(self.items))
+        self._coefficients[self._has_coefficient] = self._inputs_matrix[self.items[self._has_coefficient]].to_numpy(dtype=float)[0]
+        self._item_costs = None
+
     def calculate_cost(self, items: list, incidence: dict):
         """
         Calculates cost matrices for the specified items.
@@ -55,39 +120,136 @@ class CostMatrix:
         Notes:
             If an item is missing required data, it will be skipped, and a message will indicate which items were skipped.
         """
-        sectors = self.params_matrix.columns[2:]  # Columns starting from the first sector column
-        results = {}
-        skipped_items = []
+        return dict(self.calculate_cost_tensor(items, incidence))
 
-        for item in items:
-            if item not in incidence:
-                skipped_items.append(item)
-                continue
+    def calculate_cost_tensor(self, items: list, incidence: dict, aligned: bool = False) -> CostTensor:
+        """
+        Calculates the cost matrices of the specified items as one items x sectors x sectors tensor.
 
-            params = self.params_matrix[self.params_matrix['Item'] == item].iloc[:, 2:]
-            if params.empty:
-                skipped_items.append(item)
-                continue
+        The parameters of every item are scaled by their coefficient and
+        incidence in a single broadcast operation. The per-item DataFrames of
+        calculate_cost are only built when they are looked up in the result.
 
-            if item not in self.inputs_matrix.columns:
-                skipped_items.append(item)
-                continue
+        Args:
+            items (list): A list of items to calculate the cost matrices for.
+            incidence (dict): A dictionary containing incidence values for each item.
+            aligned (bool, optional): Whether to lay the matrices on the sector registry axis instead of the sectors of the object.
+
+        Returns:
+            CostTensor: The cost matrices, also usable as a {item: pd.DataFrame} mapping.
 
-            coef = self.inputs_matrix[item].values[0]
-            incidence_value = incidence[item]
+        Raises:
+            ValueError: If an item has more than one parameter row for the same Sector.
 
-            adjusted_params = params.values * coef * incidence_value
-            adjusted_square = pd.DataFrame(
-                adjusted_params,
-                index=self.params_matrix[self.params_matrix['Item'] == item]['Sector'].values,
-                columns=sectors
-            )
+        Notes:
+            If an item is missing required data, it will be skipped, and a message will indicate which items were skipped.
+        """
+        positions = self.items.get_indexer(list(dict.fromkeys(items)))
 
-            aligned_square = adjusted_square.reindex(index=sectors, columns=sectors, fill_value=0)
-            results[item] = aligned_square
+        kept, skipped_items = [], []
+        for item, position in zip(dict.fromkeys(items), positions):
+            if item in incidence and position >= 0 and self._has_coefficient[position]:
+                kept.append(position)
+            else:
+                skipped_items.append(item)
 
         if skipped_items:
             print(f"Warning: Unable to calculate cost for items: {', '.join(skipped_items)}")
 
-        return results
+        kept = np.array(kept, dtype=np.int64)
+        self._check_duplicates(kept)
+        item_positions, rows = self._block_rows(kept)
+        sector_positions = self._sector_positions[rows]
+        on_axis = sector_positions >= 0  # Rows of sectors outside the sector columns are dropped
+
+        incidence_values = np.array([incidence[item] for item in self.items[kept]], dtype=float)
+
+        item_positions, rows, sector_positions = item_positions[on_axis], rows[on_axis], sector_positions[on_axis]
+        adjusted_params = (self._param_values[rows]
+                           * self._coefficients[kept][item_positions, None]
+                           * incidence_values[item_positions, None])
+
+        values = np.zeros((len(kept), len(self.sectors), len(self.sectors)))
+        values[item_positions, sector_positions] = adjusted_params
+
+        if aligned:
+            return CostTensor(self.sector_registry.align(values, self.sectors), self.items[kept], self.sector_registry.sectors)
+
+        return CostTensor(values, self.items[kept], self.sectors)
+
+    def _check_duplicates(self, positions: np.ndarray) -> None:
+        """Raises a ValueError if one of the items at the given positions has two rows for the same Sector."""
+        duplicated = positions[self._duplicated[positions]]
+        if len(duplicated):
+            raise ValueError(f"Items with more than one parameter row for the same Sector: {', '.join(map(str, self.items[duplicated]))}")
+
+    def _block_rows(self, positions: np.ndarray) -> tuple:
+        """
+        Returns, for the items at the given positions, the parameter rows of their blocks.
+
+        Returns:
+            tuple: The index in positions of each row and the row numbers in _param_values.
+        """
+        lengths = self._block_lengths[positions]
+        owners = np.repeat(np.arange(len(positions)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return owners, self._block_starts[positions][owners] + offsets
+
+    def _unit_costs(self) -> np.ndarray:
+        """
+        Returns the items x sectors x sectors tensor of params x coefficient, the cost of every item at incidence 1.
+
+        It is built on first use and kept until params_matrix or inputs_matrix is set again.
+        Items without a coefficient hold zeros. Items with two rows for the same Sector are
+        stored but never read, since _check_duplicates rejects them first.
+        """
+        if self._item_costs is None:
+            positions = np.arange(len(self.items))
+            item_positions, rows = self._block_rows(positions)
+            sector_positions = self._sector_positions[rows]
+            on_axis = sector_positions >= 0
+
+            item_positions, rows, sector_positions = item_positions[on_axis], rows[on_axis], sector_positions[on_axis]
+            self._item_costs = np.zeros((len(self.items), len(self.sectors), len(self.sectors)))
+            self._item_costs[item_positions, sector_positions] = self._param_values[rows] * self._coefficients[item_positions, None]
+
+        return self._item_costs
+
+    def calculate_total_cost(self, items: list, incidence: np.ndarray, aligned: bool = False) -> np.ndarray:
+        """
+        Calculates the total cost matrix, summed over the items, of several incidence scenarios.
+
+        Every scenario is one contraction of its incidence column with the
+        precomputed cost tensor of the items; no per-item matrix is built.
+
+        Args:
+            items (list): The items, in the order of the rows of incidence.
+            incidence (np.ndarray): Array of shape (items, scenarios) with the incidence value of each item in each scenario.
+            aligned (bool, optional): Whether to lay the totals on the sector registry axis instead of the sectors of the object.
+
+        Returns:
+            np.ndarray: Array of shape (scenarios, sectors, sectors), on the sectors axis of the object or of the registry.
+
+        Raises:
+            ValueError: If incidence is not a 2-dimensional array with one row per item.
+            ValueError: If an item has more than one parameter row for the same Sector.
+
+        Notes:
+            If an item is missing required data, it will be skipped, and a message will indicate which items were skipped.
+        """
+        incidence = np.asarray(incidence, dtype=float)
+        if incidence.ndim != 2 or incidence.shape[0] != len(items):
+            raise ValueError(f"The incidence must have shape (items, scenarios) with {len(items)} items, got {incidence.shape}.")
+
+        positions = self.items.get_indexer(items)
+        available = positions >= 0
+        available[available] = self._has_coefficient[positions[available]]
+
+        if not available.all():
+            skipped_items = [str(item) for item, kept in zip(items, available) if not kept]
+            print(f"Warning: Unable to calculate cost for items: {', '.join(skipped_items)}")
+
+        self._check_duplicates(positions[available])
+        totals = np.einsum('is,ijk->sjk', incidence[available], self._unit_costs()[positions[available]], optimize=True)
 
+        return self.sector_registry.align(totals, self.sectors) if aligned else totals
@@ -0,0 +1,76 @@
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+class CostTensor(Mapping):
+    """
+    The adjusted cost matrices of several items stacked on a shared sector axis.
+
+    ``values[i]`` is the sectors x sectors cost matrix of ``items[i]``. The
+    tensor is also a read-only mapping {item: pd.DataFrame}, like the result
+    of CostMatrix.calculate_cost, whose DataFrames are only built when an
+    item is looked up.
+
+    Attributes:
+        values (np.ndarray): Array of shape (items, sectors, sectors).
+        items (pd.Index): The item axis.
+        sectors (pd.Index): The sector axis, shared by rows and columns.
+    """
+    def __init__(self, values: np.ndarray, items: pd.Index, sectors: pd.Index) -> None:
+        """
+        Initializes the CostTensor object.
+
+        Args:
+            values (np.ndarray): Array of shape (items, sectors, sectors).
+            items (pd.Index): The item axis.
+            sectors (pd.Index): The sector axis.
+
+        Raises:
+            ValueError: If the shape of values does not match the axes.
+        """
+        self.values = np.asarray(values, dtype=float)
+        self.items = pd.Index(items)
+        self.sectors = pd.Index(sectors)
+
+        if self.values.shape != (len(self.items), len(self.sectors), len(self.sectors)):
+            raise ValueError(f"The values shape {self.values.shape} does not match {len(self.items)} items and {len(self.sectors)} sectors.")
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    def matrix(self, item: str) -> pd.DataFrame:
+        """
+        Returns the cost matrix of an item.
+
+        Args:
+            item (str): The item.
+
+        Returns:
+            pd.DataFrame: The sectors x sectors matrix.
+
+        Raises:
+            KeyError: If the item is not in the tensor.
+        """
+        return pd.DataFrame(self.values[self.items.get_loc(item)], index=self.sectors, columns=self.sectors)
+
+    def total(self) -> pd.DataFrame:
+        """Returns the sum of the cost matrices of every item."""
+        return pd.DataFrame(self.values.sum(axis=0), index=self.sectors, columns=self.sectors)
+
+    def __getitem__(self, item: str) -> pd.DataFrame:
+        return self.matrix(item)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item) -> bool:
+        return item in self.items
+
+    def __repr__(self) -> str:
+        return f"CostTensor(items={len(self.items)}, sectors={len(self.sectors)})"
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from matrices.flow_matrix import FlowMatrix
+
+
+class FieldTensor:
+    """
+    The sectors x sectors matrices of several fields of one selection, stacked on a shared sector axis.
+
+    ``values[f]`` is the matrix of ``fields[f]``, without totals. Every
+    field comes from the same aggregation, so they share their labels and
+    can be combined directly, e.g. ``values[1] / values[0]`` for the
+    implicit price. The totals of each field are ``sold`` (row sums) and
+    ``bought`` (column sums).
+
+    Attributes:
+        values (np.ndarray): Array of shape (fields, sectors, sectors).
+        fields (pd.Index): The field axis.
+        sectors (pd.Index): The sector axis, shared by sellers and buyers.
+    """
+    def __init__(self,
+                 values: np.ndarray,
+                 fields: pd.Index,
+                 sectors: pd.Index,
+                 seller_sector_agent: str = None,
+                 buyer_sector_agent: str = None) -> None:
+        """
+        Initializes the FieldTensor object.
+
+        Args:
+            values (np.ndarray): Array of shape (fields, sectors, sectors).
+            fields (pd.Index): The field axis.
+            sectors (pd.Index): The sector axis.
+            seller_sector_agent (str, optional): Name of the seller sector axis.
+            buyer_sector_agent (str, optional): Name of the buyer sector axis.
+
+        Raises:
+            ValueError: If the shape of values does not match the axes.
+        """
+        self.values = np.asarray(values, dtype=float)
+        self.fields = pd.Index(fields)
+        self.sectors = pd.Index(sectors)
+        self.seller_sector_agent = seller_sector_agent
+        self.buyer_sector_agent = buyer_sector_agent
+
+        if self.values.shape != (len(self.fields), len(self.sectors), len(self.sectors)):
+            raise ValueError(f"The values shape {self.values.shape} does not match {len(self.fields)} fields and {len(self.sectors)} sectors.")
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    @property
+    def sold(self) -> np.ndarray:
+        """Array of shape (fields, sectors) with the total sold by each seller sector."""
+        return self.values.sum(axis=2)
+
+    @property
+    def bought(self) -> np.ndarray:
+        """Array of shape (fields, sectors) with the total bought by each buyer sector."""
+        return self.values.sum(axis=1)
+
+    def matrix(self, field: str, insert_total: bool = True) -> pd.DataFrame:
+        """
+        Returns the matrix of a field, like create_matrices with that field as matrice_type.
+
+        Args:
+            field (str): The field.
+            insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+
+        Returns:
+            pd.DataFrame: The sectors x sectors matrix.
+
+        Raises:
+            KeyError: If the field is not in the tensor.
+        """
+        matrix = FlowMatrix(self.values[self.fields.get_loc(field)],
+                            self.sectors.rename(self.seller_sector_agent),
+                            self.sectors.rename(self.buyer_sector_agent))
+        if insert_total:
+            matrix = matrix.with_totals(f"Total{field}Bought", f"Total{field}Sold")
+        return matrix.to_pandas()
+
+    def __repr__(self) -> str:
+        return f"FieldTensor(fields={list(self.fields)}, sectors={len(self.sectors)})"
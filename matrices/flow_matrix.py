@@ -0,0 +1,329 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class FlowMatrix:
+    """
+    A dense matrix stored as a contiguous float NumPy array with immutable row and column labels.
+
+    Used internally by the matrix, forecast and input-output engines instead
+    of DataFrames mixing label and numeric columns: arithmetic works on the
+    raw array and the labels are only attached again by ``to_pandas()``.
+
+    Attributes:
+        values (np.ndarray): The C-contiguous float64 values.
+        index (pd.Index): The row labels.
+        columns (pd.Index): The column labels.
+    """
+    def __init__(self, values, index=None, columns=None) -> None:
+        """
+        Initializes the FlowMatrix object.
+
+        Args:
+            values (array-like): 2-D values, converted to a contiguous float64 array.
+            index (list-like, optional): The row labels. Defaults to a RangeIndex.
+            columns (list-like, optional): The column labels. Defaults to a RangeIndex.
+
+        Raises:
+            ValueError: If the values are not 2-D or the labels do not match their shape.
+        """
+        self.values = np.ascontiguousarray(values, dtype=float)
+        if self.values.ndim != 2:
+            raise ValueError(f"A FlowMatrix must be 2-D, got {self.values.ndim} dimensions.")
+
+        self.index = pd.RangeIndex(self.values.shape[0]) if index is None else pd.Index(index)
+        self.columns = pd.RangeIndex(self.values.shape[1]) if columns is None else pd.Index(columns)
+
+        if self.values.shape != (len(self.index), len(self.columns)):
+            raise ValueError(f"Labels of shape {(len(self.index), len(self.columns))} do not match values of shape {self.values.shape}.")
+
+    @classmethod
+    def from_pandas(cls, dataframe: pd.DataFrame, label_columns: list = None) -> "FlowMatrix":
+        """
+        Builds a FlowMatrix from a DataFrame.
+
+        Args:
+            dataframe (pd.DataFrame): The source DataFrame.
+            label_columns (list, optional): Columns holding the row labels. They
+                become the index; the remaining columns must be numeric. By
+                default the DataFrame index is used as row labels.
+
+        Returns:
+            FlowMatrix: The matrix.
+        """
+        if label_columns:
+            dataframe = dataframe.set_index(label_columns)
+        return cls(dataframe.to_numpy(dtype=float), dataframe.index, dataframe.columns)
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    @property
+    def empty(self) -> bool:
+        return 0 in self.values.shape
+
+    def row_totals(self) -> np.ndarray:
+        """Returns the sum of each row."""
+        return self.values.sum(axis=1)
+
+    def column_totals(self) -> np.ndarray:
+        """Returns the sum of each column."""
+        return self.values.sum(axis=0)
+
+    def with_totals(self, row_label: str, column_label: str) -> "FlowMatrix":
+        """
+        Appends a totals row (column sums) and a totals column (row sums, including the totals row).
+
+        Args:
+            row_label (str): The label of the totals row.
+            column_label (str): The label of the totals column.
+
+        Returns:
+            FlowMatrix: The matrix with the totals.
+        """
+        rows, cols = self.shape
+        values = np.empty((rows + 1, cols + 1))
+        values[:rows, :cols] = self.values
+        values[rows, :cols] = self.column_totals()
+        values[:, cols] = values[:, :cols].sum(axis=1)
+
+        return FlowMatrix(values,
+                          self.index.append(pd.Index([row_label])).set_names(self.index.names),
+                          self.columns.append(pd.Index([column_label])).rename(self.columns.name))
+
+    def select(self, index=None, columns=None) -> "FlowMatrix":
+        """
+        Returns the sub-matrix of the given row and/or column labels.
+
+        Args:
+            index (list-like, optional): The row labels to keep, in order. Defaults to all rows.
+            columns (list-like, optional): The column labels to keep, in order. Defaults to all columns.
+
+        Returns:
+            FlowMatrix: The sub-matrix.
+        """
+        rows = slice(None) if index is None else self.index.get_indexer(index)
+        cols = slice(None) if columns is None else self.columns.get_indexer(columns)
+
+        if (index is not None and (rows < 0).any()) or (columns is not None and (cols < 0).any()):
+            raise KeyError("Some of the selected labels are not in the matrix.")
+
+        return FlowMatrix(self.values[rows][:, cols],
+                          self.index if index is None else self.index[rows],
+                          self.columns if columns is None else self.columns[cols])
+
+    def rename(self, index: dict = None, columns: dict = None) -> "FlowMatrix":
+        """Returns a matrix with the same values and relabeled rows and/or columns."""
+        return FlowMatrix(
+            self.values,
+            self.index.map(lambda label: index.get(label, label)) if index else self.index,
+            self.columns.map(lambda label: columns.get(label, label)) if columns else self.columns
+        )
+
+    def fillna(self, value: float = 0) -> "FlowMatrix":
+        """Returns a matrix with the NaN cells replaced by ``value``."""
+        return FlowMatrix(np.where(np.isnan(self.values), value, self.values), self.index, self.columns)
+
+    def __getitem__(self, column) -> pd.Series:
+        """Returns a column as a Series, like DataFrame column access."""
+        return pd.Series(self.values[:, self.columns.get_loc(column)], index=self.index, name=column)
+
+    def row(self, position: int) -> pd.Series:
+        """Returns the row at ``position`` as a Series."""
+        return pd.Series(self.values[position], index=self.columns, name=self.index[position])
+
+    def _operand(self, other):
+        if isinstance(other, FlowMatrix):
+            if not (self.index.equals(other.index) and self.columns.equals(other.columns)):
+                raise ValueError("Element-wise operations require matrices with the same labels.")
+            return other.values
+        return other
+
+    def _apply(self, operation, other) -> "FlowMatrix":
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return FlowMatrix(operation(self.values, self._operand(other)), self.index, self.columns)
+
+    def __add__(self, other) -> "FlowMatrix":
+        return self._apply(np.add, other)
+
+    def __sub__(self, other) -> "FlowMatrix":
+        return self._apply(np.subtract, other)
+
+    def __mul__(self, other) -> "FlowMatrix":
+        return self._apply(np.multiply, other)
+
+    def __truediv__(self, other) -> "FlowMatrix":
+        return self._apply(np.true_divide, other)
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    def to_pandas(self, index_as_columns: bool = False) -> pd.DataFrame:
+        """
+        Converts to a labeled DataFrame.
+
+        Args:
+            index_as_columns (bool, optional): Whether to move the row labels to
+                leading columns, as in DataFrames built with label columns. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The DataFrame.
+        """
+        dataframe = pd.DataFrame(self.values.copy(), index=self.index, columns=self.columns)
+        if index_as_columns:
+            dataframe = dataframe.reset_index()
+        return dataframe
+
+    def __repr__(self) -> str:
+        return f"FlowMatrix(shape={self.shape})"
+
+
+class SparseFlowMatrix:
+    """
+    A scipy.sparse CSR matrix labeled by its rows and columns.
+
+    Used by the ``backend="sparse"`` mode of Matrices for sector vocabularies
+    where the dense matrix would be mostly zeros. Only the operations needed
+    by the matrix formatting methods are provided; ``to_pandas()`` converts
+    to the dense DataFrame returned by the default backend.
+
+    Attributes:
+        matrix (sp.csr_matrix): The sparse values.
+        index (pd.Index): The row labels.
+        columns (pd.Index): The column labels.
+    """
+    def __init__(self, matrix, index, columns) -> None:
+        """
+        Initializes the SparseFlowMatrix object.
+
+        Args:
+            matrix: Any scipy.sparse matrix or 2-D array, converted to CSR.
+            index (list-like): The row labels.
+            columns (list-like): The column labels.
+
+        Raises:
+            ValueError: If the labels do not match the matrix shape.
+        """
+        self.matrix = sp.csr_matrix(matrix, dtype=float)
+        self.index = pd.Index(index)
+        self.columns = pd.Index(columns)
+
+        if self.matrix.shape != (len(self.index), len(self.columns)):
+            raise ValueError(f"Labels of shape {(len(self.index), len(self.columns))} do not match a matrix of shape {self.matrix.shape}.")
+
+    @classmethod
+    def from_coordinates(cls, rows, cols, values, labels) -> "SparseFlowMatrix":
+        """
+        Builds a square matrix from (row position, column position, value) triplets.
+
+        Args:
+            rows (array-like): Row positions on ``labels``.
+            cols (array-like): Column positions on ``labels``.
+            values (array-like): The values, NaN being stored as zero.
+            labels (list-like): The labels of both axes.
+
+        Returns:
+            SparseFlowMatrix: The labeled matrix.
+        """
+        values = np.nan_to_num(np.asarray(values, dtype=float), nan=0)
+        matrix = sp.coo_matrix((values, (rows, cols)), shape=(len(labels), len(labels))).tocsr()
+        matrix.eliminate_zeros()
+        return cls(matrix, labels, labels)
+
+    @property
+    def shape(self) -> tuple:
+        return self.matrix.shape
+
+    @property
+    def nnz(self) -> int:
+        return self.matrix.nnz
+
+    @property
+    def empty(self) -> bool:
+        return 0 in self.matrix.shape
+
+    def with_totals(self, row_label: str, column_label: str) -> "SparseFlowMatrix":
+        """
+        Appends a totals row (column sums) and a totals column (row sums, including the totals row).
+
+        Args:
+            row_label (str): The label of the totals row.
+            column_label (str): The label of the totals column.
+
+        Returns:
+            SparseFlowMatrix: The matrix with the totals.
+        """
+        column_totals = np.asarray(self.matrix.sum(axis=0), dtype=float).ravel()
+        row_totals = np.asarray(self.matrix.sum(axis=1), dtype=float).ravel()
+
+        top = sp.hstack([self.matrix, sp.csr_matrix(row_totals.reshape(-1, 1))])
+        bottom = sp.csr_matrix(np.append(column_totals, column_totals.sum()).reshape(1, -1))
+
+        matrix = sp.vstack([top, bottom], format='csr')
+        matrix.eliminate_zeros()
+
+        return SparseFlowMatrix(matrix,
+                                self.index.append(pd.Index([row_label])).rename(self.index.name),
+                                self.columns.append(pd.Index([column_label])).rename(self.columns.name))
+
+    def rename(self, index: dict = None, columns: dict = None) -> "SparseFlowMatrix":
+        """Returns a matrix with the same values and relabeled rows and/or columns."""
+        return SparseFlowMatrix(
+            self.matrix,
+            self.index.map(lambda label: index.get(label, label)) if index else self.index,
+            self.columns.map(lambda label: columns.get(label, label)) if columns else self.columns
+        )
+
+    def fillna(self, value: float = 0) -> "SparseFlowMatrix":
+        """Returns a matrix with the stored NaN cells replaced by ``value``."""
+        matrix = self.matrix.copy()
+        matrix.data = np.where(np.isnan(matrix.data), value, matrix.data)
+        matrix.eliminate_zeros()
+        return SparseFlowMatrix(matrix, self.index, self.columns)
+
+    def copy(self) -> "SparseFlowMatrix":
+        """Returns a matrix with a copy of the values, sharing nothing that can be edited in place."""
+        return SparseFlowMatrix(self.matrix.copy(), self.index, self.columns)
+
+    def __getitem__(self, column) -> pd.Series:
+        """Returns a column as a dense Series, like DataFrame column access."""
+        position = self.columns.get_loc(column)
+        return pd.Series(self.matrix[:, position].toarray().ravel(), index=self.index, name=column)
+
+    def row(self, position: int) -> pd.Series:
+        """Returns the row at ``position`` as a dense Series."""
+        return pd.Series(self.matrix[position].toarray().ravel(), index=self.columns, name=self.index[position])
+
+    def __truediv__(self, other) -> "SparseFlowMatrix":
+        """
+        Divides by a scalar, or element-wise by a matrix with the same labels.
+
+        The element-wise division is only evaluated on the nonzero cells of
+        this matrix, which matches the dense ``(a / b).fillna(0)``: a zero
+        numerator gives zero and a zero denominator gives an infinity.
+        """
+        if isinstance(other, SparseFlowMatrix):
+            if not (self.index.equals(other.index) and self.columns.equals(other.columns)):
+                raise ValueError("Element-wise division requires matrices with the same labels.")
+
+            numerator = self.matrix.tocoo()
+            if numerator.nnz == 0:
+                return SparseFlowMatrix(sp.csr_matrix(self.shape), self.index, self.columns)
+
+            denominator = np.asarray(other.matrix[numerator.row, numerator.col], dtype=float).ravel()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = numerator.data / denominator
+
+            return SparseFlowMatrix(sp.coo_matrix((values, (numerator.row, numerator.col)), shape=self.shape), self.index, self.columns)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return SparseFlowMatrix(self.matrix / other, self.index, self.columns)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Converts to a dense labeled DataFrame."""
+        return pd.DataFrame(self.matrix.toarray(), index=self.index, columns=self.columns)
+
+    def __repr__(self) -> str:
+        return f"SparseFlowMatrix(shape={self.shape}, nnz={self.nnz})"
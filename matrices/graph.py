@@ -0,0 +1,108 @@
+from collections import Counter
+
+
+class MatrixGraph:
+    """
+    Lazy dependency graph of matrices.
+
+    Each node is computed from the values of its dependencies on first
+    access and the value is kept for every later consumer. Invalidating a
+    node marks it and everything that depends on it as dirty, so they are
+    recomputed on their next access while the other nodes are kept. A graph
+    given a version function is also marked dirty as a whole whenever the
+    version of its data changes.
+
+    Attributes:
+        computations (Counter): How many times each node was computed.
+    """
+    def __init__(self, version=None) -> None:
+        """
+        Initializes an empty graph.
+
+        Args:
+            version (callable, optional): Returns the version of the data the nodes are computed from.
+                When it changes, every node is marked dirty on the next access.
+        """
+        self._version = version
+        self._seen_version = version() if version is not None else None
+        self._compute = {}
+        self._dependencies = {}
+        self._dependents = {}
+        self._values = {}
+        self.computations = Counter()
+
+    def add(self, name: str, compute, dependencies: tuple = ()) -> "MatrixGraph":
+        """
+        Adds a node.
+
+        Args:
+            name (str): The node name.
+            compute (callable): Function receiving the values of the dependencies, in order.
+            dependencies (tuple, optional): The names of the nodes it depends on, already in the graph.
+
+        Returns:
+            MatrixGraph: The graph itself.
+
+        Raises:
+            KeyError: If a dependency is not in the graph.
+        """
+        for dependency in dependencies:
+            if dependency not in self._compute:
+                raise KeyError(f"The dependency {dependency} of {name} is not in the graph.")
+            self._dependents[dependency].add(name)
+
+        self._compute[name] = compute
+        self._dependencies[name] = tuple(dependencies)
+        self._dependents.setdefault(name, set())
+        return self
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._compute
+
+    def __getitem__(self, name: str):
+        """
+        Returns the value of a node, computing it (and its dirty dependencies) if needed.
+
+        Raises:
+            KeyError: If the node is not in the graph.
+        """
+        if name not in self._compute:
+            raise KeyError(f"The node {name} is not in the graph.")
+
+        self._check_version()
+        if name not in self._values:
+            arguments = [self[dependency] for dependency in self._dependencies[name]]
+            self._values[name] = self._compute[name](*arguments)
+            self.computations[name] += 1
+
+        return self._values[name]
+
+    def is_dirty(self, name: str) -> bool:
+        """Whether the node will be computed on its next access."""
+        self._check_version()
+        return name not in self._values
+
+    def _check_version(self) -> None:
+        """Marks every node dirty if the version of the data changed since the values were computed."""
+        if self._version is not None:
+            version = self._version()
+            if version != self._seen_version:
+                self._values.clear()
+                self._seen_version = version
+
+    def invalidate(self, name: str = None) -> None:
+        """
+        Marks a node and all its dependents as dirty. Without a name, every node is marked.
+
+        Args:
+            name (str, optional): The node whose inputs changed.
+        """
+        if name is None:
+            self._values.clear()
+            return
+
+        pending = [name]
+        while pending:
+            node = pending.pop()
+            self._values.pop(node, None)
+            pending.extend(self._dependents[node])
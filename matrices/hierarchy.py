@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class SectorHierarchy:
+    """
+    Sector nodes at the finest level, as tuples of their labels at every level.
+
+    A node is the (level I, level II, level III) tuple of a transaction side.
+    The tuple, not the level III label alone, is the finest node because
+    coarser labels are not a function of the finer ones (e.g. 'n' is used as
+    level III under many level I sectors). The indicator matrix C of a level
+    has a 1 at (label, node) when the node carries that label, so a matrix M
+    over the nodes rolls up to the level as C·M·Cᵀ.
+
+    Attributes:
+        nodes (list): The finest nodes, as tuples.
+    """
+    def __init__(self, nodes: list) -> None:
+        """
+        Initializes the hierarchy from its finest nodes.
+
+        Args:
+            nodes (list): The finest nodes, as tuples of the same length.
+        """
+        self.nodes = list(nodes)
+        self.depth = len(self.nodes[0]) if self.nodes else 0
+        self._positions = {node: position for position, node in enumerate(self.nodes)}
+
+    def positions(self, nodes: list) -> np.ndarray:
+        """Returns the position of each node."""
+        return np.fromiter((self._positions[node] for node in nodes), dtype=np.int64, count=len(nodes))
+
+    def indicator(self, level: int) -> tuple:
+        """
+        Returns the labels of a level and its indicator matrix.
+
+        Nodes whose label is missing at the level are left out (a zero column).
+
+        Args:
+            level (int): The level, 0 being the coarsest.
+
+        Returns:
+            tuple: The sorted labels (pd.Index) and the CSR matrix of shape (labels, nodes).
+        """
+        node_labels = [node[level] for node in self.nodes]
+        labels = pd.Index(sorted({label for label in node_labels if not pd.isna(label)}))
+
+        rows = labels.get_indexer(node_labels)
+        columns = np.arange(len(self.nodes))
+        kept = rows >= 0
+
+        indicator = sp.csr_matrix((np.ones(kept.sum()), (rows[kept], columns[kept])), shape=(len(labels), len(self.nodes)))
+        return labels, indicator
+
+    def roll_up(self, matrix: sp.spmatrix, level: int) -> tuple:
+        """
+        Aggregates a nodes x nodes matrix to a level, as C·M·Cᵀ.
+
+        Args:
+            matrix (sp.spmatrix): The matrix over the finest nodes.
+            level (int): The level, 0 being the coarsest.
+
+        Returns:
+            tuple: The sorted labels (pd.Index) and the CSR matrix of shape (labels, labels).
+        """
+        labels, indicator = self.indicator(level)
+        return labels, (indicator @ matrix @ indicator.T).tocsr()
@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from matrices.flow_matrix import FlowMatrix
+
+
+class LocationFlowTensor:
+    """
+    Flows aggregated once by (seller location, buyer location, seller sector, buyer sector).
+
+    The dense layout stores, for each field, an array of shape
+    (locations, locations, sectors, sectors). The sparse layout stores the
+    same tensor as a CSR matrix of shape (locations * sectors, locations * sectors)
+    whose row is ``seller_location * sectors + seller_sector`` and whose column
+    is ``buyer_location * sectors + buyer_sector``. Any location slice,
+    including a seller and buyer pair, is then answered by indexing.
+
+    Only decomposable aggregations ('sum' and 'mean') can be sliced.
+
+    Attributes:
+        locations (pd.Index): The location axis, shared by sellers and buyers.
+        sectors (pd.Index): The sector axis, shared by sellers and buyers.
+        fields (list): The aggregated fields.
+        sparse (bool): Whether the sparse layout is used.
+    """
+    def __init__(self,
+                 sums: dict,
+                 valid_counts: dict,
+                 row_counts,
+                 locations: pd.Index,
+                 sectors: pd.Index,
+                 seller_sector_agent: str,
+                 buyer_sector_agent: str) -> None:
+        """
+        Initializes the LocationFlowTensor object. Use ``from_rows`` to build one from transactions.
+
+        Args:
+            sums (dict): {field: tensor} with the sum of each field.
+            valid_counts (dict): {field: tensor} with the number of non-missing values of each field.
+            row_counts: Tensor with the number of transactions of each cell.
+            locations (pd.Index): The location axis.
+            sectors (pd.Index): The sector axis.
+            seller_sector_agent (str): Name of the seller sector axis.
+            buyer_sector_agent (str): Name of the buyer sector axis.
+        """
+        self.sums = sums
+        self.valid_counts = valid_counts
+        self.row_counts = row_counts
+        self.locations = pd.Index(locations)
+        self.sectors = pd.Index(sectors)
+        self.seller_sector_agent = seller_sector_agent
+        self.buyer_sector_agent = buyer_sector_agent
+        self.fields = list(sums)
+        self.sparse = sp.issparse(row_counts)
+
+    @classmethod
+    def from_rows(cls,
+                  df: pd.DataFrame,
+                  fields: list,
+                  seller_local_agent: str,
+                  buyer_local_agent: str,
+                  seller_sector_agent: str,
+                  buyer_sector_agent: str,
+                  sparse: bool = False) -> "LocationFlowTensor":
+        """
+        Aggregates transactions into a tensor in a single pass.
+
+        Args:
+            df (pd.DataFrame): The transactions.
+            fields (list): The numeric fields to aggregate.
+            seller_local_agent (str): The seller location field.
+            buyer_local_agent (str): The buyer location field.
+            seller_sector_agent (str): The seller sector field.
+            buyer_sector_agent (str): The buyer sector field.
+            sparse (bool, optional): Whether to use the sparse layout. Defaults to False.
+
+        Returns:
+            LocationFlowTensor: The aggregated tensor.
+        """
+        sums, valid_counts = {}, {}
+        for field in fields:
+            values = df[field].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            sums[field] = np.where(valid, values, 0.0)
+            valid_counts[field] = valid.astype(float)
+
+        return cls._from_weights(df, sums, valid_counts, np.ones(len(df)), seller_local_agent, buyer_local_agent,
+                                 seller_sector_agent, buyer_sector_agent, sparse)
+
+    @classmethod
+    def from_groups(cls,
+                    df: pd.DataFrame,
+                    fields: list,
+                    count_columns: dict,
+                    row_count_column: str,
+                    seller_local_agent: str,
+                    buyer_local_agent: str,
+                    seller_sector_agent: str,
+                    buyer_sector_agent: str,
+                    sparse: bool = False) -> "LocationFlowTensor":
+        """
+        Builds a tensor from transactions already grouped, e.g. by a FlowAccumulator.
+
+        Args:
+            df (pd.DataFrame): One row per group, with the sum, the non-missing count and the row count of the group.
+            fields (list): The summed fields.
+            count_columns (dict): {field: column holding its non-missing count}.
+            row_count_column (str): The column holding the number of rows of each group.
+            seller_local_agent (str): The seller location field.
+            buyer_local_agent (str): The buyer location field.
+            seller_sector_agent (str): The seller sector field.
+            buyer_sector_agent (str): The buyer sector field.
+            sparse (bool, optional): Whether to use the sparse layout. Defaults to False.
+
+        Returns:
+            LocationFlowTensor: The tensor, equal to from_rows on the transactions of the groups.
+        """
+        sums = {field: df[field].to_numpy(dtype=float) for field in fields}
+        valid_counts = {field: df[count_columns[field]].to_numpy(dtype=float) for field in fields}
+        return cls._from_weights(df, sums, valid_counts, df[row_count_column].to_numpy(dtype=float), seller_local_agent,
+                                 buyer_local_agent, seller_sector_agent, buyer_sector_agent, sparse)
+
+    @classmethod
+    def _from_weights(cls,
+                      df: pd.DataFrame,
+                      sums: dict,
+                      valid_counts: dict,
+                      row_counts: np.ndarray,
+                      seller_local_agent: str,
+                      buyer_local_agent: str,
+                      seller_sector_agent: str,
+                      buyer_sector_agent: str,
+                      sparse: bool) -> "LocationFlowTensor":
+        """Scatters per-row sums and counts on the (location, sector) axes of the labels of df."""
+        locations = _sorted_union(df[seller_local_agent], df[buyer_local_agent])
+        sectors = _sorted_union(df[seller_sector_agent], df[buyer_sector_agent])
+
+        seller_location = locations.get_indexer(df[seller_local_agent])
+        buyer_location = locations.get_indexer(df[buyer_local_agent])
+        seller_sector = sectors.get_indexer(df[seller_sector_agent])
+        buyer_sector = sectors.get_indexer(df[buyer_sector_agent])
+
+        # Rows with a missing label are dropped, like in a groupby
+        keep = (seller_location >= 0) & (buyer_location >= 0) & (seller_sector >= 0) & (buyer_sector >= 0)
+
+        n_locations, n_sectors = len(locations), len(sectors)
+        rows = seller_location[keep] * n_sectors + seller_sector[keep]
+        cols = buyer_location[keep] * n_sectors + buyer_sector[keep]
+        size = n_locations * n_sectors
+
+        def accumulate(weights):
+            if sparse:
+                return sp.coo_matrix((weights, (rows, cols)), shape=(size, size)).tocsr()
+            flat = np.bincount(rows * size + cols, weights=weights, minlength=size * size)
+            # (seller location, seller sector, buyer location, buyer sector) -> (seller location, buyer location, seller sector, buyer sector)
+            return flat.reshape(n_locations, n_sectors, n_locations, n_sectors).transpose(0, 2, 1, 3).copy()
+
+        return cls({field: accumulate(values[keep]) for field, values in sums.items()},
+                   {field: accumulate(counts[keep]) for field, counts in valid_counts.items()},
+                   accumulate(row_counts[keep]),
+                   locations, sectors, seller_sector_agent, buyer_sector_agent)
+
+    def _location_position(self, location):
+        if location is None:
+            return None
+        return self.locations.get_loc(location) if location in self.locations else -1
+
+    def _slice(self, tensor, seller_location=None, buyer_location=None) -> np.ndarray:
+        """Returns the sectors x sectors dense block of a location slice, summing the free location axes."""
+        n_sectors = len(self.sectors)
+        seller = self._location_position(seller_location)
+        buyer = self._location_position(buyer_location)
+
+        if seller == -1 or buyer == -1:
+            return np.zeros((n_sectors, n_sectors))
+
+        if not self.sparse:
+            block = tensor[slice(None) if seller is None else seller, slice(None) if buyer is None else buyer]
+            if seller is None:
+                block = block.sum(axis=0)
+            if buyer is None:
+                block = block.sum(axis=0)
+            return np.asarray(block, dtype=float)
+
+        # Adds the blocks of every location: (sectors, locations * sectors)
+        fold = sp.hstack([sp.identity(n_sectors, format='csr')] * len(self.locations), format='csr')
+        block = tensor if seller is None else tensor[seller * n_sectors:(seller + 1) * n_sectors]
+        block = fold @ block if seller is None else block
+        block = block @ fold.T if buyer is None else block[:, buyer * n_sectors:(buyer + 1) * n_sectors]
+        return block.toarray()
+
+    def flow_matrix(self,
+                    field: str,
+                    seller_location: str = None,
+                    buyer_location: str = None,
+                    aggregate_method: str = 'sum') -> FlowMatrix:
+        """
+        Returns the sectors x sectors matrix of a location slice, restricted to the sectors observed in it.
+
+        Args:
+            field (str): The aggregated field.
+            seller_location (str, optional): The seller location. Defaults to every location.
+            buyer_location (str, optional): The buyer location. Defaults to every location.
+            aggregate_method (str, optional): 'sum' or 'mean'. Defaults to 'sum'.
+
+        Returns:
+            FlowMatrix: The matrix, labeled by the sorted observed sectors.
+
+        Raises:
+            ValueError: If the aggregation method cannot be computed from the tensor.
+        """
+        if aggregate_method not in ('sum', 'mean'):
+            raise ValueError(f"The aggregate method '{aggregate_method}' cannot be sliced from a tensor. Choose 'sum' or 'mean'.")
+
+        observed = self._slice(self.row_counts, seller_location, buyer_location) > 0
+        present = np.flatnonzero(observed.any(axis=1) | observed.any(axis=0))
+
+        values = self._slice(self.sums[field], seller_location, buyer_location)
+        if aggregate_method == 'mean':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = np.nan_to_num(values / self._slice(self.valid_counts[field], seller_location, buyer_location), nan=0)
+
+        return FlowMatrix(values[np.ix_(present, present)],
+                          self.sectors[present].rename(self.seller_sector_agent),
+                          self.sectors[present].rename(self.buyer_sector_agent))
+
+    def matrix(self,
+               field: str,
+               seller_location: str = None,
+               buyer_location: str = None,
+               aggregate_method: str = 'sum',
+               insert_total: bool = True) -> pd.DataFrame:
+        """
+        Returns the matrix of a location slice as a DataFrame, like MatricesLocal.create_matrices.
+
+        Args:
+            field (str): The aggregated field.
+            seller_location (str, optional): The seller location. Defaults to every location.
+            buyer_location (str, optional): The buyer location. Defaults to every location.
+            aggregate_method (str, optional): 'sum' or 'mean'. Defaults to 'sum'.
+            insert_total (bool, optional): Whether to append the totals row and column. Defaults to True.
+
+        Returns:
+            pd.DataFrame: The matrix.
+        """
+        matrix = self.flow_matrix(field, seller_location, buyer_location, aggregate_method)
+        if insert_total:
+            matrix = matrix.with_totals(f"Total{field}Bought", f"Total{field}Sold")
+        return matrix.to_pandas()
+
+    def __repr__(self) -> str:
+        layout = 'sparse' if self.sparse else 'dense'
+        return f"LocationFlowTensor(locations={len(self.locations)}, sectors={len(self.sectors)}, fields={self.fields}, {layout})"
+
+
+def _sorted_union(*columns) -> pd.Index:
+    """Returns the sorted union of the non-missing labels of several columns."""
+    labels = pd.Index(pd.unique(np.concatenate([np.asarray(column, dtype=object) for column in columns]))).dropna()
+    try:
+        return labels.sort_values()
+    except TypeError:
+        return labels
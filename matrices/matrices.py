@@ -1,7 +1,21 @@
 from matrices.abstract_matrices import MatricesBase
+from matrices.table_cache import read_table
+from matrices.flow_matrix import FlowMatrix, SparseFlowMatrix
+from matrices.quantile import QuantileSketch
+from matrices.accumulator import FlowAccumulator
+from matrices.parallel import SharedTable, _build_product_in_worker, _init_worker
+from matrices.product_tensor import ProductTensor
+from matrices.field_tensor import FieldTensor
+from matrices.hierarchy import SectorHierarchy
+from matrices.store import MatrixStore
+from matrices.graph import MatrixGraph
+from matrices.registry import SectorRegistry, sector_registry as default_sector_registry
 import numpy as np
 import pandas as pd
-from copy import deepcopy
+import scipy.sparse as sp
+from copy import copy, deepcopy
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 
 class Matrices(MatricesBase):
@@ -15,8 +29,12 @@ class Matrices(MatricesBase):
                  value_field: str = "Valor",
                  seller_sector_agent: str = "SetorDoAgenteQueVendeI",
                  buyer_sector_agent: str = "SetorDoAgenteQueCompraI",
-                 field_product_name: str = 'Produto'
-
+                 field_product_name: str = 'Produto',
+                 use_cache: bool = False,
+                 backend: str = "dense",
+                 cache_size: int = 0,
+                 quantile_error: float = None,
+                 sector_registry: SectorRegistry = None
                  ) -> None:
         """
         Initializes the Matrices object with the specified parameters.
@@ -29,6 +47,13 @@ class Matrices(MatricesBase):
         value_field (str, optional): The name of the value field in the dataset. Default is "Valor".
         seller_sector_agent (str, optional): The name of the field representing the seller sector. Default is "SetorDoAgenteQueVendeI".
         buyer_sector_agent (str, optional): The name of the field representing the buyer sector. Default is "SetorDoAgenteQueCompraI".
+        use_cache (bool, optional): Whether to load the table through a columnar cache stored next to table_path. Default is False.
+        backend (str, optional): 'dense' to build pd.DataFrame matrices or 'sparse' to build SparseFlowMatrix matrices. Default is "dense".
+        cache_size (int, optional): Number of matrices kept in the LRU cache of the class's DataFrame. Default is 0 (no cache).
+        quantile_error (float, optional): Rank error bound of the streaming quantile sketch used by the 'median' and 'quantile' aggregations
+            when they are answered from the accumulator (after append_transactions, or in ChunkedMatrices). Tables in memory always
+            use exact quantiles. Default is None (quantiles are not tracked by the accumulator).
+        sector_registry (SectorRegistry, optional): The sector vocabulary of create_sector_array. Default is the process-wide registry.
 
         Attributes:
         ----------
@@ -38,18 +63,50 @@ class Matrices(MatricesBase):
         value_field (str): The value field name.
         seller_sector_agent (str): The seller sector field name.
         buyer_sector_agent (str): The buyer sector field name.
+        backend (str): The default matrix backend.
+        cache_size (int): The maximum number of cached matrices.
+        cache_hits (int): Number of matrices served from the cache.
+        cache_misses (int): Number of matrices built on a cache miss.
+        quantile_error (float): The rank error bound of the quantile sketch, or None.
+        sector_registry (SectorRegistry): The sector vocabulary arrays are aligned to.
+        accumulator (FlowAccumulator): Running sums and counts of the transactions, built by the first append_transactions.
         qtt_matrix (pd.DataFrame): DataFrame for the quantity matrix.
         value_matrix (pd.DataFrame): DataFrame for the value matrix.
         parametric_matrix (pd.DataFrame): DataFrame for the parametric matrix.
         implicit_price_matrix (pd.DataFrame): DataFrame for the implicit price matrix.
 
         """
+        self.seller_sector_agent = seller_sector_agent
+        self.buyer_sector_agent = buyer_sector_agent
+
+        self.field_product_name = field_product_name
+
+        self.backend = self._check_backend(backend)
+
+        self.quantile_error = quantile_error
+        if quantile_error is not None:
+            QuantileSketch.k_for_error(quantile_error)
+
+        self.sector_registry = default_sector_registry if sector_registry is None else sector_registry
+
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._matrix_cache = OrderedDict()
+        self._product_graphs = OrderedDict()
+        self._data_generation = 0
+        self._product_versions = {}
+        self._product_index = None
+
+        self.accumulator = None
+        self._pending_transactions = []
+
+        self._dataframe = pd.DataFrame()
+        self._encoded = pd.DataFrame()
         # self.dataframe = pd.read_excel(table_path)
         if table_path:
             # Read different formats
-            self.dataframe = pd.read_excel(table_path)
-        self.seller_sector_agent = seller_sector_agent
-        self.buyer_sector_agent = buyer_sector_agent
+            self.dataframe = read_table(table_path, use_cache=use_cache)
 
         self.quantity_field = quantity_field
 
@@ -64,8 +121,208 @@ class Matrices(MatricesBase):
         self.implicit_price_matrix = pd.DataFrame()
 
         self.pricing_matrix = pd.DataFrame()
-        
-        self.field_product_name = field_product_name
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        """The transaction table, as it was assigned.
+
+        Transactions added by append_transactions are concatenated on first access.
+
+        The cached matrices are not told about edits made to the table in
+        place; call refresh after such edits."""
+        self._concat_pending()
+        return self._dataframe
+
+    @dataframe.setter
+    def dataframe(self, dataframe: pd.DataFrame) -> None:
+        self._dataframe = dataframe
+        self._encoded = self._encode_categoricals(dataframe)
+        self._pending_transactions = []
+        self.accumulator = None
+        self.clear_cache()
+
+    @property
+    def _table(self) -> pd.DataFrame:
+        """The transaction table with the label fields stored as categorical codes, which every computation works on."""
+        self._concat_pending()
+        return self._encoded
+
+    def _concat_pending(self) -> None:
+        """Concatenates the transactions added by append_transactions to the table."""
+        if self._pending_transactions:
+            self._dataframe = pd.concat([self._dataframe] + self._pending_transactions, ignore_index=True)
+            self._encoded = self._encode_categoricals(self._dataframe)
+            self._pending_transactions = []
+            self._product_index = None
+
+    def append_transactions(self, df_new: pd.DataFrame) -> "Matrices":
+        """Adds new transactions, updating the accumulated sums and counts with the new rows only.
+
+        The first call accumulates the current table once; later calls cost
+        time proportional to the new rows. Cached matrices of the products
+        found in df_new (and of selections without a product) are dropped, so
+        their totals and the derived matrices are rebuilt lazily, from the
+        accumulator, on the next request. 'sum' and 'mean' matrices of the
+        quantity and value fields are then built without scanning the table.
+
+        Parameters:
+        ----------
+
+        df_new (pd.DataFrame): The new transactions, with the same fields as the class's DataFrame.
+
+        Returns:
+        -------
+
+        (Matrices): The object itself."""
+        if df_new.empty:
+            return self
+
+        if self.accumulator is None:
+            self.accumulator = self._new_accumulator().update(self._table)
+
+        self.accumulator.update(df_new)
+        self._pending_transactions.append(df_new)
+        self._invalidate_products(set(df_new[self.field_product_name].dropna().unique()))
+
+        return self
+
+    def _accumulator_keys(self) -> list:
+        """The fields the accumulated sums and counts are grouped by."""
+        return [self.field_product_name, self.seller_sector_agent, self.buyer_sector_agent]
+
+    def _new_accumulator(self) -> FlowAccumulator:
+        """Returns an empty accumulator of the quantity and value fields, tracking quantiles if quantile_error is set."""
+        quantile_k = QuantileSketch.k_for_error(self.quantile_error) if self.quantile_error is not None else None
+        return FlowAccumulator(self._accumulator_keys(), list(dict.fromkeys([self.quantity_field, self.value_field])), quantile_k)
+
+    def _invalidate_products(self, products: set) -> None:
+        """Drops the cached matrices of the given products and of every selection without a product, and marks their graphs dirty."""
+        for key in [key for key in self._matrix_cache if key[0] is None or key[0] in products]:
+            del self._matrix_cache[key]
+        for product in set(products) | {None}:
+            self._product_versions[product] = self._product_versions.get(product, 0) + 1
+        self._product_index = None
+
+    def refresh(self) -> "Matrices":
+        """Declares that the DataFrame was edited in place.
+
+        Encodes the label fields again and drops the cached matrices, the
+        product graphs and the accumulated sums, so the next requests see the
+        edited table. Product graphs already handed out are marked dirty.
+
+        Returns:
+        -------
+
+        (Matrices): The object itself."""
+        self.dataframe = self.dataframe
+        return self
+
+    def clear_cache(self) -> None:
+        """Empties the matrix cache, the product graphs and the product row index. Called whenever the DataFrame is replaced or refreshed."""
+        self._matrix_cache.clear()
+        self._product_graphs.clear()
+        self._data_generation += 1
+        self._product_index = None
+
+    @property
+    def product_index(self) -> dict:
+        """The positions of the rows of each product in the class's DataFrame, built on first use.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {product: np.ndarray of row positions}."""
+        if self._product_index is None:
+            self._product_index = self._table.groupby(self.field_product_name, observed=True, sort=False).indices
+        return self._product_index
+
+    def cache_info(self) -> dict:
+        """Returns the matrix cache statistics.
+
+        Returns:
+        -------
+
+        (dict): The hits, misses, current size and maximum size of the cache."""
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'size': len(self._matrix_cache),
+            'maxsize': self.cache_size,
+        }
+
+    def _check_backend(self, backend: str) -> str:
+        """Validates a matrix backend name.
+
+        Raises:
+        ------
+
+        ValueError: If the backend is neither 'dense' nor 'sparse'."""
+        if backend not in ('dense', 'sparse'):
+            raise(ValueError(f"The selected backend was not valid: {backend}. Please select or 'dense' or 'sparse'"))
+        return backend
+
+    def _categorical_fields(self) -> list:
+        """Returns the groups of label fields to encode, each group sharing one vocabulary.
+
+        Returns:
+        -------
+
+        (list): A list of tuples of field names."""
+        return [
+            (self.seller_sector_agent, self.buyer_sector_agent),
+            (self.field_product_name,),
+        ]
+
+    def _encode_categoricals(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        """Converts the label fields to categorical columns.
+
+        The fields of a group share the same sorted categories, so the seller
+        and buyer sector codes index the same sector axis. Groupings and
+        filters then work on integer codes while keeping the original labels.
+
+        Parameters:
+        ----------
+
+        dataframe (pd.DataFrame): The transaction table.
+
+        Returns:
+        -------
+
+        (pd.DataFrame): A shallow copy of the table with the label fields encoded."""
+        dataframe = dataframe.copy(deep=False)
+
+        for group in self._categorical_fields():
+            group = [field for field in group if field in dataframe.columns]
+            if not group:
+                continue
+
+            categories = pd.Index(pd.unique(np.concatenate([dataframe[field].to_numpy(dtype=object) for field in group]))).dropna()
+            try:
+                categories = categories.sort_values()
+            except TypeError:
+                pass
+
+            for field in group:
+                dataframe[field] = pd.Categorical(dataframe[field], categories=categories)
+
+        return dataframe
+
+    def _decode_labels(self, result_df: pd.DataFrame) -> pd.DataFrame:
+        """Converts the categorical columns of an aggregated result back to their labels.
+
+        Parameters:
+        ----------
+
+        result_df (pd.DataFrame): The aggregated (small) DataFrame.
+
+        Returns:
+        -------
+
+        (pd.DataFrame): The DataFrame with plain label columns."""
+        for field in result_df.columns:
+            if isinstance(result_df[field].dtype, pd.CategoricalDtype):
+                result_df[field] = result_df[field].astype(result_df[field].cat.categories.dtype)
+        return result_df
 
     def _row_sum(self, row: pd.Series) -> pd.Series:
         """Calculates the sum of the values in a row.
@@ -86,10 +343,13 @@ class Matrices(MatricesBase):
     # TODO: Setar as variáveis do eixo da matriz como input da função. Ex
     def create_matrices(self,
                         product: str,
-                        matrice_type:str,
-                        aggregate_method: str,
+                        matrice_type:str = None,
+                        aggregate_method: str = 'sum',
                         df: pd.DataFrame = pd.DataFrame(),
-                        insert_total = True
+                        insert_total = True,
+                        backend: str = None,
+                        quantile: float = 0.5,
+                        fields: list = None
                         ) -> pd.DataFrame:
         """
         Creates matrices based on the specified parameters.
@@ -99,68 +359,819 @@ class Matrices(MatricesBase):
 
         product (str): The product to filter the data by.
         matrice_type (str): The type of matrix to create (must be a field in the DataFrame).
-        aggregate_method (str): The aggregation method ('sum', 'mean', or 'median').
+        aggregate_method (str, optional): The aggregation method ('sum', 'mean', 'median' or 'quantile'). Default is 'sum'.
         df (pd.DataFrame, optional): DataFrame to use. If not provided, the class's DataFrame is used.
+        backend (str, optional): 'dense' or 'sparse'. If not provided, the class's backend is used.
+        quantile (float, optional): The quantile computed by the 'quantile' aggregation. Default is 0.5.
+        fields (list, optional): Numeric fields to aggregate together instead of matrice_type. They are aggregated
+            in a single groupby and returned as a FieldTensor; insert_total and backend are then not used.
 
 
         Returns:
         -------
 
-        (pd.DataFrame): The created matrix.
+        (pd.DataFrame, SparseFlowMatrix or FieldTensor): The created matrix, or the matrices of the fields.
 
         Raises:
         ------
 
         KeyError: If the specified product is not found in the DataFrame.
-        ValueError: If an invalid aggregation method is specified.
+        ValueError: If an invalid aggregation method is specified, or fields is empty.
         """
-        if df.empty:
-            df = self.dataframe.copy()
+        if fields is not None:
+            return self._field_tensor(self._check_fields(fields), df, product, aggregate_method, quantile)
 
         # Setting matrice type
         self.matrice_type = matrice_type # It must be present in the dataframe
 
-        if not df[df[self.field_product_name] == product].empty: # NOTE: Modified the hardcoded 'Produto' to self.field_product_name
-            df = df[df[self.field_product_name] == product] 
+        matrices = self._matrices_for(df, product, [self.matrice_type], aggregate_method, insert_total, backend, quantile)
+
+        return self._to_output(matrices[self.matrice_type])
+
+    def _check_fields(self, fields: list) -> list:
+        """Validates the fields of a multi-field create_matrices call, dropping repeated ones.
+
+        Raises:
+        ------
+
+        ValueError: If no field is given."""
+        fields = list(dict.fromkeys(fields))
+        if not fields:
+            raise(ValueError("At least one field must be given."))
+        return fields
+
+    def _field_tensor(self,
+                      fields: list,
+                      df: pd.DataFrame,
+                      product: str,
+                      aggregate_method: str,
+                      quantile: float = 0.5,
+                      **filters
+                      ) -> FieldTensor:
+        """Aggregates the fields in one pass and stacks their matrices, which share the same sector axis.
+
+        Returns:
+        -------
+
+        (FieldTensor): The fields x sectors x sectors matrices."""
+        matrices = self._matrices_for(df, product, fields, aggregate_method, False, 'dense', quantile, **filters)
+
+        sectors = matrices[fields[0]].index
+        values = np.stack([matrices[field].values for field in fields])
+
+        return FieldTensor(values, fields, sectors, self.seller_sector_agent, self.buyer_sector_agent)
+
+    def create_sector_array(self,
+                            product: str,
+                            matrice_type: str,
+                            aggregate_method: str = 'sum',
+                            df: pd.DataFrame = pd.DataFrame(),
+                            quantile: float = 0.5,
+                            **filters
+                            ) -> np.ndarray:
+        """
+        Creates a matrix as an array aligned to the sector registry.
+
+        Every array of the same registry shares the same axis whatever the
+        product or filters, so they can be compared or combined directly.
+        Sectors of the matrix not registered yet are registered.
+
+        Parameters:
+        ----------
+
+        product (str): The product to filter the data by.
+        matrice_type (str): The field to aggregate.
+        aggregate_method (str, optional): The aggregation method ('sum', 'mean', 'median' or 'quantile'). Default is 'sum'.
+        df (pd.DataFrame, optional): DataFrame to use. If not provided, the class's DataFrame is used.
+        quantile (float, optional): The quantile computed by the 'quantile' aggregation. Default is 0.5.
+        **filters: Extra arguments of create_matrices, such as the seller or buyer location.
+
+        Returns:
+        -------
+
+        (np.ndarray): Array of shape (sectors, sectors) over sector_registry.sectors, without totals.
+
+        Raises:
+        ------
+
+        KeyError: If the specified product is not found in the DataFrame.
+        ValueError: If an invalid aggregation method is specified.
+        """
+        matrix = self.create_matrices(product, matrice_type, aggregate_method, df=df, insert_total=False, quantile=quantile, **filters)
+        return self.sector_registry.align(matrix)
+
+    def _matrices_for(self,
+                      df: pd.DataFrame,
+                      product: str,
+                      fields: list,
+                      aggregate_method: str,
+                      insert_total = True,
+                      backend: str = None,
+                      quantile: float = 0.5,
+                      **filters
+                      ) -> dict:
+        """Selects the rows and builds the matrices, going through the LRU cache.
+
+        Only matrices of the class's DataFrame are cached, keyed by
+        (product, field, aggregate method, quantile, filters, insert_total, backend).
+
+        Parameters:
+        ----------
+
+        df (pd.DataFrame): The transaction table.
+        product (str): The product to filter the data by.
+        fields (list): The fields to aggregate.
+        aggregate_method (str): The aggregation method ('sum', 'mean', 'median' or 'quantile').
+        insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+        backend (str, optional): 'dense' or 'sparse'. If not provided, the class's backend is used.
+        quantile (float, optional): The quantile computed by the 'quantile' aggregation. Default is 0.5.
+        **filters: Extra row filters accepted by _select_rows, such as the seller or buyer location.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {field: FlowMatrix or SparseFlowMatrix}."""
+        backend = self._check_backend(backend or self.backend)
+
+        if self.cache_size <= 0 or not self._is_own_table(df):
+            return self._build_for(df, product, fields, aggregate_method, insert_total, backend, quantile, **filters)
+
+        location = tuple(sorted(filters.items()))
+        keys = {field: (product, field, aggregate_method, quantile, location, insert_total, backend) for field in fields}
+
+        if all(key in self._matrix_cache for key in keys.values()):
+            self.cache_hits += len(keys)
+            for key in keys.values():
+                self._matrix_cache.move_to_end(key)
+            return {field: self._matrix_cache[key] for field, key in keys.items()}
+
+        self.cache_misses += len(keys)
+        matrices = self._build_for(df, product, fields, aggregate_method, insert_total, backend, quantile, **filters)
+
+        for field, key in keys.items():
+            self._matrix_cache[key] = matrices[field]
+            self._matrix_cache.move_to_end(key)
+
+        while len(self._matrix_cache) > self.cache_size:
+            self._matrix_cache.popitem(last=False)
+
+        return matrices
+
+    def _build_for(self,
+                   df: pd.DataFrame,
+                   product: str,
+                   fields: list,
+                   aggregate_method: str,
+                   insert_total = True,
+                   backend: str = None,
+                   quantile: float = 0.5,
+                   **filters
+                   ) -> dict:
+        """Builds the matrices from the accumulator when it can answer the request, otherwise from the selected rows.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {field: FlowMatrix or SparseFlowMatrix}."""
+        if self._is_own_table(df) and self._uses_accumulator(fields, aggregate_method):
+            self._check_aggregate_method(aggregate_method, quantile)
+            result_df = self.accumulator.aggregate([self.seller_sector_agent, self.buyer_sector_agent], fields, aggregate_method,
+                                                   quantile, **self._accumulator_filters(product, **filters))
+            return self._matrices_from_aggregate(self._decode_labels(result_df), fields, insert_total, backend)
+
+        if self._is_own_table(df):
+            df = self._table
+
+        columns = list(dict.fromkeys([self.seller_sector_agent, self.buyer_sector_agent] + list(fields)))
+        return self._build_matrices(self._select_rows(df, product, columns=columns, **filters), fields, aggregate_method, insert_total, backend, quantile)
+
+    def _is_own_table(self, df: pd.DataFrame) -> bool:
+        """Whether df stands for the class's DataFrame: an empty DataFrame (the default) or the DataFrame itself."""
+        return df.empty or df is self._dataframe or df is self._encoded
+
+    def _uses_accumulator(self, fields: list, aggregate_method: str) -> bool:
+        """Whether the accumulator holds what is needed to aggregate the fields with the method."""
+        if self.accumulator is None or not set(fields) <= set(self.accumulator.fields):
+            return False
+        return aggregate_method in ('sum', 'mean') or (aggregate_method in ('median', 'quantile') and bool(self.accumulator.sketches))
+
+    def _accumulator_filters(self, product: str) -> dict:
+        """Translates a row selection into accumulator filters, with the same errors as _select_rows.
+
+        Raises:
+        ------
+
+        KeyError: If the specified product is not found in the accumulated transactions."""
+        if product not in self.accumulator.labels(self.field_product_name):
+            raise(KeyError(f"The selected product {product} was not found in the dataframe."))
+        return {self.field_product_name: product}
+
+    def _select_rows(self, df: pd.DataFrame, product: str, columns: list = None) -> pd.DataFrame:
+        """Selects the rows of the specified product.
+
+        Parameters:
+        ----------
+
+        df (pd.DataFrame): The transaction table.
+        product (str): The product to filter the data by.
+        columns (list, optional): The columns to keep. Default is None, which keeps every column.
+
+        Returns:
+        -------
+
+        (pd.DataFrame): The rows of the product.
+
+        Raises:
+        ------
+
+        KeyError: If the specified product is not found in the DataFrame."""
+        return self._take(df, self._product_rows(df, product), columns)
+
+    def _product_rows(self, df: pd.DataFrame, product: str) -> np.ndarray:
+        """Returns the positions of the rows of the specified product.
+
+        For the class's DataFrame the positions come from product_index, so
+        the cost is proportional to the product's rows instead of the table.
+
+        Raises:
+        ------
+
+        KeyError: If the specified product is not found in the DataFrame."""
+        if df is self._table:
+            rows = self.product_index.get(product, [])
         else:
+            rows = np.flatnonzero((df[self.field_product_name] == product).to_numpy()) # NOTE: Modified the hardcoded 'Produto' to self.field_product_name
+
+        if not len(rows):
             raise(KeyError(f"The selected product {product} was not found in the dataframe."))
+        return rows
+
+    def _take(self, df: pd.DataFrame, rows: np.ndarray, columns: list = None) -> pd.DataFrame:
+        """Materializes the selected rows, restricted to the columns the aggregation needs.
+
+        The table itself is never copied: only the selected rows of the
+        projected columns are gathered.
+
+        Parameters:
+        ----------
+
+        df (pd.DataFrame): The transaction table.
+        rows (np.ndarray): The row positions.
+        columns (list, optional): The columns to keep. Default is None, which keeps every column.
+
+        Returns:
+        -------
+
+        (pd.DataFrame): The selected rows."""
+        if columns is None:
+            return df.iloc[rows]
+        return df.iloc[rows, df.columns.get_indexer(columns)]
+
+    def _check_aggregate_method(self, aggregate_method: str, quantile: float = 0.5) -> None:
+        """Checks that an aggregation method (and its quantile) is valid.
+
+        Raises:
+        ------
+
+        ValueError: If an invalid aggregation method or quantile is specified."""
+        if aggregate_method not in ('sum', 'mean', 'median', 'quantile'):
+            raise(ValueError(f"The selected aggregate method was not valid: {aggregate_method}. Please select or 'sum' or 'mean' or 'median' or 'quantile'"))
+
+        if aggregate_method == 'quantile' and not 0 <= quantile <= 1:
+            raise(ValueError(f"The selected quantile was not valid: {quantile}. It must be between 0 and 1"))
+
+    def _aggregate(self, df: pd.DataFrame, fields: list, aggregate_method: str, quantile: float = 0.5, keys: list = None) -> pd.DataFrame:
+        """Aggregates several fields by seller and buyer sector in a single groupby.
+
+        The rows are in memory, so 'median' and 'quantile' are always the exact
+        vectorised groupby quantiles; the quantile sketches of quantile_error
+        are only used by the accumulator, which never sees all the rows at once.
+
+        Parameters:
+        ----------
+
+        df (pd.DataFrame): The selected rows.
+        fields (list): The fields to aggregate.
+        aggregate_method (str): The aggregation method ('sum', 'mean', 'median' or 'quantile').
+        quantile (float, optional): The quantile computed by the 'quantile' aggregation. Default is 0.5.
+        keys (list, optional): The grouping fields. Default is the seller and buyer sector.
 
+        Returns:
+        -------
+
+        (pd.DataFrame): One row per (seller sector, buyer sector) pair, with a column per field.
+
+        Raises:
+        ------
+
+        ValueError: If an invalid aggregation method is specified."""
         #agrupa os dados
-        if aggregate_method=='sum':
-            result_df = df.groupby([self.seller_sector_agent, self.buyer_sector_agent])[self.matrice_type].sum().reset_index()
-        elif aggregate_method=='mean':
-            result_df = df.groupby([self.seller_sector_agent, self.buyer_sector_agent])[self.matrice_type].mean().reset_index()
-        elif aggregate_method=='median':
-            result_df = df.groupby([self.seller_sector_agent, self.buyer_sector_agent])[self.matrice_type].median().reset_index()
+        self._check_aggregate_method(aggregate_method, quantile)
+
+        if keys is None:
+            keys = [self.seller_sector_agent, self.buyer_sector_agent]
+
+        if aggregate_method == 'median':
+            aggregate_method, quantile = 'quantile', 0.5
+
+        if aggregate_method == 'quantile':
+            result_df = df.groupby(keys, observed=True)[fields].quantile(quantile).reset_index()
         else:
-            raise(ValueError(f"The selected aggregate method was not valid: {aggregate_method}. Please select or 'sum' or 'mean' or 'median'"))
-        
+            result_df = df.groupby(keys, observed=True)[fields].agg(aggregate_method).reset_index()
+
+        return self._decode_labels(result_df)
+
+    def _build_matrices(self,
+                        df: pd.DataFrame,
+                        fields: list,
+                        aggregate_method: str,
+                        insert_total = True,
+                        backend: str = None,
+                        quantile: float = 0.5
+                        ) -> dict:
+        """Builds the matrix of each field from the same aggregation of the selected rows.
+
+        Parameters:
+        ----------
+
+        df (pd.DataFrame): The selected rows.
+        fields (list): The fields to aggregate.
+        aggregate_method (str): The aggregation method ('sum', 'mean', 'median' or 'quantile').
+        insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+        backend (str, optional): 'dense' or 'sparse'. If not provided, the class's backend is used.
+        quantile (float, optional): The quantile computed by the 'quantile' aggregation. Default is 0.5.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {field: FlowMatrix or SparseFlowMatrix}, every matrix sharing the same sector axis."""
+        return self._matrices_from_aggregate(self._aggregate(df, fields, aggregate_method, quantile), fields, insert_total, backend)
+
+    def _matrices_from_aggregate(self,
+                                 result_df: pd.DataFrame,
+                                 fields: list,
+                                 insert_total = True,
+                                 backend: str = None
+                                 ) -> dict:
+        """Builds the matrix of each field from aggregated (seller sector, buyer sector) pairs.
+
+        Parameters:
+        ----------
+
+        result_df (pd.DataFrame): One row per (seller sector, buyer sector) pair, as returned by _aggregate.
+        fields (list): The aggregated fields.
+        insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+        backend (str, optional): 'dense' or 'sparse'. If not provided, the class's backend is used.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {field: FlowMatrix or SparseFlowMatrix}, every matrix sharing the same sector axis."""
+        backend = self._check_backend(backend or self.backend)
+
         # Select the unique sectors from buyer and seller sector agent
         unique_sectors_seller = result_df[self.seller_sector_agent].unique()
         unique_sectors_buyer = result_df[self.buyer_sector_agent].unique()
 
         unique_sectors = sorted(set(unique_sectors_seller).union(set(unique_sectors_buyer)))
 
-        #cria proto matriz
-        matrix_df = result_df.pivot_table(
-            index=self.seller_sector_agent,
-            columns=self.buyer_sector_agent, 
-            values=self.matrice_type,
-            fill_value=0 
-        ).reindex(index=unique_sectors, columns=unique_sectors, fill_value=0)
+        if backend == 'sparse':
+            return self._build_sparse_matrices(result_df, fields, unique_sectors, insert_total)
 
-        if insert_total:
-            total_bought = pd.DataFrame(matrix_df.apply(self._row_sum, axis=0).to_dict(), index=[f"Total{self.matrice_type}Bought"])
-            matrix_df = pd.concat([matrix_df, total_bought])
-            matrix_df.index.name = self.seller_sector_agent
-            matrix_df.columns.name = self.buyer_sector_agent
+        # Scatter-add kernel: each (seller, buyer) pair of result_df is one flat cell of the sectors x sectors matrix
+        sector_index = pd.Index(unique_sectors)
+        cells = sector_index.get_indexer(result_df[self.seller_sector_agent]) * len(sector_index) \
+            + sector_index.get_indexer(result_df[self.buyer_sector_agent])
+        index = sector_index.rename(self.seller_sector_agent)
+        columns = sector_index.rename(self.buyer_sector_agent)
 
-            matrix_df[f"Total{self.matrice_type}Sold"] = matrix_df.apply(self._row_sum, axis=1)
+        matrices = {}
+        for field in fields:
+            #cria proto matriz
+            values = result_df[field].to_numpy(dtype=float)
+            values = np.bincount(cells, weights=np.where(np.isnan(values), 0, values), minlength=len(sector_index) ** 2)
+            matrix = FlowMatrix(values.reshape(len(sector_index), len(sector_index)), index, columns)
+
+            if insert_total:
+                matrix = matrix.with_totals(f"Total{field}Bought", f"Total{field}Sold")
+
+            matrices[field] = matrix
 
         # matrix_df[f"Total{self.matrice_type}Sold"][f"Total{self.matrice_type}Bought"] = None
         
+        return matrices
+
+    def _build_sparse_matrices(self,
+                               result_df: pd.DataFrame,
+                               fields: list,
+                               unique_sectors: list,
+                               insert_total = True
+                               ) -> dict:
+        """Builds sparse matrices from the aggregated (seller sector, buyer sector) pairs.
+
+        Only the observed pairs are stored and the totals are computed from the
+        sparse structure, so no dense sectors x sectors array is allocated.
+
+        Parameters:
+        ----------
+
+        result_df (pd.DataFrame): The output of _aggregate.
+        fields (list): The aggregated fields.
+        unique_sectors (list): The sorted sector axis.
+        insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {field: SparseFlowMatrix}."""
+        sector_index = pd.Index(unique_sectors)
+        rows = sector_index.get_indexer(result_df[self.seller_sector_agent])
+        cols = sector_index.get_indexer(result_df[self.buyer_sector_agent])
+
+        matrices = {}
+        for field in fields:
+            matrix = SparseFlowMatrix.from_coordinates(rows, cols, result_df[field].to_numpy(), sector_index)
+            matrix.index.name = self.seller_sector_agent
+            matrix.columns.name = self.buyer_sector_agent
+
+            if insert_total:
+                matrix = matrix.with_totals(f"Total{field}Bought", f"Total{field}Sold")
+
+            matrices[field] = matrix
+
+        return matrices
+
+    def _implicit_price_matrices(self,
+                                 product: str,
+                                 qtt_field: str,
+                                 val_field: str,
+                                 df: pd.DataFrame,
+                                 insert_total = True,
+                                 **filters
+                                 ) -> tuple:
+        """Builds the quantity, value and implicit price matrices from one aggregation.
+
+        Quantity and value are aggregated in the same groupby, so both matrices
+        share their labels and the implicit price is computed on the raw arrays
+        before converting to DataFrames.
+
+        Parameters:
+        ----------
+
+        product (str): The product to filter the data by.
+        qtt_field (str): The quantity field.
+        val_field (str): The value field.
+        df (pd.DataFrame): The transaction table.
+        insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+        **filters: Extra row filters accepted by _select_rows.
+
+        Returns:
+        -------
+
+        (tuple): The quantity, value and implicit price matrices, with the totals named TotalImplicitPrice*."""
+        matrices = self._matrices_for(df, product, [qtt_field, val_field], 'sum', insert_total, **filters)
+
+        return tuple(self._to_output(matrix) for matrix in self._implicit_price_from(matrices, qtt_field, val_field))
+
+    def _implicit_price_from(self, matrices: dict, qtt_field: str, val_field: str) -> tuple:
+        """Derives the implicit price from quantity and value matrices sharing their labels.
+
+        Parameters:
+        ----------
+
+        matrices (dict): {field: FlowMatrix or SparseFlowMatrix} with the quantity and value matrices.
+        qtt_field (str): The quantity field.
+        val_field (str): The value field.
+
+        Returns:
+        -------
+
+        (tuple): The quantity, value and implicit price internal matrices, with the totals named TotalImplicitPrice*."""
+        qtt_matrix = matrices[qtt_field].rename(columns={f'Total{qtt_field}Sold': 'TotalImplicitPriceSold'}, index={f"Total{qtt_field}Bought": "TotalImplicitPriceBought"})
+        val_matrix = matrices[val_field].rename(columns={f'Total{val_field}Sold': 'TotalImplicitPriceSold'}, index={f"Total{val_field}Bought": "TotalImplicitPriceBought"})
+
+        implicit_price_matrix = (val_matrix / qtt_matrix).fillna(0)
+
+        return qtt_matrix, val_matrix, implicit_price_matrix
+
+    def _insert_totals(self, matrix_df: pd.DataFrame, matrice_type: str) -> pd.DataFrame:
+        """Appends the total bought row and the total sold column to a matrix.
+
+        Parameters:
+        ----------
+
+        matrix_df (pd.DataFrame): The sectors x sectors matrix.
+        matrice_type (str): The aggregated field, used to name the totals.
+
+        Returns:
+        -------
+
+        (pd.DataFrame): The matrix with the totals row and column."""
+        matrix_df = FlowMatrix.from_pandas(matrix_df).with_totals(f"Total{matrice_type}Bought", f"Total{matrice_type}Sold").to_pandas()
+        matrix_df.index.name = self.seller_sector_agent
+        matrix_df.columns.name = self.buyer_sector_agent
+
         return matrix_df
-    
+
+    def _to_output(self, matrix):
+        """Converts an internal matrix to the type returned by the public methods.
+
+        FlowMatrix objects become pd.DataFrame; SparseFlowMatrix objects are copied. Either way the
+        result does not share its values with the matrix cache, so editing it leaves the cache intact."""
+        if isinstance(matrix, FlowMatrix):
+            return matrix.to_pandas()
+        return matrix.copy()
+
+    def create_all_matrices(self,
+                            fields: list,
+                            aggregate_method: str = 'sum',
+                            df: pd.DataFrame = pd.DataFrame(),
+                            insert_total = True,
+                            quantile: float = 0.5
+                            ) -> dict:
+        """
+        Creates the matrices of every product with a single aggregation pass.
+
+        The data is grouped once by (product, seller sector, buyer sector) and
+        every product's matrix is aligned to the same sector axis, i.e. the
+        sorted union of the sectors found in the whole DataFrame. When the
+        accumulator can answer the request, its groups are used instead.
+
+        Parameters:
+        ----------
+
+        fields (list): The fields to aggregate (each must be a field in the DataFrame).
+        aggregate_method (str, optional): The aggregation method ('sum', 'mean', 'median' or 'quantile'). Default is 'sum'.
+        df (pd.DataFrame, optional): DataFrame to use. If not provided, the class's DataFrame is used.
+        insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+        quantile (float, optional): The quantile computed by the 'quantile' aggregation. Default is 0.5.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {product: {field: pd.DataFrame}} with the matrix of each product and field.
+
+        Raises:
+        ------
+
+        ValueError: If an invalid aggregation method is specified.
+        """
+        if isinstance(fields, str):
+            fields = [fields]
+
+        keys = [self.field_product_name, self.seller_sector_agent, self.buyer_sector_agent]
+
+        if self._is_own_table(df) and self._uses_accumulator(fields, aggregate_method):
+            self._check_aggregate_method(aggregate_method, quantile)
+            result_df = self._decode_labels(self.accumulator.aggregate(keys, fields, aggregate_method, quantile)).set_index(keys)
+        else:
+            if self._is_own_table(df):
+                df = self._table
+            result_df = self._aggregate(df, fields, aggregate_method, quantile, keys=keys).set_index(keys)
+
+        unique_sectors_seller = result_df.index.get_level_values(self.seller_sector_agent).unique()
+        unique_sectors_buyer = result_df.index.get_level_values(self.buyer_sector_agent).unique()
+
+        unique_sectors = sorted(set(unique_sectors_seller).union(set(unique_sectors_buyer)))
+
+        matrices = {}
+        for field in fields:
+            # (product, seller) x buyer, every product shares the same buyer axis
+            wide_df = result_df[field].unstack(self.buyer_sector_agent, fill_value=0).fillna(0)
+            wide_df = wide_df.reindex(columns=unique_sectors, fill_value=0)
+
+            for product, product_df in wide_df.groupby(level=0):
+                matrix_df = product_df.droplevel(0).reindex(index=unique_sectors, fill_value=0)
+                matrix_df.index.name = self.seller_sector_agent
+                matrix_df.columns.name = self.buyer_sector_agent
+
+                if insert_total:
+                    matrix_df = self._insert_totals(matrix_df, field)
+
+                matrices.setdefault(product, {})[field] = matrix_df
+
+        return matrices
+
+    def _stack_products(self,
+                        fields: list,
+                        products: list = None,
+                        df: pd.DataFrame = pd.DataFrame()
+                        ) -> tuple:
+        """Sums fields by (product, seller sector, buyer sector) into dense arrays on a global sector axis.
+
+        Parameters:
+        ----------
+
+        fields (list): The fields to sum.
+        products (list, optional): The products to stack, in this order. Default is every product, sorted.
+        df (pd.DataFrame, optional): DataFrame to use. If not provided, the class's DataFrame is used.
+
+        Returns:
+        -------
+
+        (tuple): ({field: array of shape (products, sectors, sectors)}, present sectors of shape (products, sectors), products, sectors).
+
+        Raises:
+        ------
+
+        KeyError: If a product is not found in the DataFrame."""
+        keys = [self.field_product_name, self.seller_sector_agent, self.buyer_sector_agent]
+
+        if self._is_own_table(df) and self._uses_accumulator(fields, 'sum'):
+            result_df = self._decode_labels(self.accumulator.aggregate(keys, fields))
+        else:
+            if self._is_own_table(df):
+                df = self._table
+            result_df = self._aggregate(df, fields, 'sum', keys=keys)
+
+        if products is None:
+            products = pd.Index(sorted(result_df[self.field_product_name].unique()))
+        else:
+            products = pd.Index(products)
+            missing = products.difference(result_df[self.field_product_name].unique())
+            if len(missing):
+                raise(KeyError(f"The selected products {list(missing)} were not found in the dataframe."))
+            result_df = result_df[result_df[self.field_product_name].isin(products)]
+
+        sectors = pd.Index(sorted(set(result_df[self.seller_sector_agent]).union(result_df[self.buyer_sector_agent])))
+
+        product_codes = products.get_indexer(result_df[self.field_product_name])
+        seller_codes = sectors.get_indexer(result_df[self.seller_sector_agent])
+        buyer_codes = sectors.get_indexer(result_df[self.buyer_sector_agent])
+
+        present = np.zeros((len(products), len(sectors)), dtype=bool)
+        present[product_codes, seller_codes] = True
+        present[product_codes, buyer_codes] = True
+
+        stacked = {}
+        for field in fields:
+            stacked[field] = np.zeros((len(products), len(sectors), len(sectors)))
+            stacked[field][product_codes, seller_codes, buyer_codes] = result_df[field].to_numpy(dtype=float)
+
+        return stacked, present, products, sectors
+
+    def create_pricing_tensor(self,
+                              products: list = None,
+                              qtt_field: str = '',
+                              val_field: str = '',
+                              df: pd.DataFrame = pd.DataFrame()
+                              ) -> ProductTensor:
+        """Computes the pricing matrices of several products at once, stacked on a global sector axis.
+
+        The quantities and values of every product are summed in a single
+        groupby and the implicit prices and pricing are computed on the
+        stacked arrays. ``tensor.matrix(product)`` equals format_pricing of
+        the product without its totals row and column.
+
+        Parameters:
+        ----------
+
+        products (list, optional): The products to stack, in this order. Default is every product, sorted.
+        qtt_field (str, optional): The quantity field to use. Default is the class's quantity_field.
+        val_field (str, optional): The value field to use. Default is the class's value_field.
+        df (pd.DataFrame, optional): DataFrame to use. If not provided, the class's DataFrame is used.
+
+        Returns:
+        -------
+
+        (ProductTensor): The pricing values of shape (products, sectors, sectors) and the present sectors of each product.
+
+        Raises:
+        ------
+
+        KeyError: If a product is not found in the DataFrame."""
+        if self._check_if_is_null_(qtt_field):
+            qtt_field = deepcopy(self.quantity_field)
+
+        if self._check_if_is_null_(val_field):
+            val_field = deepcopy(self.value_field)
+
+        stacked, present, products, sectors = self._stack_products([qtt_field, val_field], products, df)
+        quantities, values = stacked[qtt_field], stacked[val_field]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            implicit_price = np.nan_to_num(values / quantities, nan=0, posinf=np.inf, neginf=-np.inf)
+            pricing = implicit_price / self._pricing_reference(implicit_price, quantities, values, present)[:, None, None]
+
+        mask = present[:, :, None] & present[:, None, :]
+        return ProductTensor(np.where(mask, pricing, 0), present, products, sectors,
+                             self.seller_sector_agent, self.buyer_sector_agent)
+
+    def _pricing_reference(self,
+                           implicit_price: np.ndarray,
+                           quantities: np.ndarray,
+                           values: np.ndarray,
+                           present: np.ndarray
+                           ) -> np.ndarray:
+        """Returns the divisor of each product's pricing matrix, as in format_pricing.
+
+        It is the implicit price of the total sold by the product's first sector.
+
+        Returns:
+        -------
+
+        (np.ndarray): Array of shape (products,)."""
+        first = present.argmax(axis=1)
+        rows = np.arange(len(first))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reference = values.sum(axis=2)[rows, first] / quantities.sum(axis=2)[rows, first]
+        return np.nan_to_num(reference, nan=0, posinf=np.inf, neginf=-np.inf)
+
+    def create_level_matrices(self,
+                              product: str,
+                              matrice_type: str,
+                              aggregate_method: str = 'sum',
+                              seller_levels: list = ("SetorDoAgenteQueVendeI", "SetorDoAgenteQueVendeII", "SetorDoAgenteQueVendeIII"),
+                              buyer_levels: list = ("SetorDoAgenteQueCompraI", "SetorDoAgenteQueCompraII", "SetorDoAgenteQueCompraIII"),
+                              df: pd.DataFrame = pd.DataFrame(),
+                              insert_total = True,
+                              backend: str = None
+                              ) -> list:
+        """
+        Creates the matrices of every sector level from a single aggregation at the finest level.
+
+        The rows are grouped once by the full (level I, II, III) sector path of
+        the seller and of the buyer. Each level is then derived as C·M·Cᵀ,
+        with C the sparse indicator matrix of the level (see SectorHierarchy),
+        so coarser levels cost a small matrix product instead of a new groupby.
+        The matrix of a level equals create_matrices with seller_sector_agent
+        and buyer_sector_agent set to that level's fields.
+
+        Parameters:
+        ----------
+
+        product (str): The product to filter the data by.
+        matrice_type (str): The field to aggregate.
+        aggregate_method (str, optional): 'sum' or 'mean'. Default is 'sum'.
+        seller_levels (list, optional): The seller sector fields, from the coarsest to the finest level.
+        buyer_levels (list, optional): The buyer sector fields, in the same order.
+        df (pd.DataFrame, optional): DataFrame to use. If not provided, the class's DataFrame is used.
+        insert_total (bool, optional): Whether to append the totals row and column. Default is True.
+        backend (str, optional): 'dense' or 'sparse'. If not provided, the class's backend is used.
+
+        Returns:
+        -------
+
+        (list): The matrix of each level, in the order of the levels.
+
+        Raises:
+        ------
+
+        KeyError: If the specified product is not found in the DataFrame.
+        ValueError: If the aggregation method cannot be rolled up or the levels do not match."""
+        if aggregate_method not in ('sum', 'mean'):
+            raise(ValueError(f"The selected aggregate method cannot be rolled up: {aggregate_method}. Please select or 'sum' or 'mean'"))
+
+        seller_levels, buyer_levels = list(seller_levels), list(buyer_levels)
+        if len(seller_levels) != len(buyer_levels):
+            raise(ValueError("The seller and buyer sectors must have the same number of levels"))
+
+        if self._is_own_table(df):
+            df = self._table
+
+        selected_df = self._take(df, self._product_rows(df, product), seller_levels + buyer_levels + [matrice_type])
+
+        grouped = selected_df.groupby(seller_levels + buyer_levels, observed=True, dropna=False)[matrice_type]
+        fine_df = self._decode_labels(pd.DataFrame({
+            'sum': grouped.sum(),
+            'count': grouped.count(),
+            'rows': grouped.size()
+        }).reset_index())
+
+        seller_nodes = list(fine_df[seller_levels].itertuples(index=False, name=None))
+        buyer_nodes = list(fine_df[buyer_levels].itertuples(index=False, name=None))
+        hierarchy = SectorHierarchy(list(dict.fromkeys(seller_nodes + buyer_nodes)))
+
+        rows, cols = hierarchy.positions(seller_nodes), hierarchy.positions(buyer_nodes)
+        shape = (len(hierarchy.nodes), len(hierarchy.nodes))
+        fine = {name: sp.csr_matrix((fine_df[name].to_numpy(dtype=float), (rows, cols)), shape=shape)
+                for name in ('sum', 'count', 'rows')}
+
+        matrices = []
+        for level, (seller_level, buyer_level) in enumerate(zip(seller_levels, buyer_levels)):
+            labels, indicator = hierarchy.indicator(level)
+            rolled = {name: (indicator @ matrix @ indicator.T).tocsr() for name, matrix in fine.items()}
+
+            # Pairs observed at this level, like the groups of a groupby by the level's fields
+            observed = rolled['rows'].tocoo()
+            values = np.asarray(rolled['sum'][observed.row, observed.col]).ravel()
+            if aggregate_method == 'mean':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    values = values / np.asarray(rolled['count'][observed.row, observed.col]).ravel()
+
+            result_df = pd.DataFrame({
+                self.seller_sector_agent: labels[observed.row],
+                self.buyer_sector_agent: labels[observed.col],
+                matrice_type: values
+            })
+
+            matrix = self._to_output(self._matrices_from_aggregate(result_df, [matrice_type], insert_total, backend)[matrice_type])
+            matrix.index.name = seller_level
+            matrix.columns.name = buyer_level
+            matrices.append(matrix)
+
+        return matrices
+
     def _check_if_is_null_(self, data_to_test):
         """Checks if the provided data is null or empty.
 
@@ -197,9 +1208,6 @@ class Matrices(MatricesBase):
 
         (pd.DataFrame): The formatted quantity matrix.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-        
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
         
@@ -235,9 +1243,6 @@ class Matrices(MatricesBase):
         (pd.DataFrame): The formatted implicit price matrix.
         """
 
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-        
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
 
@@ -275,9 +1280,6 @@ class Matrices(MatricesBase):
 
         (pd.DataFrame): The formatted value matrix.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-        
         if self._check_if_is_null_(val_field):
             val_field = deepcopy(self.value_field)
 
@@ -312,9 +1314,6 @@ class Matrices(MatricesBase):
         (pd.DataFrame): The formatted implicit price matrix.
         """
 
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-        
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
 
@@ -322,24 +1321,10 @@ class Matrices(MatricesBase):
             val_field = deepcopy(self.value_field)
 
 
-        self.qtt_matrix = self.create_matrices(df=df,
-                                               product=product,
-                                               matrice_type=qtt_field,
-                                               aggregate_method='sum',
-                                               insert_total=True
-                                               ).rename(columns={f'Total{self.quantity_field}Sold': 'TotalImplicitPriceSold'}, index={f"Total{self.quantity_field}Bought": "TotalImplicitPriceBought"})
-        
-
-        self.val_matrix = self.create_matrices(
-                                                df=df,
-                                                product=product,
-                                                matrice_type=val_field,
-                                                aggregate_method='sum',
-                                                insert_total=True
-                                            ).rename(columns={f'Total{self.value_field}Sold': 'TotalImplicitPriceSold'}, index={f"Total{self.value_field}Bought": "TotalImplicitPriceBought"})
-
-
-        self.implicit_price_matrix = (self.val_matrix / self.qtt_matrix).fillna(0)
+        self.qtt_matrix, self.val_matrix, self.implicit_price_matrix = self._implicit_price_matrices(product=product,
+                                                                                                   qtt_field=qtt_field,
+                                                                                                   val_field=val_field,
+                                                                                                   df=df)
 
         return self.implicit_price_matrix
     
@@ -369,8 +1354,6 @@ class Matrices(MatricesBase):
 
         (pd.DataFrame): The formatted value matrix.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
 
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
@@ -389,3 +1372,189 @@ class Matrices(MatricesBase):
         self.pricing_matrix = self.implicit_price_matrix/self.implicit_price_matrix[implicit_price_last_column].iloc[0]
         
         return self.pricing_matrix
+
+    def product_matrix_set(self, product: str, qtt_field: str = '', val_field: str = '') -> dict:
+        """Builds the quantity, value, parametric, implicit price and pricing matrices of a product.
+
+        Parameters:
+        ----------
+
+        product (str): The product to filter the data by.
+        qtt_field (str, optional): The quantity field to use. Default is the class's quantity_field.
+        val_field (str, optional): The value field to use. Default is the class's value_field.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {'quantity', 'value', 'parametric', 'implicit_price', 'pricing': matrix}."""
+        graph = self.product_graph(product, qtt_field, val_field)
+        return {name: graph[name] for name in ('quantity', 'value', 'parametric', 'implicit_price', 'pricing')}
+
+    def product_graph(self, product: str, qtt_field: str = '', val_field: str = '', **filters) -> MatrixGraph:
+        """Returns the lazy graph of the derived matrices of a product on the class's DataFrame.
+
+        The nodes are 'flows' (the quantity and value aggregation, done once),
+        'totals', 'quantity', 'value', 'parametric', 'implicit_price' and
+        'pricing'. Each node is computed on first access and shared by the
+        nodes that depend on it; the values equal the format methods. The
+        graph is marked dirty when its data changes: append_transactions marks
+        the graphs of the touched products dirty, replacing the DataFrame or
+        clear_cache marks every graph dirty. Like the matrices, at most
+        cache_size graphs are kept, least recently used first out.
+
+        Parameters:
+        ----------
+
+        product (str): The product to filter the data by.
+        qtt_field (str, optional): The quantity field to use. Default is the class's quantity_field.
+        val_field (str, optional): The value field to use. Default is the class's value_field.
+        **filters: Extra row filters accepted by _select_rows, such as the seller or buyer location.
+
+        Returns:
+        -------
+
+        (MatrixGraph): The graph; graph['pricing'] returns the pricing matrix."""
+        if self._check_if_is_null_(qtt_field):
+            qtt_field = deepcopy(self.quantity_field)
+
+        if self._check_if_is_null_(val_field):
+            val_field = deepcopy(self.value_field)
+
+        key = (product, qtt_field, val_field, tuple(sorted(filters.items())))
+        if key in self._product_graphs:
+            self._product_graphs.move_to_end(key)
+            return self._product_graphs[key]
+
+        graph = self._build_product_graph(product, qtt_field, val_field, **filters)
+        if self.cache_size > 0:
+            self._product_graphs[key] = graph
+            while len(self._product_graphs) > self.cache_size:
+                self._product_graphs.popitem(last=False)
+        return graph
+
+    def _data_version(self, product: str) -> tuple:
+        """The version of the data of a product's graph: changed by clear_cache and by appending transactions of the product."""
+        return self._data_generation, self._product_versions.get(product, 0)
+
+    def _build_product_graph(self, product: str, qtt_field: str, val_field: str, **filters) -> MatrixGraph:
+        """Declares the nodes of a product graph. See product_graph."""
+        def flows():
+            return self._matrices_for(pd.DataFrame(), product, [qtt_field, val_field], 'sum', False, **filters)
+
+        def totals(flows):
+            return {field: matrix.with_totals(f"Total{field}Bought", f"Total{field}Sold") for field, matrix in flows.items()}
+
+        def parametric(quantity):
+            total_production = quantity[f"Total{qtt_field}Sold"].sort_values(ascending=False).iloc[1]
+            return quantity / total_production
+
+        graph = MatrixGraph(version=lambda: self._data_version(product))
+        graph.add('flows', flows)
+        graph.add('totals', totals, ('flows',))
+        graph.add('quantity', lambda totals: self._to_output(totals[qtt_field]), ('totals',))
+        graph.add('value', lambda totals: self._to_output(totals[val_field]), ('totals',))
+        graph.add('parametric', parametric, ('quantity',))
+        graph.add('implicit_price', lambda totals: self._to_output(self._implicit_price_from(totals, qtt_field, val_field)[2]), ('totals',))
+        self._add_pricing_node(graph, qtt_field, val_field)
+        return graph
+
+    def _add_pricing_node(self, graph: MatrixGraph, qtt_field: str, val_field: str) -> None:
+        """Declares the pricing node of a product graph, as format_pricing: the implicit price divided by its first total sold."""
+        graph.add('pricing', lambda implicit_price: implicit_price / implicit_price[implicit_price.columns[-1]].iloc[0], ('implicit_price',))
+
+    def build_product_matrices(self,
+                               products: list = None,
+                               n_workers: int = None,
+                               qtt_field: str = '',
+                               val_field: str = ''
+                               ) -> dict:
+        """Builds the matrix set of several products, optionally in a pool of processes.
+
+        With more than one worker, the columns used by the matrices are copied
+        once into shared memory and every worker attaches to them when it
+        starts, so the table is never pickled per product. Results are
+        returned in the order of products, whatever the order they finish in.
+
+        Parameters:
+        ----------
+
+        products (list, optional): The products to build. Default is every product of the DataFrame, sorted.
+        n_workers (int, optional): Number of worker processes. Default is None (in-process).
+        qtt_field (str, optional): The quantity field to use. Default is the class's quantity_field.
+        val_field (str, optional): The value field to use. Default is the class's value_field.
+
+        Returns:
+        -------
+
+        (dict): A dictionary {product: product_matrix_set(product)}.
+
+        Raises:
+        ------
+
+        KeyError: If a product is not found in the DataFrame."""
+        if self._check_if_is_null_(qtt_field):
+            qtt_field = deepcopy(self.quantity_field)
+
+        if self._check_if_is_null_(val_field):
+            val_field = deepcopy(self.value_field)
+
+        if products is None:
+            products = sorted(self.product_index)
+
+        tasks = [(product, qtt_field, val_field) for product in products]
+
+        if not n_workers or n_workers <= 1:
+            return {product: self.product_matrix_set(*task) for product, task in zip(products, tasks)}
+
+        columns = [field for fields in self._categorical_fields() for field in fields] + [qtt_field, val_field]
+        with SharedTable(self._table, columns) as shared_table:
+            with ProcessPoolExecutor(max_workers=n_workers,
+                                     initializer=_init_worker,
+                                     initargs=(self._worker_template(), shared_table.spec)) as executor:
+                results = list(executor.map(_build_product_in_worker, tasks))
+
+        return dict(zip(products, results))
+
+    def save_product_matrices(self,
+                              path: str,
+                              products: list = None,
+                              n_workers: int = None,
+                              qtt_field: str = '',
+                              val_field: str = ''
+                              ) -> MatrixStore:
+        """Builds the matrix set of several products and writes it to a memory-mapped MatrixStore.
+
+        The matrices are stored under (product, name) keys, e.g. ('AcaiFruto', 'pricing').
+
+        Parameters:
+        ----------
+
+        path (str): The store directory.
+        products (list, optional): The products to build. Default is every product of the DataFrame, sorted.
+        n_workers (int, optional): Number of worker processes. Default is None (in-process).
+        qtt_field (str, optional): The quantity field to use. Default is the class's quantity_field.
+        val_field (str, optional): The value field to use. Default is the class's value_field.
+
+        Returns:
+        -------
+
+        (MatrixStore): The opened store."""
+        return MatrixStore.write(path, self.build_product_matrices(products, n_workers, qtt_field, val_field))
+
+    def _worker_template(self) -> "Matrices":
+        """Returns a copy of the object without its table, caches or results, to be sent to the workers.
+
+        Workers keep a small matrix cache, so the matrix sets reuse the quantity and value aggregations."""
+        template = copy(self)
+        template._dataframe = pd.DataFrame()
+        template._encoded = pd.DataFrame()
+        template._pending_transactions = []
+        template._product_index = None
+        template._matrix_cache = OrderedDict()
+        template._product_graphs = OrderedDict()
+        template.cache_size = max(self.cache_size, 8)
+        template.accumulator = None
+        for attribute in ('qtt_matrix', 'value_matrix', 'val_matrix', 'parametric_matrix', 'implicit_price_matrix', 'pricing_matrix'):
+            setattr(template, attribute, pd.DataFrame())
+        return template
+
@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 from matrices.matrices import Matrices
+from matrices.flow_matrix import SparseFlowMatrix
+from matrices.location_tensor import LocationFlowTensor
+from matrices.accumulator import FlowAccumulator, ROW_COUNT
+from matrices.registry import SectorRegistry
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
+import numpy as np
 import pandas as pd
 
 
@@ -17,20 +23,36 @@ class MatricesLocal(Matrices):
         buyer_sector_agent: str = "SetorDoAgenteQueCompraI",
         seller_local_agent: str = "LocalDoAgenteQueVende",
         buyer_local_agent: str = "LocalDoAgenteQueCompra",
-        field_product_name: str = 'Produto'
+        field_product_name: str = 'Produto',
+        use_cache: bool = False,
+        backend: str = "dense",
+        cache_size: int = 0,
+        quantile_error: float = None,
+        sector_registry: SectorRegistry = None
     ):
+        #inicializar atributos de localização
+        self.seller_local_agent = seller_local_agent
+        self.buyer_local_agent = buyer_local_agent
+
         super().__init__(
             table_path=table_path,
             quantity_field=quantity_field,
             value_field=value_field,
             seller_sector_agent=seller_sector_agent,
             buyer_sector_agent=buyer_sector_agent,
-            field_product_name=field_product_name
+            field_product_name=field_product_name,
+            use_cache=use_cache,
+            backend=backend,
+            cache_size=cache_size,
+            quantile_error=quantile_error,
+            sector_registry=sector_registry
         )
 
-        #inicializar atributos de localização
-        self.seller_local_agent = seller_local_agent
-        self.buyer_local_agent = buyer_local_agent
+    def _categorical_fields(self) -> list:
+        """
+        Extends the encoded fields with the seller and buyer locations, which share one vocabulary.
+        """
+        return super()._categorical_fields() + [(self.seller_local_agent, self.buyer_local_agent)]
 
     def create_matrices(self,
                         product: str = None,
@@ -39,7 +61,10 @@ class MatricesLocal(Matrices):
                         df: pd.DataFrame = pd.DataFrame(),
                         insert_total=True,
                         seller_location: str = None,
-                        buyer_location: str = None) -> pd.DataFrame:
+                        buyer_location: str = None,
+                        backend: str = None,
+                        quantile: float = 0.5,
+                        fields: list = None) -> pd.DataFrame:
         """
         Extends the create_matrices method to add location-based filtering.
 
@@ -49,14 +74,40 @@ class MatricesLocal(Matrices):
         buyer_location (str, optional): The location to filter buyers.
 
         """
-        if df.empty:
-            df = self.dataframe.copy()
+        # Tentei herdar o restante de create_matrices, porém, 
+        # para product = None (não discriminar produtos), o método
+        # esbarra num trecho onde não é permitido na class Base 
+        # continuar o código sem passar o atributo 'product'. 
+        # Por isso, a seleção das linhas foi isolada em _select_rows.
+
+        if fields is not None:
+            return self._field_tensor(self._check_fields(fields), df, product, aggregate_method, quantile,
+                                      seller_location=seller_location, buyer_location=buyer_location)
+
+        matrices = self._matrices_for(df, product, [matrice_type], aggregate_method, insert_total, backend, quantile,
+                                      seller_location=seller_location, buyer_location=buyer_location)
+
+        return self._to_output(matrices[matrice_type])
+
+    def _select_rows(self,
+                     df: pd.DataFrame,
+                     product: str = None,
+                     seller_location: str = None,
+                     buyer_location: str = None,
+                     columns: list = None) -> pd.DataFrame:
+        """
+        Extends the row selection to filter by product and/or by seller or buyer location.
+
+        The location is only compared on the rows of the product, when one is given.
 
+        Raises:
+        ----------
+        KeyError: If the specified product is not found in the DataFrame.
+        ValueError: If both locations are given, or neither a product nor a location is given.
+        """
+        rows = None
         if product:
-            if not df[df[self.field_product_name] == product].empty:
-                df = df[df[self.field_product_name] == product]
-            else:
-                raise KeyError(f"The selected product {product} was not found in the dataframe.")
+            rows = self._product_rows(df, product)
 
         if seller_location and buyer_location:
             raise ValueError("You cannot filter by both seller and buyer locations simultaneously. Please choose one.")
@@ -65,53 +116,117 @@ class MatricesLocal(Matrices):
             raise ValueError("You must specify either a product or at least one location (seller or buyer).")
 
         if seller_location:
-            df = df[df[self.seller_local_agent] == seller_location]
+            rows = self._location_rows(df, self.seller_local_agent, seller_location, rows)
         elif buyer_location:
-            df = df[df[self.buyer_local_agent] == buyer_location]
+            rows = self._location_rows(df, self.buyer_local_agent, buyer_location, rows)
 
-        #return super().create_matrices(
-        #    product=product if product else "",  
-        #    matrice_type=matrice_type,
-        #    aggregate_method=aggregate_method,
-        #    df=df,
-        #    insert_total=insert_total
-        #)
+        return self._take(df, rows, columns)
 
-        # Tentei herdar o restante de create_matrices, porém, 
-        # para product = None (não discriminar produtos), o método
-        # esbarra num trecho onde não é permitido na class Base 
-        # continuar o código sem passar o atributo 'product'. 
-        # Por isso, reescrevi o restante do método a partir daqui. 
-
-        if aggregate_method == 'sum':
-            result_df = df.groupby([self.seller_sector_agent, self.buyer_sector_agent])[matrice_type].sum().reset_index()
-        elif aggregate_method == 'mean':
-            result_df = df.groupby([self.seller_sector_agent, self.buyer_sector_agent])[matrice_type].mean().reset_index()
-        elif aggregate_method == 'median':
-            result_df = df.groupby([self.seller_sector_agent, self.buyer_sector_agent])[matrice_type].median().reset_index()
-        else:
-            raise ValueError(f"The selected aggregate method '{aggregate_method}' is not valid. Choose 'sum', 'mean', or 'median'.")
+    def _accumulator_keys(self) -> list:
+        """
+        Extends the accumulator keys with the seller and buyer locations.
+        """
+        return super()._accumulator_keys() + [self.seller_local_agent, self.buyer_local_agent]
+
+    def _accumulator_filters(self, product: str = None, seller_location: str = None, buyer_location: str = None) -> dict:
+        """
+        Translates a selection into accumulator filters, with the same errors as _select_rows.
+
+        Raises:
+        ----------
+        KeyError: If the specified product is not found in the accumulated transactions.
+        ValueError: If both locations are given, or neither a product nor a location is given.
+        """
+        filters = super()._accumulator_filters(product) if product else {}
+
+        if seller_location and buyer_location:
+            raise ValueError("You cannot filter by both seller and buyer locations simultaneously. Please choose one.")
+
+        if not product and not seller_location and not buyer_location:
+            raise ValueError("You must specify either a product or at least one location (seller or buyer).")
+
+        if seller_location:
+            filters[self.seller_local_agent] = seller_location
+        elif buyer_location:
+            filters[self.buyer_local_agent] = buyer_location
+
+        return filters
+
+    def _location_rows(self, df: pd.DataFrame, field: str, location: str, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Returns the positions of the rows located in ``location``, optionally among ``rows`` only.
+        """
+        if rows is None:
+            return np.flatnonzero((df[field] == location).to_numpy())
+        return rows[(df[field].take(rows) == location).to_numpy()]
 
-        unique_sectors_seller = result_df[self.seller_sector_agent].unique()
-        unique_sectors_buyer = result_df[self.buyer_sector_agent].unique()
-        unique_sectors = sorted(set(unique_sectors_seller).union(set(unique_sectors_buyer)))
 
-        matrix_df = result_df.pivot_table(
-            index=self.seller_sector_agent,
-            columns=self.buyer_sector_agent,
-            values=matrice_type,
-            fill_value=0
-        ).reindex(index=unique_sectors, columns=unique_sectors, fill_value=0)
+    def create_location_tensor(self,
+                               product: str = None,
+                               fields: list = None,
+                               df: pd.DataFrame = pd.DataFrame(),
+                               backend: str = 'sparse') -> LocationFlowTensor:
+        """
+        Aggregates the flows once by seller location, buyer location, seller sector and buyer sector.
 
-        if insert_total:
-            total_bought = pd.DataFrame(matrix_df.apply(self._row_sum, axis=0).to_dict(), index=[f"Total{matrice_type}Bought"])
-            matrix_df = pd.concat([matrix_df, total_bought])
-            matrix_df.index.name = self.seller_sector_agent
-            matrix_df.columns.name = self.buyer_sector_agent
-            matrix_df[f"Total{matrice_type}Sold"] = matrix_df.apply(self._row_sum, axis=1)
+        Every location slice (by seller, by buyer, or by a seller and buyer pair)
+        is then answered by indexing the tensor, e.g.
+        ``tensor.matrix('Quantidade', seller_location='Cametá', buyer_location='Belém')``.
+        When the accumulator holds the fields, the tensor is built from the
+        accumulated groups instead of the transactions.
 
-        return matrix_df
+        Parameters:
+        ----------
+        product (str, optional): The product to filter the data by. Default is None (every product).
+        fields (list, optional): The fields to aggregate. Default is the quantity and value fields.
+        df (pd.DataFrame, optional): DataFrame to use. If not provided, the class's DataFrame is used.
+        backend (str, optional): 'sparse' for a CSR layout or 'dense' for a 4-D array. Default is 'sparse', whatever the class's
+            backend: the dense layout allocates locations² x sectors² cells per array and is only meant for few locations.
 
+        Returns:
+        ----------
+        (LocationFlowTensor): The aggregated tensor.
+
+        Raises:
+        ----------
+        KeyError: If the specified product is not found in the DataFrame.
+        """
+        if not fields:
+            fields = [self.quantity_field, self.value_field]
+
+        backend = self._check_backend(backend)
+
+        if self._is_own_table(df) and self._uses_accumulator(fields, 'sum'):
+            keys = [self.seller_local_agent, self.buyer_local_agent, self.seller_sector_agent, self.buyer_sector_agent]
+            filters = super()._accumulator_filters(product) if product else {}
+            return LocationFlowTensor.from_groups(
+                self._decode_labels(self.accumulator.totals(keys, **filters)),
+                fields=fields,
+                count_columns={field: FlowAccumulator._count_column(field) for field in fields},
+                row_count_column=ROW_COUNT,
+                seller_local_agent=self.seller_local_agent,
+                buyer_local_agent=self.buyer_local_agent,
+                seller_sector_agent=self.seller_sector_agent,
+                buyer_sector_agent=self.buyer_sector_agent,
+                sparse=backend == 'sparse'
+            )
+
+        if self._is_own_table(df):
+            df = self._table
+
+        columns = list(dict.fromkeys([self.seller_local_agent, self.buyer_local_agent,
+                                      self.seller_sector_agent, self.buyer_sector_agent] + list(fields)))
+        rows = self._product_rows(df, product) if product else np.arange(len(df))
+
+        return LocationFlowTensor.from_rows(
+            self._take(df, rows, columns),
+            fields=fields,
+            seller_local_agent=self.seller_local_agent,
+            buyer_local_agent=self.buyer_local_agent,
+            seller_sector_agent=self.seller_sector_agent,
+            buyer_sector_agent=self.buyer_sector_agent,
+            sparse=backend == 'sparse'
+        )
 
     def format_quantity(
         self,
@@ -124,9 +239,6 @@ class MatricesLocal(Matrices):
         """
         Formats and creates a quantity matrix with location-based filtering.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
 
@@ -151,9 +263,6 @@ class MatricesLocal(Matrices):
         """
         Formats and creates an implicit price matrix with location-based filtering.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
 
@@ -183,9 +292,6 @@ class MatricesLocal(Matrices):
         """
         Formats and creates a value matrix with location-based filtering.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-
         if self._check_if_is_null_(val_field):
             val_field = deepcopy(self.value_field)
 
@@ -212,43 +318,22 @@ class MatricesLocal(Matrices):
         """
         Formats and creates an implicit price matrix with location-based filtering.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
 
         if self._check_if_is_null_(val_field):
             val_field = deepcopy(self.value_field)
 
-        self.qtt_matrix = self.create_matrices(
-            df=df,
+        self.qtt_matrix, self.val_matrix, self.implicit_price_matrix = self._implicit_price_matrices(
             product=product,
-            matrice_type=qtt_field,
-            aggregate_method='sum',
-            insert_total=insert_total,
-            seller_location=seller_location,
-            buyer_location=buyer_location
-        ).rename(
-            columns={f'Total{self.quantity_field}Sold': 'TotalImplicitPriceSold'},
-            index={f"Total{self.quantity_field}Bought": "TotalImplicitPriceBought"}
-        )
-
-        self.val_matrix = self.create_matrices(
+            qtt_field=qtt_field,
+            val_field=val_field,
             df=df,
-            product=product,
-            matrice_type=val_field,
-            aggregate_method='sum',
             insert_total=insert_total,
             seller_location=seller_location,
             buyer_location=buyer_location
-        ).rename(
-            columns={f'Total{self.value_field}Sold': 'TotalImplicitPriceSold'},
-            index={f"Total{self.value_field}Bought": "TotalImplicitPriceBought"}
         )
 
-        self.implicit_price_matrix = (self.val_matrix / self.qtt_matrix).fillna(0)
-
         return self.implicit_price_matrix
 
     def format_pricing(
@@ -264,9 +349,6 @@ class MatricesLocal(Matrices):
         """
         Formats and creates the pricing matrix with location-based filtering.
         """
-        if self._check_if_is_null_(df):
-            df = self.dataframe.copy()
-
         if self._check_if_is_null_(qtt_field):
             qtt_field = deepcopy(self.quantity_field)
 
@@ -283,6 +365,216 @@ class MatricesLocal(Matrices):
             buyer_location=buyer_location
         )
 
-        self.pricing_matrix = self.implicit_price_matrix / self.implicit_price_matrix.iloc[0].mean()
+        if isinstance(self.implicit_price_matrix, SparseFlowMatrix):
+            first_row = self.implicit_price_matrix.row(0)
+        else:
+            first_row = self.implicit_price_matrix.iloc[0]
+
+        self.pricing_matrix = self.implicit_price_matrix / first_row.mean()
+
+        return self.pricing_matrix
+
+    def _pricing_reference(self, implicit_price, quantities, values, present) -> np.ndarray:
+        """
+        Overrides the divisor of the pricing tensor: the mean of the first row of each implicit price matrix, as in format_pricing.
+        """
+        first = present.argmax(axis=1)
+        first_rows = implicit_price[np.arange(len(first)), first]
+        return np.where(present, first_rows, 0).sum(axis=1) / present.sum(axis=1)
+
+    def _add_pricing_node(self, graph, qtt_field: str, val_field: str) -> None:
+        """
+        Overrides the pricing node of the product graph, as format_pricing: the implicit price without totals divided by the mean of its first row.
+        """
+        graph.add('pricing', lambda flows: self._to_output(_pricing_from_implicit_price((flows[val_field] / flows[qtt_field]).fillna(0))),
+                  ('flows',))
+
+    def _location_field(self, side: str) -> str:
+        """
+        Returns the location field of a side of the transaction.
+
+        Raises:
+        ----------
+        ValueError: If side is neither 'seller' nor 'buyer'.
+        """
+        if side == 'seller':
+            return self.seller_local_agent
+        if side == 'buyer':
+            return self.buyer_local_agent
+        raise ValueError(f"The selected side '{side}' is not valid. Choose 'seller' or 'buyer'.")
+
+    def _matrices_by_location(self,
+                              product: str,
+                              side: str,
+                              fields: list,
+                              insert_total=True,
+                              df: pd.DataFrame = pd.DataFrame()) -> dict:
+        """
+        Aggregates once by (location, seller sector, buyer sector) and builds the matrices of every location.
+
+        Each location's matrices are the same as create_matrices with that
+        seller_location or buyer_location, without rescanning the table.
+
+        Returns:
+        ----------
+        (dict): A dictionary {location: {field: FlowMatrix or SparseFlowMatrix}}, sorted by location.
+        """
+        location_field = self._location_field(side)
+        keys = [location_field, self.seller_sector_agent, self.buyer_sector_agent]
+
+        if self._is_own_table(df) and self._uses_accumulator(fields, 'sum'):
+            filters = self._accumulator_filters(product) if product else {}
+            result_df = self._decode_labels(self.accumulator.aggregate(keys, fields, **filters))
+        else:
+            if self._is_own_table(df):
+                df = self._table
+
+            rows = self._product_rows(df, product) if product else np.arange(len(df))
+            selected_df = self._take(df, rows, list(dict.fromkeys(keys + list(fields))))
+
+            result_df = selected_df.groupby(keys, observed=True)[fields].sum().reset_index()
+            result_df = self._decode_labels(result_df)
+
+        return {
+            location: self._matrices_from_aggregate(location_df, fields, insert_total)
+            for location, location_df in result_df.groupby(location_field, sort=True)
+        }
+
+    def format_quantity_by_location(
+        self,
+        product: str = None,
+        side: str = 'seller',
+        qtt_field: str = '',
+        df: pd.DataFrame = pd.DataFrame()
+    ) -> dict:
+        """
+        Formats the quantity matrix of every seller (or buyer) location in one grouped pass.
+
+        Returns:
+        ----------
+        (dict): A dictionary {location: matrix}, equal to format_quantity for each location.
+        """
+        if self._check_if_is_null_(qtt_field):
+            qtt_field = deepcopy(self.quantity_field)
+
+        matrices = self._matrices_by_location(product, side, [qtt_field], df=df)
+        return {location: self._to_output(fields[qtt_field]) for location, fields in matrices.items()}
+
+    def format_value_by_location(
+        self,
+        product: str = None,
+        side: str = 'seller',
+        val_field: str = '',
+        df: pd.DataFrame = pd.DataFrame()
+    ) -> dict:
+        """
+        Formats the value matrix of every seller (or buyer) location in one grouped pass.
+
+        Returns:
+        ----------
+        (dict): A dictionary {location: matrix}, equal to format_value for each location.
+        """
+        if self._check_if_is_null_(val_field):
+            val_field = deepcopy(self.value_field)
+
+        matrices = self._matrices_by_location(product, side, [val_field], df=df)
+        return {location: self._to_output(fields[val_field]) for location, fields in matrices.items()}
+
+    def format_parametric_by_location(
+        self,
+        product: str = None,
+        side: str = 'seller',
+        qtt_field: str = '',
+        df: pd.DataFrame = pd.DataFrame()
+    ) -> dict:
+        """
+        Formats the parametric matrix of every seller (or buyer) location in one grouped pass.
+
+        Returns:
+        ----------
+        (dict): A dictionary {location: matrix}, equal to format_parametric for each location.
+        """
+        if self._check_if_is_null_(qtt_field):
+            qtt_field = deepcopy(self.quantity_field)
+
+        parametric_matrices = {}
+        for location, fields in self._matrices_by_location(product, side, [qtt_field], df=df).items():
+            qtt_matrix = fields[qtt_field]
+            total_production = qtt_matrix[f"Total{qtt_field}Sold"].sort_values(ascending=False).iloc[1]
+            parametric_matrices[location] = self._to_output(qtt_matrix / total_production)
+
+        return parametric_matrices
+
+    def format_implicit_price_by_location(
+        self,
+        product: str = None,
+        side: str = 'seller',
+        qtt_field: str = '',
+        val_field: str = '',
+        df: pd.DataFrame = pd.DataFrame(),
+        insert_total=True
+    ) -> dict:
+        """
+        Formats the implicit price matrix of every seller (or buyer) location in one grouped pass.
+
+        Quantity and value are aggregated together, as in format_implicit_price.
+
+        Returns:
+        ----------
+        (dict): A dictionary {location: matrix}, equal to format_implicit_price for each location.
+        """
+        if self._check_if_is_null_(qtt_field):
+            qtt_field = deepcopy(self.quantity_field)
+
+        if self._check_if_is_null_(val_field):
+            val_field = deepcopy(self.value_field)
+
+        return {
+            location: self._to_output(self._implicit_price_from(fields, qtt_field, val_field)[2])
+            for location, fields in self._matrices_by_location(product, side, [qtt_field, val_field], insert_total, df).items()
+        }
+
+    def format_pricing_by_location(
+        self,
+        product: str = None,
+        side: str = 'seller',
+        qtt_field: str = '',
+        val_field: str = '',
+        df: pd.DataFrame = pd.DataFrame(),
+        n_workers: int = None
+    ) -> dict:
+        """
+        Formats the pricing matrix of every seller (or buyer) location in one grouped pass.
+
+        Additional Parameters:
+        ----------
+        n_workers (int, optional): Number of processes used to derive the pricing
+            matrices from the implicit prices. Default is None (in-process).
+
+        Returns:
+        ----------
+        (dict): A dictionary {location: matrix}, equal to format_pricing for each location.
+        """
+        if self._check_if_is_null_(qtt_field):
+            qtt_field = deepcopy(self.quantity_field)
+
+        if self._check_if_is_null_(val_field):
+            val_field = deepcopy(self.value_field)
+
+        implicit_price_matrices = {
+            location: self._implicit_price_from(fields, qtt_field, val_field)[2]
+            for location, fields in self._matrices_by_location(product, side, [qtt_field, val_field], False, df).items()
+        }
+
+        if n_workers and n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                pricing_matrices = list(executor.map(_pricing_from_implicit_price, implicit_price_matrices.values()))
+        else:
+            pricing_matrices = [_pricing_from_implicit_price(matrix) for matrix in implicit_price_matrices.values()]
+
+        return {location: self._to_output(matrix) for location, matrix in zip(implicit_price_matrices, pricing_matrices)}
+
 
-        return self.pricing_matrix
\ No newline at end of file
+def _pricing_from_implicit_price(implicit_price_matrix):
+    """Divides an implicit price matrix by the mean of its first row, as MatricesLocal.format_pricing does."""
+    return implicit_price_matrix / implicit_price_matrix.row(0).mean()
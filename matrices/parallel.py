@@ -0,0 +1,99 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+class SharedTable:
+    """
+    Columns of a DataFrame copied once into shared memory.
+
+    Numeric columns are shared as they are; categorical and text columns are
+    shared as integer codes, with their (small) categories sent along. Worker
+    processes rebuild the DataFrame from ``spec`` with ``attach``, reading the
+    shared buffers instead of receiving a pickled copy of the table.
+
+    Attributes:
+        spec (list): (column, shared memory name, dtype, length, categories) of each column.
+    """
+    def __init__(self, df: pd.DataFrame, columns: list) -> None:
+        """
+        Copies the selected columns of a DataFrame into shared memory.
+
+        Args:
+            df (pd.DataFrame): The table.
+            columns (list): The columns to share.
+        """
+        self.spec = []
+        self._segments = []
+
+        for column in dict.fromkeys(columns):
+            values, categories = _column_values(df[column])
+            segment = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)[:] = values
+
+            self._segments.append(segment)
+            self.spec.append((column, segment.name, values.dtype.str, len(values), categories))
+
+    @staticmethod
+    def attach(spec: list) -> tuple:
+        """
+        Rebuilds the shared DataFrame in another process.
+
+        Args:
+            spec (list): The ``spec`` of a SharedTable.
+
+        Returns:
+            tuple: The DataFrame and the attached segments, which must be kept alive while it is used.
+        """
+        columns, segments = {}, []
+        for column, name, dtype, length, categories in spec:
+            segment = shared_memory.SharedMemory(name=name)
+            values = np.ndarray((length,), dtype=np.dtype(dtype), buffer=segment.buf)
+            columns[column] = values if categories is None else pd.Categorical.from_codes(values, categories=categories)
+            segments.append(segment)
+
+        return pd.DataFrame(columns, copy=False), segments
+
+    def close(self) -> None:
+        """Releases and removes the shared memory segments."""
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+    def __enter__(self) -> "SharedTable":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _column_values(series: pd.Series) -> tuple:
+    """Returns the array stored in shared memory for a column, and its categories if it is encoded."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy(), None
+
+    codes, categories = pd.factorize(series)
+    return codes, categories
+
+
+# State of a worker process, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(template, spec: list) -> None:
+    """Attaches the shared table and gives it to a copy of the Matrices object of the parent process."""
+    dataframe, segments = SharedTable.attach(spec)
+    template._dataframe = dataframe
+    template._encoded = dataframe
+    _worker['matrices'] = template
+    _worker['segments'] = segments
+
+
+def _build_product_in_worker(task: tuple) -> dict:
+    product, qtt_field, val_field = task
+    return _worker['matrices'].product_matrix_set(product, qtt_field, val_field)
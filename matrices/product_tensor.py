@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+class ProductTensor:
+    """
+    The sectors x sectors matrices of several products stacked on a shared sector axis.
+
+    ``values[p]`` is the matrix of ``products[p]`` laid on the global sector
+    axis; ``present[p, s]`` tells whether ``sectors[s]`` appears in that
+    product's own matrix. Cells of absent sectors hold 0, so cross-product
+    statistics are plain NumPy reductions, e.g.
+    ``np.nanmean(np.where(tensor.mask, tensor.values, np.nan), axis=0)``.
+
+    Attributes:
+        values (np.ndarray): Array of shape (products, sectors, sectors).
+        present (np.ndarray): Boolean array of shape (products, sectors).
+        products (pd.Index): The product axis.
+        sectors (pd.Index): The sector axis, shared by sellers and buyers.
+    """
+    def __init__(self,
+                 values: np.ndarray,
+                 present: np.ndarray,
+                 products: pd.Index,
+                 sectors: pd.Index,
+                 seller_sector_agent: str = None,
+                 buyer_sector_agent: str = None) -> None:
+        """
+        Initializes the ProductTensor object.
+
+        Args:
+            values (np.ndarray): Array of shape (products, sectors, sectors).
+            present (np.ndarray): Boolean array of shape (products, sectors).
+            products (pd.Index): The product axis.
+            sectors (pd.Index): The sector axis.
+            seller_sector_agent (str, optional): Name of the seller sector axis.
+            buyer_sector_agent (str, optional): Name of the buyer sector axis.
+        """
+        self.values = np.asarray(values, dtype=float)
+        self.present = np.asarray(present, dtype=bool)
+        self.products = pd.Index(products)
+        self.sectors = pd.Index(sectors)
+        self.seller_sector_agent = seller_sector_agent
+        self.buyer_sector_agent = buyer_sector_agent
+
+        if self.values.shape != (len(self.products), len(self.sectors), len(self.sectors)):
+            raise ValueError(f"The values shape {self.values.shape} does not match {len(self.products)} products and {len(self.sectors)} sectors.")
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Boolean array of shape (products, sectors, sectors), True where both sectors are present in the product."""
+        return self.present[:, :, None] & self.present[:, None, :]
+
+    def matrix(self, product: str) -> pd.DataFrame:
+        """
+        Returns the matrix of a product restricted to its own sectors, like the per-product methods.
+
+        Args:
+            product (str): The product.
+
+        Returns:
+            pd.DataFrame: The sectors x sectors matrix.
+
+        Raises:
+            KeyError: If the product is not in the tensor.
+        """
+        position = self.products.get_loc(product)
+        present = np.flatnonzero(self.present[position])
+        return pd.DataFrame(self.values[position][np.ix_(present, present)],
+                            index=self.sectors[present].rename(self.seller_sector_agent),
+                            columns=self.sectors[present].rename(self.buyer_sector_agent))
+
+    def __repr__(self) -> str:
+        return f"ProductTensor(products={len(self.products)}, sectors={len(self.sectors)})"
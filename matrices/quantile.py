@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch in the style of KLL (Karnin, Lang and Liberty).
+
+    Values are appended to a stack of compactors. When the sketch outgrows its
+    capacity, a full compactor is sorted and every other item is promoted to
+    the next level with twice the weight, so memory stays O(k) however many
+    values are streamed. Sketches built on separate chunks can be merged.
+
+    While no compaction has happened the sketch holds every value and the
+    quantiles are exact (linear interpolation, like pandas).
+
+    Attributes:
+        k (int): Capacity of the top compactor, which controls the error.
+        count (int): Number of non-missing values streamed into the sketch.
+    """
+    def __init__(self, k: int = 200, seed: int = 0) -> None:
+        """
+        Initializes an empty sketch.
+
+        Args:
+            k (int, optional): Capacity of the top compactor. Defaults to 200.
+            seed (int, optional): Seed of the compaction coin flips, for reproducible results. Defaults to 0.
+        """
+        if k < 2:
+            raise ValueError(f"The sketch capacity must be at least 2, got {k}.")
+
+        self.k = k
+        self.count = 0
+        self._compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @staticmethod
+    def k_for_error(error: float) -> int:
+        """
+        Returns the capacity whose rank error is about ``error`` (e.g. 0.01 for 1% of the values).
+
+        Args:
+            error (float): The rank error bound, between 0 and 1.
+
+        Returns:
+            int: The capacity to pass to the sketch.
+        """
+        if not 0 < error < 1:
+            raise ValueError(f"The quantile error must be between 0 and 1, got {error}.")
+        return max(8, int(np.ceil(1.7 / error)))
+
+    @property
+    def is_exact(self) -> bool:
+        """Whether every streamed value is still held by the sketch."""
+        return len(self._compactors) == 1
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._compactors) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(compactor) for compactor in self._compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self._compactors)))
+
+    def update(self, values) -> "QuantileSketch":
+        """
+        Streams values into the sketch. Missing values are ignored.
+
+        Args:
+            values: A scalar or array-like of numbers.
+
+        Returns:
+            QuantileSketch: The sketch itself.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.count += len(values)
+        self._compactors[0] = np.concatenate([self._compactors[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """
+        Adds the values summarized by another sketch to this one.
+
+        Args:
+            other (QuantileSketch): The sketch to merge.
+
+        Returns:
+            QuantileSketch: The sketch itself.
+        """
+        while len(self._compactors) < len(other._compactors):
+            self._compactors.append(np.empty(0))
+
+        for level, compactor in enumerate(other._compactors):
+            self._compactors[level] = np.concatenate([self._compactors[level], compactor])
+
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        while self._size() > self._max_size():
+            for level, compactor in enumerate(self._compactors):
+                if len(compactor) < self._capacity(level):
+                    continue
+
+                if level + 1 == len(self._compactors):
+                    self._compactors.append(np.empty(0))
+
+                compactor = np.sort(compactor)
+                # An odd item stays behind so the promoted half keeps the weight exact
+                kept = compactor[len(compactor) - len(compactor) % 2:]
+                promoted = compactor[:len(compactor) - len(kept)][self._rng.integers(2)::2]
+
+                self._compactors[level] = kept
+                self._compactors[level + 1] = np.concatenate([self._compactors[level + 1], promoted])
+                break
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns the approximate q-quantile of the streamed values.
+
+        Args:
+            q (float): The quantile, between 0 and 1 (0.5 is the median).
+
+        Returns:
+            float: The quantile, or NaN if no value was streamed.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError(f"The quantile must be between 0 and 1, got {q}.")
+
+        if self.count == 0:
+            return np.nan
+
+        if self.is_exact:
+            return float(np.quantile(self._compactors[0], q))
+
+        values = np.concatenate(self._compactors)
+        weights = np.concatenate([np.full(len(compactor), 2.0 ** level) for level, compactor in enumerate(self._compactors)])
+
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(values[order][min(position, len(values) - 1)])
+
+    def __repr__(self) -> str:
+        return f"QuantileSketch(k={self.k}, count={self.count}, levels={len(self._compactors)})"
+
+
+class GroupedQuantileSketch:
+    """
+    One QuantileSketch per group, e.g. per (seller sector, buyer sector) pair.
+
+    Chunks of transactions are streamed with ``update`` and partial results
+    are combined with ``merge``, so the same object serves in-memory,
+    chunked and incremental aggregation.
+
+    Attributes:
+        keys (list): The grouping fields.
+        field (str): The aggregated field.
+        sketches (dict): {group: QuantileSketch}.
+    """
+    def __init__(self, keys: list, field: str, k: int = 200, seed: int = 0) -> None:
+        """
+        Initializes an empty grouped sketch.
+
+        Args:
+            keys (list): The grouping fields.
+            field (str): The aggregated field.
+            k (int, optional): Capacity of each group's sketch. Defaults to 200.
+            seed (int, optional): Seed of the compaction coin flips. Defaults to 0.
+        """
+        self.keys = list(keys)
+        self.field = field
+        self.k = k
+        self.seed = seed
+        self.sketches = {}
+
+    def _sketch(self, group) -> QuantileSketch:
+        if group not in self.sketches:
+            self.sketches[group] = QuantileSketch(self.k, self.seed)
+        return self.sketches[group]
+
+    def update(self, df: pd.DataFrame) -> "GroupedQuantileSketch":
+        """
+        Streams a chunk of transactions into the sketches of its groups.
+
+        Args:
+            df (pd.DataFrame): The chunk, with the grouping fields and the aggregated field.
+
+        Returns:
+            GroupedQuantileSketch: The grouped sketch itself.
+        """
+        values = df[self.field].to_numpy(dtype=float)
+        for group, rows in df.groupby(self.keys, observed=True, sort=False, dropna=False).indices.items():
+            self._sketch(group).update(values[rows])
+        return self
+
+    def merge(self, other: "GroupedQuantileSketch") -> "GroupedQuantileSketch":
+        """
+        Adds the groups of another grouped sketch to this one.
+
+        Args:
+            other (GroupedQuantileSketch): The grouped sketch to merge.
+
+        Returns:
+            GroupedQuantileSketch: The grouped sketch itself.
+        """
+        for group, sketch in other.sketches.items():
+            self._sketch(group).merge(sketch)
+        return self
+
+    def quantiles(self, q: float) -> pd.Series:
+        """
+        Returns the q-quantile of every group.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            pd.Series: The quantiles, indexed by the groups.
+        """
+        if len(self.keys) == 1:
+            index = pd.Index(list(self.sketches), name=self.keys[0])
+        else:
+            index = pd.MultiIndex.from_tuples(list(self.sketches), names=self.keys)
+        return pd.Series([sketch.quantile(q) for sketch in self.sketches.values()], index=index, name=self.field, dtype=float)
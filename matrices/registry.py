@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+
+class SectorRegistry:
+    """
+    Vocabulary of sectors with stable integer positions.
+
+    A sector keeps the position it was registered at, so matrices of
+    different products, locations or years laid on the registry axis have
+    the same shape and line up cell by cell: comparing them is plain array
+    arithmetic, without reindexing. New sectors are appended at the end, so
+    an array aligned before they were registered is still valid once padded
+    with zeros (see ``align`` and ``to_pandas``).
+
+    ``sector_registry`` is the process-wide instance used by default; pass
+    another SectorRegistry to the matrix producers to keep a dataset-wide one.
+
+    Attributes:
+        sectors (pd.Index): The registered sectors, in position order.
+    """
+    def __init__(self, sectors: list = ()) -> None:
+        """
+        Initializes the registry.
+
+        Args:
+            sectors (list, optional): Sectors to register first, in order.
+        """
+        self._positions = {}
+        self._sectors = []
+        self.register(sectors)
+
+    @property
+    def sectors(self) -> pd.Index:
+        return pd.Index(self._sectors)
+
+    def __len__(self) -> int:
+        return len(self._sectors)
+
+    def __contains__(self, sector) -> bool:
+        return sector in self._positions
+
+    def register(self, sectors) -> np.ndarray:
+        """
+        Registers the sectors not seen yet and returns the position of each one.
+
+        Missing labels (NaN) are not sectors and are given position -1.
+
+        Args:
+            sectors (list-like): The sector labels.
+
+        Returns:
+            np.ndarray: The position of each label.
+        """
+        positions = np.empty(len(sectors), dtype=np.int64)
+        for i, sector in enumerate(sectors):
+            if pd.isna(sector):
+                positions[i] = -1
+                continue
+            if sector not in self._positions:
+                self._positions[sector] = len(self._sectors)
+                self._sectors.append(sector)
+            positions[i] = self._positions[sector]
+        return positions
+
+    def positions(self, sectors) -> np.ndarray:
+        """
+        Returns the position of each sector, without registering.
+
+        Raises:
+            KeyError: If a sector is not registered.
+        """
+        return np.fromiter((self._positions[sector] for sector in sectors), dtype=np.int64, count=len(sectors))
+
+    def align(self, values, rows=None, columns=None) -> np.ndarray:
+        """
+        Lays a matrix, or a stack of matrices, on the registry axis.
+
+        Sectors not registered yet are registered. Cells of sectors absent
+        from the matrix hold 0.
+
+        Args:
+            values (np.ndarray, pd.DataFrame, FlowMatrix or SparseFlowMatrix): Array of shape (..., rows, columns), or a labeled matrix.
+            rows (list-like, optional): The row sectors. Defaults to the index of a labeled matrix.
+            columns (list-like, optional): The column sectors. Defaults to the columns of a labeled matrix, or to rows.
+
+        Returns:
+            np.ndarray: Array of shape (..., sectors, sectors).
+
+        Raises:
+            ValueError: If the labels do not match the shape of values.
+        """
+        if hasattr(values, 'index'):
+            rows = values.index if rows is None else rows
+            columns = values.columns if columns is None else columns
+            values = values.to_pandas() if not isinstance(values, pd.DataFrame) else values
+        values = np.asarray(values, dtype=float)
+        columns = rows if columns is None else columns
+
+        if values.shape[-2:] != (len(rows), len(columns)):
+            raise ValueError(f"Labels of shape {(len(rows), len(columns))} do not match values of shape {values.shape}.")
+
+        row_positions = self.register(rows)
+        column_positions = self.register(columns)
+        kept_rows, kept_columns = row_positions >= 0, column_positions >= 0
+
+        aligned = np.zeros(values.shape[:-2] + (len(self), len(self)))
+        aligned[..., row_positions[kept_rows, None], column_positions[None, kept_columns]] = \
+            values[..., np.flatnonzero(kept_rows)[:, None], np.flatnonzero(kept_columns)[None, :]]
+        return aligned
+
+    def select(self, values: np.ndarray, rows, columns=None) -> np.ndarray:
+        """
+        Reads the cells of some sectors from an array aligned to the registry.
+
+        Args:
+            values (np.ndarray): Array of shape (..., n, n), aligned when the registry had n sectors.
+            rows (list-like): The row sectors.
+            columns (list-like, optional): The column sectors. Defaults to rows.
+
+        Returns:
+            np.ndarray: Array of shape (..., rows, columns).
+
+        Raises:
+            KeyError: If a sector is not registered.
+        """
+        values = self._padded(values)
+        columns = rows if columns is None else columns
+        return values[..., self.positions(rows)[:, None], self.positions(columns)[None, :]]
+
+    def to_pandas(self, values: np.ndarray, index_name: str = None, columns_name: str = None) -> pd.DataFrame:
+        """
+        Labels a sectors x sectors array aligned to the registry.
+
+        Args:
+            values (np.ndarray): Array of shape (n, n), aligned when the registry had n sectors.
+            index_name (str, optional): Name of the row axis.
+            columns_name (str, optional): Name of the column axis.
+
+        Returns:
+            pd.DataFrame: The matrix over every registered sector.
+        """
+        return pd.DataFrame(self._padded(values),
+                            index=self.sectors.rename(index_name),
+                            columns=self.sectors.rename(columns_name))
+
+    def _padded(self, values: np.ndarray) -> np.ndarray:
+        """Pads with zeros an array aligned before the last sectors were registered."""
+        values = np.asarray(values, dtype=float)
+        missing = len(self) - values.shape[-1]
+        if missing < 0 or values.shape[-2] != values.shape[-1]:
+            raise ValueError(f"An array of shape {values.shape} is not aligned to a registry of {len(self)} sectors.")
+        if missing:
+            values = np.pad(values, [(0, 0)] * (values.ndim - 2) + [(0, missing), (0, missing)])
+        return values
+
+    def __repr__(self) -> str:
+        return f"SectorRegistry(sectors={len(self)})"
+
+
+# Process-wide registry used when a matrix producer is not given one
+sector_registry = SectorRegistry()
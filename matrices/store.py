@@ -0,0 +1,200 @@
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from matrices.flow_matrix import FlowMatrix, SparseFlowMatrix
+
+
+VALUES_FILE = "values-{version}.npy"
+INDEX_FILE = "index.json"
+
+
+class MatrixStore:
+    """
+    Read-only store of a matrix set: one contiguous float64 array plus a JSON label index.
+
+    Every matrix is written row-major, one after the other, into
+    ``values-<version>.npy``; ``index.json`` holds the version plus the key,
+    offset, shape and labels of each matrix. Readers memory-map the array, so the processes opening the
+    same store share the page cache and a matrix is a slice of the map: no
+    parsing and no copy until it is used.
+
+    Keys are strings or tuples of strings, e.g. (product, 'pricing'). Nested
+    dictionaries, like the result of Matrices.build_product_matrices, are
+    flattened into tuple keys.
+
+    Attributes:
+        path (str): The store directory.
+        version (str): The version of the store, changed by every write.
+        values (np.memmap): The memory-mapped values of every matrix.
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Opens a store written by MatrixStore.write.
+
+        Args:
+            path (str): The store directory.
+
+        Raises:
+            FileNotFoundError: If the index or the values it names are missing.
+        """
+        self.path = path
+        index = self._read_index()
+        while True:
+            try:
+                self.values = np.load(os.path.join(path, VALUES_FILE.format(version=index['version'])), mmap_mode='r')
+                break
+            except FileNotFoundError:
+                # A newer store may have replaced this version between the two reads: read its index
+                latest = self._read_index()
+                if latest['version'] == index['version']:
+                    raise
+                index = latest
+
+        self.version = index['version']
+        self._entries = {_key_from_json(entry['key']): entry for entry in index['entries']}
+
+    @classmethod
+    def write(cls, path: str, matrices: dict) -> "MatrixStore":
+        """
+        Writes a matrix set and opens it.
+
+        The values go to a new file named after a fresh version, then the
+        index naming that version replaces the previous one in a single move,
+        so readers see either the previous store or the new one, never a mix.
+        The values of older versions are removed; those of newer versions,
+        which a concurrent write may be about to publish, are kept.
+
+        Args:
+            path (str): The store directory, created if needed.
+            matrices (dict): {key: matrix}, possibly nested, with pd.DataFrame, FlowMatrix or SparseFlowMatrix values.
+
+        Returns:
+            MatrixStore: The opened store.
+        """
+        os.makedirs(path, exist_ok=True)
+        flat = {key: _to_dataframe(matrix) for key, matrix in _flatten(matrices)}
+
+        entries, offset = [], 0
+        for key, matrix in flat.items():
+            entries.append({
+                'key': list(key) if isinstance(key, tuple) else key,
+                'offset': offset,
+                'shape': list(matrix.shape),
+                'index': matrix.index.tolist(),
+                'columns': matrix.columns.tolist(),
+                'index_name': matrix.index.name,
+                'columns_name': matrix.columns.name,
+            })
+            offset += matrix.size
+
+        # Versions sort in the order the writes started
+        version = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        values_file = VALUES_FILE.format(version=version)
+        values = np.lib.format.open_memmap(os.path.join(path, values_file), mode='w+', dtype=np.float64, shape=(offset,))
+        for entry, matrix in zip(entries, flat.values()):
+            size = entry['shape'][0] * entry['shape'][1]
+            values[entry['offset']:entry['offset'] + size] = matrix.to_numpy(dtype=np.float64).ravel()
+        values.flush()
+        del values
+
+        index_tmp = os.path.join(path, f"{INDEX_FILE}.{version}.tmp")
+        with open(index_tmp, 'w', encoding='utf-8') as index_file:
+            json.dump({'version': version, 'entries': entries}, index_file, ensure_ascii=False, default=_json_default)
+        os.replace(index_tmp, os.path.join(path, INDEX_FILE))
+
+        for name in os.listdir(path):
+            if name.startswith('values-') and name.endswith('.npy') and name[len('values-'):-len('.npy')] < version:
+                try:
+                    os.remove(os.path.join(path, name))
+                except OSError:
+                    # Still mapped by a reader on a platform that locks mapped files
+                    pass
+
+        return cls(path)
+
+    def _read_index(self) -> dict:
+        with open(os.path.join(self.path, INDEX_FILE), encoding='utf-8') as index_file:
+            return json.load(index_file)
+
+    def keys(self) -> list:
+        """Returns the keys of the stored matrices, in the order they were written."""
+        return list(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def array(self, key) -> np.ndarray:
+        """
+        Returns the values of a matrix as a read-only view of the memory map.
+
+        Args:
+            key: The key of the matrix.
+
+        Returns:
+            np.ndarray: Array of the matrix shape, backed by the store file.
+
+        Raises:
+            KeyError: If the key is not in the store.
+        """
+        entry = self._entries[key]
+        rows, columns = entry['shape']
+        return self.values[entry['offset']:entry['offset'] + rows * columns].reshape(rows, columns)
+
+    def __getitem__(self, key) -> pd.DataFrame:
+        """
+        Returns a matrix as a DataFrame over the memory-mapped values.
+
+        Args:
+            key: The key of the matrix.
+
+        Returns:
+            pd.DataFrame: The matrix, labeled as it was written.
+
+        Raises:
+            KeyError: If the key is not in the store.
+        """
+        entry = self._entries[key]
+        return pd.DataFrame(self.array(key),
+                            index=pd.Index(entry['index'], name=entry['index_name']),
+                            columns=pd.Index(entry['columns'], name=entry['columns_name']),
+                            copy=False)
+
+    def __repr__(self) -> str:
+        return f"MatrixStore({self.path!r}, matrices={len(self)})"
+
+
+def _flatten(matrices: dict, prefix: tuple = ()):
+    """Yields (key, matrix) pairs of a possibly nested dictionary, nested keys becoming tuples."""
+    for key, value in matrices.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, prefix + (key,))
+        else:
+            yield (prefix + (key,) if prefix else key), value
+
+
+def _to_dataframe(matrix) -> pd.DataFrame:
+    if isinstance(matrix, (FlowMatrix, SparseFlowMatrix)):
+        return matrix.to_pandas()
+    return matrix
+
+
+def _key_from_json(key):
+    return tuple(key) if isinstance(key, list) else key
+
+
+def _json_default(value):
+    """Converts NumPy scalars in the labels to Python values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,116 @@
+import glob
+import hashlib
+import os
+import uuid
+import warnings
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_SUFFIX = ".parquet"
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-1 digest of a file's content.
+
+    Args:
+        path (str): Path to the file.
+        block_size (int, optional): Number of bytes read at a time. Defaults to 1 MiB.
+
+    Returns:
+        str: The hexadecimal digest of the file.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(path: str, digest: str) -> str:
+    """
+    Returns the path of the columnar cache of a source file.
+
+    The cache lives next to the source and is named after the first
+    characters of the source content digest, e.g.
+    ``tbextensa.xls.1a2b3c4d5e6f7a8b.parquet``.
+    """
+    return f"{path}.{digest[:16]}{CACHE_SUFFIX}"
+
+
+def read_table(path: str,
+               use_cache: bool = False,
+               reader: Callable[[str], pd.DataFrame] = pd.read_excel) -> pd.DataFrame:
+    """
+    Reads a spreadsheet, optionally through a Parquet cache keyed by the file content.
+
+    When ``use_cache`` is True the source file is hashed; if a cache for that
+    hash exists it is loaded instead of parsing the spreadsheet. Otherwise the
+    spreadsheet is parsed, the cache is written and caches left by previous
+    versions of the source are removed.
+
+    The cache is written to a temporary file and moved in place, so an
+    interrupted or concurrent run never leaves a truncated cache. A cache that
+    cannot be read anyway is removed and rebuilt from the source.
+
+    Args:
+        path (str): Path to the source spreadsheet.
+        use_cache (bool, optional): Whether to read and write the columnar cache. Defaults to False.
+        reader (callable, optional): Function used to parse the source. Defaults to pd.read_excel.
+
+    Returns:
+        pd.DataFrame: The parsed table.
+
+    Notes:
+        The cache requires pyarrow. If it is not installed, or the table cannot
+        be stored as Parquet, a warning is issued and the source is parsed as usual.
+    """
+    if not use_cache:
+        return reader(path)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        warnings.warn("pyarrow is not installed, the table cache is disabled.")
+        return reader(path)
+
+    target = cache_path(path, file_digest(path))
+    if os.path.exists(target):
+        try:
+            return _restore_missing(pd.read_parquet(target))
+        except (OSError, ValueError, pyarrow.ArrowException) as e:
+            warnings.warn(f"Unable to read the cache of {path}, rebuilding it: {e}")
+            _remove(target)
+
+    dataframe = reader(path)
+
+    for stale in glob.glob(f"{glob.escape(path)}.*{CACHE_SUFFIX}"):
+        _remove(stale)
+
+    temporary = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        dataframe.to_parquet(temporary)
+        os.replace(temporary, target)
+    except (OSError, ValueError, TypeError, pyarrow.ArrowException) as e:
+        _remove(temporary)
+        warnings.warn(f"Unable to cache {path}: {e}")
+
+    return dataframe
+
+
+def _restore_missing(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """Turns back into NaN the missing values that Parquet returns as None in object columns, as the source reader gives them."""
+    for column in dataframe.columns[dataframe.dtypes == object]:
+        dataframe[column] = dataframe[column].where(dataframe[column].notna(), np.nan)
+    return dataframe
+
+
+def _remove(path: str) -> None:
+    """Removes a file, if it still exists: a concurrent run may have removed it first."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,124 @@
+import pandas as pd
+import pytest
+
+from matrices.accumulator import FlowAccumulator
+from matrices.chunked import ChunkedMatrices, read_chunks
+from matrices.matrices_local import MatricesLocal
+
+
+@pytest.fixture
+def sample_data():
+    return pd.read_excel('tbextensa.xls', engine='xlrd')
+
+
+@pytest.fixture
+def reference(sample_data):
+    instance = MatricesLocal()
+    instance.dataframe = sample_data
+    return instance
+
+
+@pytest.fixture(params=['csv', 'parquet'])
+def table_path(request, sample_data, tmp_path):
+    path = tmp_path / f'transactions.{request.param}'
+    if request.param == 'csv':
+        sample_data.to_csv(path, index=False)
+    else:
+        sample_data.to_parquet(path)
+    return str(path)
+
+
+def test_read_chunks_respects_memory_limit(table_path, sample_data):
+    chunks = list(read_chunks(table_path, ['Produto', 'Valor'], memory_limit=20_000))
+    assert len(chunks) > 1
+    assert sum(len(chunk) for chunk in chunks) == len(sample_data)
+
+
+def test_read_chunks_rejects_unsupported_format():
+    with pytest.raises(ValueError):
+        next(read_chunks('tbextensa.xls'))
+
+
+def test_chunked_matrices_match_matrices_local(table_path, reference):
+    chunked = ChunkedMatrices(table_path, memory_limit=50_000)
+    for aggregate_method in ['sum', 'mean']:
+        for selection in [{'product': 'AcaiFruto'}, {'product': 'AcaiFruto', 'seller_location': 'Cametá'},
+                          {'buyer_location': 'Belém'}]:
+            expected = reference.create_matrices(matrice_type='Valor', aggregate_method=aggregate_method, **selection)
+            result = chunked.create_matrices(matrice_type='Valor', aggregate_method=aggregate_method, **selection)
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    pd.testing.assert_frame_equal(chunked.format_pricing('AcaiFruto'), reference.format_pricing('AcaiFruto'), check_dtype=False)
+
+
+def test_chunked_median_with_quantile_sketch(table_path, reference):
+    chunked = ChunkedMatrices(table_path, memory_limit=50_000, quantile_error=0.001)
+    expected = reference.create_matrices('AcaiFruto', 'Quantidade', 'median')
+    pd.testing.assert_frame_equal(chunked.create_matrices('AcaiFruto', 'Quantidade', 'median'), expected, check_dtype=False)
+
+    with pytest.raises(ValueError):
+        ChunkedMatrices(table_path).create_matrices('AcaiFruto', 'Quantidade', 'median')
+
+
+def test_chunked_matrices_selection_errors(table_path):
+    chunked = ChunkedMatrices(table_path)
+    with pytest.raises(KeyError):
+        chunked.create_matrices('NonExistentProduct', 'Valor')
+    with pytest.raises(ValueError):
+        chunked.create_matrices(matrice_type='Valor')
+
+
+def test_accumulator_merge_matches_single_pass(sample_data):
+    keys = ['Produto', 'SetorDoAgenteQueVendeI', 'SetorDoAgenteQueCompraI']
+    single = FlowAccumulator(keys, ['Valor']).update(sample_data)
+    merged = FlowAccumulator(keys, ['Valor']).update(sample_data.iloc[:800])
+    merged.merge(FlowAccumulator(keys, ['Valor']).update(sample_data.iloc[800:]))
+
+    by = ['SetorDoAgenteQueVendeI', 'SetorDoAgenteQueCompraI']
+    pd.testing.assert_frame_equal(merged.aggregate(by, aggregate_method='mean', Produto='AcaiFruto'),
+                                  single.aggregate(by, aggregate_method='mean', Produto='AcaiFruto'))
+
+
+def test_missing_locations_are_kept_at_product_level(sample_data, tmp_path):
+    rows = sample_data.index[sample_data['Produto'] == 'AcaiFruto'][:5]
+    sample_data.loc[rows, 'LocalDoAgenteQueCompra'] = None
+    path = tmp_path / 'transactions.csv'
+    sample_data.to_csv(path, index=False)
+
+    reference = MatricesLocal()
+    reference.dataframe = sample_data
+    chunked = ChunkedMatrices(str(path))
+
+    for method in ('sum', 'mean'):
+        pd.testing.assert_frame_equal(chunked.create_matrices('AcaiFruto', 'Valor', method),
+                                      reference.create_matrices('AcaiFruto', 'Valor', method), check_dtype=False)
+    pd.testing.assert_frame_equal(chunked.create_matrices('AcaiFruto', 'Valor', buyer_location='Cametá'),
+                                  reference.create_matrices('AcaiFruto', 'Valor', buyer_location='Cametá'), check_dtype=False)
+
+
+def test_chunked_whole_table_methods_match_matrices_local(table_path, reference):
+    chunked = ChunkedMatrices(table_path, memory_limit=50_000)
+
+    expected = reference.create_all_matrices(['Quantidade', 'Valor'])
+    result = chunked.create_all_matrices(['Quantidade', 'Valor'])
+    assert list(result) == list(expected)
+    pd.testing.assert_frame_equal(result['AcaiFruto']['Valor'], expected['AcaiFruto']['Valor'], check_dtype=False)
+
+    expected_tensor = reference.create_location_tensor('AcaiFruto')
+    tensor = chunked.create_location_tensor('AcaiFruto')
+    for selection in [{}, {'seller_location': 'Cametá'}]:
+        pd.testing.assert_frame_equal(tensor.matrix('Valor', aggregate_method='mean', **selection),
+                                      expected_tensor.matrix('Valor', aggregate_method='mean', **selection),
+                                      check_dtype=False)
+
+    products = chunked.build_product_matrices()
+    assert list(products) == sorted(reference.product_index)
+    pd.testing.assert_frame_equal(products['AcaiFruto']['pricing'], reference.format_pricing('AcaiFruto'), check_dtype=False)
+
+
+def test_chunked_unsupported_methods_raise(table_path):
+    chunked = ChunkedMatrices(table_path)
+    with pytest.raises(NotImplementedError, match='create_matrices'):
+        chunked.create_level_matrices('AcaiFruto', 'Valor')
+    with pytest.raises(ValueError):
+        chunked.build_product_matrices(['AcaiFruto'], n_workers=2)
@@ -64,4 +64,466 @@ def test_if_format_pricing_is_returning_null_dataframe(matrices_instance):
     val_field = 'Valor'
     qtt_field = 'Quantidade'
     result = matrices_instance.format_pricing(product=product, qtt_field=qtt_field, val_field=val_field)
-    assert not result.empty
\ No newline at end of file
+    assert not result.empty
+
+def test_create_all_matrices_matches_create_matrices(matrices_instance):
+    product = 'AcaiFruto'
+    all_matrices = matrices_instance.create_all_matrices(fields=['Quantidade', 'Valor'], aggregate_method='sum')
+    assert set(all_matrices) == set(matrices_instance.dataframe['Produto'].unique())
+
+    for field in ['Quantidade', 'Valor']:
+        expected = matrices_instance.create_matrices(product, field, 'sum')
+        result = all_matrices[product][field].loc[expected.index, expected.columns]
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_names=False)
+
+
+def test_create_all_matrices_shared_sector_axis(matrices_instance):
+    all_matrices = matrices_instance.create_all_matrices(fields=['Quantidade'], aggregate_method='mean', insert_total=False)
+    shapes = {matrix['Quantidade'].shape for matrix in all_matrices.values()}
+    assert len(shapes) == 1
+
+
+def test_label_fields_are_categorical_with_shared_sectors(matrices_instance, sample_data):
+    df = matrices_instance._table
+    assert isinstance(df['Produto'].dtype, pd.CategoricalDtype)
+    assert df['SetorDoAgenteQueVendeI'].cat.categories.equals(df['SetorDoAgenteQueCompraI'].cat.categories)
+    assert not isinstance(sample_data['Produto'].dtype, pd.CategoricalDtype)  # the input table is left untouched
+
+
+def test_dataframe_keeps_its_dtypes(sample_data):
+    instance = Matrices()
+    instance.dataframe = sample_data.copy()
+    assert instance.dataframe.dtypes.equals(sample_data.dtypes)
+
+    instance.dataframe.fillna(0, inplace=True)
+    expected = Matrices()
+    expected.dataframe = sample_data.fillna(0)
+    pd.testing.assert_frame_equal(instance.refresh().format_quantity('AcaiFruto'), expected.format_quantity('AcaiFruto'))
+
+
+def test_create_matrices_keeps_plain_labels(matrices_instance):
+    result = matrices_instance.create_matrices('AcaiFruto', 'Quantidade', 'sum')
+    assert not isinstance(result.index, pd.CategoricalIndex)
+    assert not isinstance(result.columns, pd.CategoricalIndex)
+    assert 'AAProdução' in result.index
+
+
+def test_format_pricing_aggregates_once(matrices_instance, monkeypatch):
+    calls = []
+    aggregate = matrices_instance._aggregate
+
+    def counting_aggregate(df, fields, *args, **kwargs):
+        calls.append(list(fields))
+        return aggregate(df, fields, *args, **kwargs)
+
+    monkeypatch.setattr(matrices_instance, '_aggregate', counting_aggregate)
+    matrices_instance.format_pricing(product='AcaiFruto', qtt_field='Quantidade', val_field='Valor')
+    assert calls == [['Quantidade', 'Valor']]
+
+
+def test_fused_implicit_price_matches_separate_matrices(matrices_instance):
+    product = 'AcaiFruto'
+    quantity = matrices_instance.create_matrices(product, 'Quantidade', 'sum').to_numpy()
+    value = matrices_instance.create_matrices(product, 'Valor', 'sum').to_numpy()
+    result = matrices_instance.format_implicit_price(product=product, qtt_field='Quantidade', val_field='Valor')
+
+    assert result.columns[-1] == 'TotalImplicitPriceSold'
+    assert result.index[-1] == 'TotalImplicitPriceBought'
+    nonzero = quantity != 0
+    assert (result.to_numpy()[nonzero] == value[nonzero] / quantity[nonzero]).all()
+
+
+def test_sparse_backend_matches_dense(sample_data):
+    dense = Matrices()
+    dense.dataframe = sample_data
+    sparse = Matrices(backend='sparse')
+    sparse.dataframe = sample_data
+
+    product = 'AcaiFruto'
+    pd.testing.assert_frame_equal(dense.format_parametric(product), sparse.format_parametric(product).to_pandas(), check_dtype=False)
+    pd.testing.assert_frame_equal(dense.format_pricing(product, 'Quantidade', 'Valor'),
+                                  sparse.format_pricing(product, 'Quantidade', 'Valor').to_pandas(),
+                                  check_dtype=False)
+
+
+def test_invalid_backend():
+    with pytest.raises(ValueError):
+        Matrices(backend='invalid')
+
+
+def test_matrix_cache_hits_and_misses(sample_data):
+    instance = Matrices(cache_size=8)
+    instance.dataframe = sample_data
+
+    first = instance.format_quantity('AcaiFruto')
+    second = instance.format_parametric('AcaiFruto')
+    assert instance.cache_info() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 8}
+    pd.testing.assert_frame_equal(first, instance.format_quantity('AcaiFruto'))
+
+    # The returned matrices are copies, editing them does not corrupt the cache
+    first.iloc[0, 0] = -1
+    assert instance.format_quantity('AcaiFruto').iloc[0, 0] != -1
+    assert not second.empty
+
+
+def test_sparse_cache_hits_return_copies(sample_data):
+    instance = Matrices(cache_size=8, backend='sparse')
+    instance.dataframe = sample_data
+
+    first = instance.create_matrices('AcaiFruto', 'Valor', insert_total=False)
+    first.matrix.data[:] = -1
+
+    second = instance.create_matrices('AcaiFruto', 'Valor', insert_total=False)
+    assert instance.cache_info()['hits'] == 1
+    assert (second.matrix.data >= 0).all()
+
+
+def test_matrix_cache_evicts_least_recently_used(sample_data):
+    instance = Matrices(cache_size=2)
+    instance.dataframe = sample_data
+    products = sample_data['Produto'].unique()[:3]
+
+    for product in products:
+        instance.format_quantity(product)
+
+    assert instance.cache_info()['size'] == 2
+    instance.format_quantity(products[0])
+    assert instance.cache_info()['misses'] == 4
+
+
+def test_matrix_cache_is_invalidated_by_new_dataframe(sample_data):
+    instance = Matrices(cache_size=8)
+    instance.dataframe = sample_data
+    before = instance.format_quantity('AcaiFruto')
+
+    doubled = sample_data.copy()
+    doubled['Quantidade'] = doubled['Quantidade'] * 2
+    instance.dataframe = doubled
+
+    assert instance.cache_info()['size'] == 0
+    pd.testing.assert_frame_equal(instance.format_quantity('AcaiFruto'), before * 2)
+
+
+def test_refresh_after_in_place_edit(sample_data):
+    instance = Matrices(cache_size=8)
+    instance.dataframe = sample_data.copy()
+    instance.append_transactions(sample_data.iloc[:10])
+    before = instance.format_quantity('AcaiFruto')
+    graph = instance.product_graph('AcaiFruto')
+    graph['quantity']
+
+    instance.dataframe.loc[:, 'Quantidade'] = instance.dataframe['Quantidade'] * 2
+    assert instance.refresh() is instance
+
+    assert instance.accumulator is None and graph.is_dirty('quantity')
+    pd.testing.assert_frame_equal(instance.format_quantity('AcaiFruto'), before * 2, check_dtype=False)
+
+
+def test_format_methods_do_not_copy_the_table(matrices_instance, monkeypatch):
+    table = matrices_instance.dataframe
+    copy = pd.DataFrame.copy
+
+    def guarded_copy(self, *args, **kwargs):
+        assert self is not table, "The transaction table was copied."
+        return copy(self, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, 'copy', guarded_copy)
+    matrices_instance.format_quantity('AcaiFruto')
+    matrices_instance.format_parametric('AcaiFruto')
+    matrices_instance.format_pricing('AcaiFruto', 'Quantidade', 'Valor')
+
+
+def test_selected_rows_are_projected_to_needed_columns(matrices_instance, monkeypatch):
+    selected = []
+    aggregate = matrices_instance._aggregate
+
+    def capturing_aggregate(df, fields, *args, **kwargs):
+        selected.append(df)
+        return aggregate(df, fields, *args, **kwargs)
+
+    monkeypatch.setattr(matrices_instance, '_aggregate', capturing_aggregate)
+    matrices_instance.format_implicit_price('AcaiFruto', 'Quantidade', 'Valor')
+
+    assert list(selected[0].columns) == ['SetorDoAgenteQueVendeI', 'SetorDoAgenteQueCompraI', 'Quantidade', 'Valor']
+    assert (selected[0].index == matrices_instance.dataframe.index[matrices_instance.dataframe['Produto'] == 'AcaiFruto']).all()
+
+
+def test_product_index_matches_mask(matrices_instance):
+    df = matrices_instance.dataframe
+    index = matrices_instance.product_index
+    assert set(index) == set(df['Produto'].unique())
+    assert (index['AcaiFruto'] == (df['Produto'] == 'AcaiFruto').to_numpy().nonzero()[0]).all()
+
+
+def test_product_index_is_built_once(matrices_instance):
+    index = matrices_instance.product_index
+    for product in matrices_instance.dataframe['Produto'].unique()[:5]:
+        matrices_instance.format_quantity(product)
+    assert matrices_instance.product_index is index
+
+    with pytest.raises(KeyError):
+        matrices_instance.format_quantity('InvalidProduct')
+
+
+def test_product_index_is_rebuilt_for_new_dataframe(matrices_instance, sample_data):
+    index = matrices_instance.product_index
+    matrices_instance.dataframe = sample_data[sample_data['Produto'] != 'AcaiFruto']
+    assert matrices_instance.product_index is not index
+    assert 'AcaiFruto' not in matrices_instance.product_index
+
+
+def test_create_matrices_quantile(matrices_instance, sample_data):
+    median = matrices_instance.create_matrices('AcaiFruto', 'Valor', 'median')
+    assert median.equals(matrices_instance.create_matrices('AcaiFruto', 'Valor', 'quantile', quantile=0.5))
+
+    subset = sample_data[sample_data['Produto'] == 'AcaiFruto']
+    expected = subset.groupby(['SetorDoAgenteQueVendeI', 'SetorDoAgenteQueCompraI'])['Valor'].quantile(0.9)
+    result = matrices_instance.create_matrices('AcaiFruto', 'Valor', 'quantile', quantile=0.9)
+    assert result.loc['AAProdução', 'ACVarejoRural'] == pytest.approx(expected['AAProdução', 'ACVarejoRural'])
+
+    with pytest.raises(ValueError):
+        matrices_instance.create_matrices('AcaiFruto', 'Valor', 'quantile', quantile=2)
+
+
+def test_in_memory_quantiles_are_exact_with_quantile_error(matrices_instance, sample_data):
+    instance = Matrices(quantile_error=0.05)
+    instance.dataframe = sample_data
+
+    for aggregate_method, quantile in [('median', 0.5), ('quantile', 0.25)]:
+        result = instance.create_matrices('AcaiFruto', 'Valor', aggregate_method, quantile=quantile)
+        expected = matrices_instance.create_matrices('AcaiFruto', 'Valor', aggregate_method, quantile=quantile)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_streaming_quantile_matches_exact_below_capacity(matrices_instance, sample_data):
+    instance = Matrices(quantile_error=0.001)
+    instance.dataframe = sample_data.iloc[:1000]
+    instance.append_transactions(sample_data.iloc[1000:])
+
+    for aggregate_method, quantile in [('median', 0.5), ('quantile', 0.25)]:
+        result = instance.create_matrices('AcaiFruto', 'Valor', aggregate_method, quantile=quantile)
+        expected = matrices_instance.create_matrices('AcaiFruto', 'Valor', aggregate_method, quantile=quantile)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_streaming_median_is_approximate_on_large_groups(sample_data):
+    instance = Matrices(quantile_error=0.05)
+    instance.dataframe = sample_data.iloc[:1000]
+    instance.append_transactions(sample_data.iloc[1000:])
+
+    result = instance.create_matrices('AcaiFruto', 'Valor', 'median')
+    subset = sample_data[(sample_data['Produto'] == 'AcaiFruto')
+                         & (sample_data['SetorDoAgenteQueVendeI'] == 'AFIndustBenef')
+                         & (sample_data['SetorDoAgenteQueCompraI'] == 'AJConFinLocal')]['Valor']
+    rank = (subset <= result.loc['AFIndustBenef', 'AJConFinLocal']).mean()
+    assert abs(rank - 0.5) <= 0.05
+
+
+def test_append_transactions_matches_full_table(matrices_instance, sample_data):
+    instance = Matrices(cache_size=16)
+    instance.dataframe = sample_data.iloc[:1000]
+    instance.create_matrices('AcaiFruto', 'Valor', 'sum')
+
+    instance.append_transactions(sample_data.iloc[1000:1300])
+    instance.append_transactions(sample_data.iloc[1300:])
+
+    for aggregate_method in ['sum', 'mean']:
+        result = instance.create_matrices('AcaiFruto', 'Valor', aggregate_method)
+        expected = matrices_instance.create_matrices('AcaiFruto', 'Valor', aggregate_method)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    result = instance.format_pricing('AcaiFruto', 'Quantidade', 'Valor')
+    pd.testing.assert_frame_equal(result, matrices_instance.format_pricing('AcaiFruto', 'Quantidade', 'Valor'), check_dtype=False)
+
+
+def test_append_transactions_defers_the_table_concatenation(sample_data):
+    instance = Matrices()
+    instance.dataframe = sample_data.iloc[:1000]
+    instance.append_transactions(sample_data.iloc[1000:])
+
+    instance.create_matrices('AcaiFruto', 'Valor', 'sum')
+    assert len(instance._dataframe) == 1000
+
+    instance.create_matrices('AcaiFruto', 'Valor', 'median')
+    assert len(instance.dataframe) == len(sample_data)
+
+
+def test_append_transactions_invalidates_only_touched_products(sample_data):
+    instance = Matrices(cache_size=16)
+    instance.dataframe = sample_data
+    instance.create_matrices('AcaiFruto', 'Valor', 'sum')
+    instance.create_matrices('CacauFruto', 'Valor', 'sum')
+
+    instance.append_transactions(sample_data[sample_data['Produto'] == 'AcaiFruto'].head(5))
+    cached_products = {key[0] for key in instance._matrix_cache}
+    assert cached_products == {'CacauFruto'}
+
+
+def test_build_product_matrices_in_parallel_matches_serial(matrices_instance):
+    products = ['CacauFruto', 'AcaiFruto']
+    serial = matrices_instance.build_product_matrices(products)
+    parallel = matrices_instance.build_product_matrices(products, n_workers=2)
+
+    assert list(parallel) == products
+    for product in products:
+        assert list(parallel[product]) == ['quantity', 'value', 'parametric', 'implicit_price', 'pricing']
+        for name, matrix in serial[product].items():
+            pd.testing.assert_frame_equal(parallel[product][name], matrix)
+
+    expected = matrices_instance.format_pricing('AcaiFruto', 'Quantidade', 'Valor')
+    pd.testing.assert_frame_equal(parallel['AcaiFruto']['pricing'], expected)
+
+
+def test_shared_table_round_trip(matrices_instance):
+    from matrices.parallel import SharedTable
+
+    columns = ['Produto', 'SetorDoAgenteQueVendeI', 'Valor']
+    with SharedTable(matrices_instance._table, columns) as shared_table:
+        attached, segments = SharedTable.attach(shared_table.spec)
+        pd.testing.assert_frame_equal(attached, matrices_instance._table[columns], check_categorical=False)
+        for segment in segments:
+            segment.close()
+
+
+def test_pricing_tensor_matches_format_pricing(matrices_instance):
+    tensor = matrices_instance.create_pricing_tensor(['AcaiFruto', 'CacauFruto'])
+
+    assert tensor.shape == (2, len(tensor.sectors), len(tensor.sectors))
+    assert list(tensor.sectors) == sorted(tensor.sectors)
+    for product in ['AcaiFruto', 'CacauFruto']:
+        expected = matrices_instance.format_pricing(product, 'Quantidade', 'Valor').iloc[:-1, :-1]
+        pd.testing.assert_frame_equal(tensor.matrix(product), expected, check_names=False, check_dtype=False)
+
+
+def test_pricing_tensor_masks_absent_sectors(matrices_instance):
+    tensor = matrices_instance.create_pricing_tensor()
+    position = tensor.products.get_loc('AcaiFruto')
+    sectors = matrices_instance.format_pricing('AcaiFruto', 'Quantidade', 'Valor').index[:-1]
+
+    assert set(tensor.sectors[tensor.present[position]]) == set(sectors)
+    assert (tensor.values[~tensor.mask] == 0).all()
+
+    with pytest.raises(KeyError):
+        matrices_instance.create_pricing_tensor(['NonExistentProduct'])
+
+
+@pytest.mark.parametrize('aggregate_method', ['sum', 'mean'])
+def test_level_matrices_match_create_matrices_by_level(matrices_instance, sample_data, aggregate_method):
+    matrices = matrices_instance.create_level_matrices('AcaiFruto', 'Valor', aggregate_method)
+    assert len(matrices) == 3
+
+    for matrix, level in zip(matrices, ['I', 'II', 'III']):
+        instance = Matrices(seller_sector_agent=f'SetorDoAgenteQueVende{level}', buyer_sector_agent=f'SetorDoAgenteQueCompra{level}')
+        instance.dataframe = sample_data
+        expected = instance.create_matrices('AcaiFruto', 'Valor', aggregate_method)
+        pd.testing.assert_frame_equal(matrix, expected, check_dtype=False)
+
+
+def test_level_matrices_reject_median(matrices_instance):
+    with pytest.raises(ValueError):
+        matrices_instance.create_level_matrices('AcaiFruto', 'Valor', 'median')
+
+
+def test_product_graph_aggregates_once(matrices_instance, monkeypatch):
+    calls = []
+    aggregate = matrices_instance._aggregate
+
+    def counting_aggregate(df, fields, *args, **kwargs):
+        calls.append(fields)
+        return aggregate(df, fields, *args, **kwargs)
+
+    monkeypatch.setattr(matrices_instance, '_aggregate', counting_aggregate)
+    matrices = matrices_instance.product_matrix_set('AcaiFruto')
+
+    assert calls == [['Quantidade', 'Valor']]
+    pd.testing.assert_frame_equal(matrices['parametric'], matrices_instance.format_parametric('AcaiFruto'))
+    pd.testing.assert_frame_equal(matrices['pricing'], matrices_instance.format_pricing('AcaiFruto', 'Quantidade', 'Valor'))
+
+
+def test_product_graph_is_dirty_after_append(sample_data):
+    instance = Matrices()
+    instance.dataframe = sample_data.iloc[:1000]
+    graph = instance.product_graph('AcaiFruto')
+    graph['pricing']
+
+    instance.append_transactions(sample_data.iloc[1000:])
+    assert graph.is_dirty('flows') and graph.is_dirty('pricing')
+
+    expected = Matrices()
+    expected.dataframe = sample_data
+    pd.testing.assert_frame_equal(graph['pricing'], expected.format_pricing('AcaiFruto', 'Quantidade', 'Valor'), check_dtype=False)
+
+
+def test_product_graphs_follow_cache_size(sample_data):
+    instance = Matrices(cache_size=1)
+    instance.dataframe = sample_data
+    graph = instance.product_graph('AcaiFruto')
+    assert instance.product_graph('AcaiFruto') is graph
+
+    instance.product_graph('AcaiFruto', 'Quantidade', 'Valor', LocalDoAgenteQueVende='Cametá')
+    assert len(instance._product_graphs) == 1
+    assert instance.product_graph('AcaiFruto') is not graph
+
+
+def test_evicted_product_graph_is_dirty_after_append(sample_data):
+    instance = Matrices(cache_size=1)
+    instance.dataframe = sample_data.iloc[:1000]
+    graph = instance.product_graph('AcaiFruto')
+    graph['pricing']
+    instance.product_graph('AcaiFruto', 'Quantidade', 'Valor', LocalDoAgenteQueVende='Cametá')
+
+    instance.append_transactions(sample_data.iloc[1000:])
+    assert graph.is_dirty('flows')
+
+    instance.dataframe = sample_data
+    graph['pricing']
+    instance.clear_cache()
+    assert graph.is_dirty('pricing')
+
+
+def test_matrices_from_aggregate_scatters_pairs(matrices_instance):
+    result_df = pd.DataFrame({
+        'SetorDoAgenteQueVendeI': ['B', 'A', 'A'],
+        'SetorDoAgenteQueCompraI': ['C', 'B', 'C'],
+        'Valor': [2.0, 1.0, float('nan')],
+    })
+    matrix = matrices_instance._to_output(matrices_instance._matrices_from_aggregate(result_df, ['Valor'])['Valor'])
+
+    assert list(matrix.index) == ['A', 'B', 'C', 'TotalValorBought']
+    assert list(matrix.columns) == ['A', 'B', 'C', 'TotalValorSold']
+    assert matrix.loc['A', 'B'] == 1.0 and matrix.loc['B', 'C'] == 2.0 and matrix.loc['A', 'C'] == 0.0
+    assert matrix.loc['TotalValorBought', 'TotalValorSold'] == 3.0
+
+
+def test_sector_arrays_share_the_registry_axis(sample_data):
+    from matrices.registry import SectorRegistry
+
+    instance = Matrices(sector_registry=SectorRegistry())
+    instance.dataframe = sample_data
+    registry = instance.sector_registry
+    assert len(registry) == 0
+
+    first, second = sample_data['Produto'].unique()[:2]
+    arrays = [instance.create_sector_array(product, 'Valor') for product in (first, second)]
+
+    assert arrays[0].shape == arrays[1].shape == (len(registry), len(registry))
+    for product, array in zip((first, second), arrays):
+        expected = instance.create_matrices(product, 'Valor', 'sum', insert_total=False)
+        pd.testing.assert_frame_equal(registry.to_pandas(array).loc[expected.index, expected.columns], expected,
+                                      check_names=False, check_dtype=False)
+        assert array.sum() == pytest.approx(expected.to_numpy().sum())
+
+
+def test_create_matrices_stacks_fields(matrices_instance):
+    fields = ['Quantidade', 'Valor', 'NúmeroDeAgentesVendaNoLançamento']
+    tensor = matrices_instance.create_matrices('AcaiFruto', fields=fields)
+
+    assert tensor.shape[0] == 3 and list(tensor.fields) == fields
+    for position, field in enumerate(fields):
+        expected = matrices_instance.create_matrices('AcaiFruto', field, 'sum')
+        pd.testing.assert_frame_equal(tensor.matrix(field), expected, check_dtype=False)
+        assert tensor.sold[position].tolist() == pytest.approx(expected.iloc[:-1, -1].tolist())
+        assert tensor.bought[position].tolist() == pytest.approx(expected.iloc[-1, :-1].tolist())
+
+    with pytest.raises(ValueError):
+        matrices_instance.create_matrices('AcaiFruto', fields=[])
@@ -1,4 +1,5 @@
 from matrices.cost_matrices import CostMatrix  
+import numpy as np
 import pytest
 import pandas as pd
 
@@ -65,4 +66,104 @@ def test_missing_item_in_incidence(sample_data):
         incidence=incidence
     )
     assert 'Item1' in result
-    assert 'Item2' not in result
\ No newline at end of file
+    assert 'Item2' not in result
+
+def test_cost_tensor_matches_calculate_cost(sample_data):
+    params_matrix, inputs_matrix, incidence = sample_data
+
+    cost = CostMatrix(params_matrix=params_matrix, inputs_matrix=inputs_matrix)
+
+    tensor = cost.calculate_cost_tensor(items=['Item1', 'Item2'], incidence=incidence)
+    result = cost.calculate_cost(items=['Item1', 'Item2'], incidence=incidence)
+
+    assert tensor.shape == (2, 3, 3)
+    assert list(tensor) == ['Item1', 'Item2']
+    for item in result:
+        pd.testing.assert_frame_equal(tensor[item], result[item])
+    pd.testing.assert_frame_equal(tensor.total(), result['Item1'] + result['Item2'])
+
+def test_cost_tensor_aligns_missing_sectors(sample_data):
+    params_matrix, inputs_matrix, incidence = sample_data
+
+    params_matrix = params_matrix[params_matrix['Sector'] != 'Setor2']
+    cost = CostMatrix(params_matrix=params_matrix, inputs_matrix=inputs_matrix)
+
+    tensor = cost.calculate_cost_tensor(items=['Item1', 'Item2', 'Item3'], incidence=incidence)
+
+    assert 'Item3' not in tensor
+    assert (tensor['Item1'].loc['Setor2'] == 0).all()
+    assert tensor['Item1'].loc['Setor3', 'Setor1'] == 0.5 * 0.5 * 1555
+
+def test_item_index_is_built_at_construction(sample_data):
+    params_matrix, inputs_matrix, incidence = sample_data
+
+    cost = CostMatrix(params_matrix=params_matrix, inputs_matrix=inputs_matrix)
+
+    assert list(cost.items) == ['Item1', 'Item2']
+    assert list(cost.sectors) == ['Setor1', 'Setor2', 'Setor3']
+    assert list(cost._block_lengths) == [3, 3]
+    assert list(cost._coefficients) == [0.5, 0.7]
+
+    cost.inputs_matrix = pd.DataFrame({'Item2': [0.1]}, index=['Loc1'])
+    result = cost.calculate_cost(items=['Item1', 'Item2'], incidence=incidence)
+
+    assert list(result) == ['Item2']
+    assert result['Item2'].loc['Setor1', 'Setor1'] == 0.6 * 0.1 * 2250
+
+def test_total_cost_of_incidence_scenarios(sample_data):
+    params_matrix, inputs_matrix, incidence = sample_data
+
+    cost = CostMatrix(params_matrix=params_matrix, inputs_matrix=inputs_matrix)
+
+    scenarios = np.array([[1555, 0, 10],
+                          [2250, 100, 20]])
+    totals = cost.calculate_total_cost(['Item1', 'Item2'], scenarios)
+
+    assert totals.shape == (3, 3, 3)
+    for scenario in range(3):
+        result = cost.calculate_cost(['Item1', 'Item2'], dict(zip(['Item1', 'Item2'], scenarios[:, scenario])))
+        np.testing.assert_allclose(totals[scenario], (result['Item1'] + result['Item2']).to_numpy())
+
+    with pytest.raises(ValueError):
+        cost.calculate_total_cost(['Item1'], scenarios)
+
+def test_aligned_costs_use_the_sector_registry(sample_data):
+    from matrices.registry import SectorRegistry
+
+    params_matrix, inputs_matrix, incidence = sample_data
+
+    registry = SectorRegistry(['Setor0', 'Setor3'])
+    cost = CostMatrix(params_matrix=params_matrix, inputs_matrix=inputs_matrix, sector_registry=registry)
+    cost.calculate_cost(['Item1', 'Item2'], incidence)
+    assert list(registry.sectors) == ['Setor0', 'Setor3']
+
+    tensor = cost.calculate_cost_tensor(['Item1', 'Item2'], incidence, aligned=True)
+    result = cost.calculate_cost(['Item1', 'Item2'], incidence)
+
+    assert list(tensor.sectors) == ['Setor0', 'Setor3', 'Setor1', 'Setor2']
+    pd.testing.assert_frame_equal(tensor['Item1'].loc[result['Item1'].index, result['Item1'].columns], result['Item1'])
+
+    totals = cost.calculate_total_cost(['Item1', 'Item2'], np.array([[1555.0], [2250.0]]), aligned=True)
+    np.testing.assert_allclose(totals[0], tensor.total().to_numpy())
+
+def test_duplicated_sector_rows_raise(sample_data):
+    params_matrix, inputs_matrix, incidence = sample_data
+
+    params_matrix = pd.concat([params_matrix, params_matrix.iloc[[0]]], ignore_index=True)
+    cost = CostMatrix(params_matrix=params_matrix, inputs_matrix=inputs_matrix)
+
+    with pytest.raises(ValueError):
+        cost.calculate_cost(items=['Item1', 'Item2'], incidence=incidence)
+
+    result = cost.calculate_cost(items=['Item2'], incidence=incidence)
+    assert list(result) == ['Item2']
+
+def test_total_cost_rejects_duplicated_sector_rows(sample_data):
+    params_matrix, inputs_matrix, _ = sample_data
+
+    params_matrix = pd.concat([params_matrix, params_matrix.iloc[[1]]], ignore_index=True)
+    cost = CostMatrix(params_matrix=params_matrix, inputs_matrix=inputs_matrix)
+
+    with pytest.raises(ValueError):
+        cost.calculate_total_cost(['Item1', 'Item2'], np.ones((2, 3)))
+    assert cost.calculate_total_cost(['Item1'], np.ones((1, 3))).shape == (3, 3, 3)
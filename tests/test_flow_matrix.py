@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from matrices.flow_matrix import FlowMatrix, SparseFlowMatrix
+
+
+@pytest.fixture
+def sparse_matrix():
+    return SparseFlowMatrix.from_coordinates([0, 0, 2], [1, 2, 0], [4.0, 2.0, np.nan], ['A', 'B', 'C'])
+
+
+def test_from_coordinates_drops_missing_values(sparse_matrix):
+    assert sparse_matrix.shape == (3, 3)
+    assert sparse_matrix.nnz == 2
+
+
+def test_with_totals(sparse_matrix):
+    result = sparse_matrix.with_totals('TotalBought', 'TotalSold').to_pandas()
+    assert list(result.index) == ['A', 'B', 'C', 'TotalBought']
+    assert list(result.columns) == ['A', 'B', 'C', 'TotalSold']
+    assert result.loc['A', 'TotalSold'] == 6.0
+    assert result.loc['TotalBought', 'B'] == 4.0
+    assert result.loc['TotalBought', 'TotalSold'] == 6.0
+
+
+def test_with_totals_of_empty_matrix():
+    empty = SparseFlowMatrix.from_coordinates([], [], [], [])
+    result = empty.with_totals('TotalBought', 'TotalSold')
+    assert result.shape == (1, 1)
+
+
+def test_elementwise_division_matches_dense(sparse_matrix):
+    other = SparseFlowMatrix.from_coordinates([0, 2], [1, 0], [2.0, 5.0], ['A', 'B', 'C'])
+    expected = (sparse_matrix.to_pandas() / other.to_pandas()).fillna(0)
+    pd.testing.assert_frame_equal((sparse_matrix / other).to_pandas(), expected)
+
+
+def test_column_access_and_rename(sparse_matrix):
+    renamed = sparse_matrix.rename(columns={'B': 'Total'})
+    assert renamed['Total'].tolist() == [4.0, 0.0, 0.0]
+    assert renamed.row(0).tolist() == [0.0, 4.0, 2.0]
+
+
+@pytest.fixture
+def flow_matrix():
+    return FlowMatrix([[1.0, 2.0], [3.0, 0.0]], index=['A', 'B'], columns=['A', 'B'])
+
+
+def test_flow_matrix_is_contiguous_float(flow_matrix):
+    assert flow_matrix.values.dtype == np.float64
+    assert flow_matrix.values.flags['C_CONTIGUOUS']
+
+
+def test_flow_matrix_with_totals_matches_dataframe_totals(flow_matrix):
+    result = flow_matrix.with_totals('TotalBought', 'TotalSold').to_pandas()
+    assert result.loc['TotalBought'].tolist() == [4.0, 2.0, 6.0]
+    assert result['TotalSold'].tolist() == [3.0, 3.0, 6.0]
+
+
+def test_flow_matrix_arithmetic(flow_matrix):
+    ratio = (flow_matrix / (2 * flow_matrix)).fillna(0)
+    assert ratio.values.tolist() == [[0.5, 0.5], [0.5, 0.0]]
+    assert (flow_matrix + 1).values.sum() == 10.0
+
+    other = FlowMatrix([[1.0]], index=['A'], columns=['A'])
+    with pytest.raises(ValueError):
+        flow_matrix * other
+
+
+def test_flow_matrix_select_and_column_access(flow_matrix):
+    sub = flow_matrix.select(index=['B'], columns=['A'])
+    assert sub.values.tolist() == [[3.0]]
+    assert flow_matrix['B'].tolist() == [2.0, 0.0]
+    with pytest.raises(KeyError):
+        flow_matrix.select(columns=['C'])
+
+
+def test_flow_matrix_pandas_round_trip():
+    dataframe = pd.DataFrame({'Category': ['Cat1', 'Cat2'], 'X': [1, 2], 'Y': [3.0, 4.0]})
+    matrix = FlowMatrix.from_pandas(dataframe, label_columns=['Category'])
+    assert matrix.shape == (2, 2)
+    pd.testing.assert_frame_equal(matrix.to_pandas(index_as_columns=True), dataframe, check_dtype=False)
@@ -122,6 +122,22 @@ def test_generate_fixed_dataframe(sample_flowbalancer):
     assert 'Totali' in corrected_df.columns, "'Totali' column must remain in the corrected DataFrame."
     # Additional numerical checks here depending on the sector_correction logic
 
+def test_generate_fixed_dataframe_unknown_correction_sector(sample_flowbalancer):
+    """
+    A correction sector that is not a column must raise, not be ignored.
+    """
+    fb = sample_flowbalancer
+    fb.sector_correction["2026"] = {"A": 1.1, "Typo": 0.9}
+
+    with pytest.raises(KeyError):
+        fb.generate_fixed_dataframe(
+            dataframe=fb.dataframe.copy(),
+            total_purchase='Totali',
+            total_sale='Totalj',
+            sell_sector_name='Setor',
+            correction_year='2026'
+        )
+
 def test_balance(sample_flowbalancer):
     """
     Test the 'balance' method to see if it converges and 
@@ -171,3 +187,22 @@ def test_generate_dataframe_forecast():
 # If you want to run tests from this file directly:
 if __name__ == "__main__":
     pytest.main()
+
+
+def test_flowbalancer_sector_array_round_trip(sample_dataframe):
+    """
+    A balancer built from a registry-aligned array gets the total row and
+    column, and to_sector_array lays its flows back on the registry axis.
+    """
+    import numpy as np
+    from matrices.registry import SectorRegistry
+
+    registry = SectorRegistry(["A", "Unused", "B"])
+    values = registry.align(sample_dataframe.iloc[:-1][["A", "B"]].to_numpy(), ["A", "B"])
+
+    fb = FlowBalancer.from_sector_array(values, ["A", "B"], {"2025": {"A": 1.0, "B": 1.0}}, "Setor",
+                                        sector_registry=registry)
+
+    assert fb.dataframe["Setor"].tolist() == ["A", "B", "Totalj"]
+    assert fb.dataframe["Totali"].tolist() == [10.0, 10.0, 20.0]
+    np.testing.assert_allclose(fb.to_sector_array(), values)
@@ -0,0 +1,50 @@
+import pytest
+
+from matrices.graph import MatrixGraph
+
+
+@pytest.fixture
+def graph():
+    graph = MatrixGraph()
+    graph.add('a', lambda: 2)
+    graph.add('b', lambda a: a * 3, ('a',))
+    graph.add('c', lambda a, b: a + b, ('a', 'b'))
+    graph.add('d', lambda: 10)
+    return graph
+
+
+def test_nodes_are_computed_once(graph):
+    assert graph['c'] == 8
+    assert graph['c'] == 8
+    assert graph['b'] == 6
+    assert dict(graph.computations) == {'a': 1, 'b': 1, 'c': 1}
+
+
+def test_invalidate_marks_dependents_dirty(graph):
+    graph['c'], graph['d']
+    graph.invalidate('b')
+
+    assert graph.is_dirty('b') and graph.is_dirty('c')
+    assert not graph.is_dirty('a') and not graph.is_dirty('d')
+    assert graph['c'] == 8
+    assert graph.computations['a'] == 1 and graph.computations['b'] == 2
+
+
+def test_unknown_nodes(graph):
+    with pytest.raises(KeyError):
+        graph['missing']
+    with pytest.raises(KeyError):
+        graph.add('e', lambda missing: missing, ('missing',))
+
+
+def test_version_change_marks_every_node_dirty():
+    version = [0]
+    graph = MatrixGraph(version=lambda: version[0])
+    graph.add('a', lambda: version[0])
+    graph.add('b', lambda a: a + 1, ('a',))
+    assert graph['b'] == 1
+
+    version[0] = 5
+    assert graph.is_dirty('a') and graph.is_dirty('b')
+    assert graph['b'] == 6
+    assert graph.computations['a'] == 2
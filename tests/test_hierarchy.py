@@ -0,0 +1,30 @@
+import numpy as np
+import scipy.sparse as sp
+
+from matrices.hierarchy import SectorHierarchy
+
+
+def test_indicator_groups_nodes_by_level():
+    hierarchy = SectorHierarchy([('A', 'a1', 'n'), ('A', 'a2', 'n'), ('B', 'b1', 'x')])
+    labels, indicator = hierarchy.indicator(0)
+    assert list(labels) == ['A', 'B']
+    assert indicator.toarray().tolist() == [[1, 1, 0], [0, 0, 1]]
+
+    labels, indicator = hierarchy.indicator(2)
+    assert list(labels) == ['n', 'x']
+    assert indicator.toarray().tolist() == [[1, 1, 0], [0, 0, 1]]
+
+
+def test_roll_up_sums_flows():
+    hierarchy = SectorHierarchy([('A', 'a1'), ('A', 'a2'), ('B', 'b1')])
+    fine = sp.csr_matrix(np.array([[1.0, 2.0, 3.0], [4.0, 0.0, 5.0], [6.0, 7.0, 0.0]]))
+    labels, rolled = hierarchy.roll_up(fine, 0)
+    assert list(labels) == ['A', 'B']
+    assert rolled.toarray().tolist() == [[7.0, 8.0], [13.0, 0.0]]
+
+
+def test_missing_labels_are_left_out():
+    hierarchy = SectorHierarchy([('A', None), ('A', 'a2')])
+    labels, indicator = hierarchy.indicator(1)
+    assert list(labels) == ['a2']
+    assert indicator.toarray().tolist() == [[0, 1]]
@@ -238,3 +238,52 @@ def test_calculate_value_matrix(sample_iom):
 # ----------------------------------------------------------------------
 if __name__ == "__main__":
     pytest.main(["-v"])
+
+
+def test_iom_arrays_aligned_to_sector_registry():
+    """
+    Test that registry-aligned arrays are accepted as input matrices and
+    that generate_iom_array lays the value matrix on the registry axis.
+    """
+    import numpy as np
+    from matrices.registry import SectorRegistry
+
+    registry = SectorRegistry(["S1", "S2"])
+    iom = InputOutputMatrix(
+        value_forecast_data={"productA": {2023: 200.0}},
+        quantity_forecast_data={"productA": {2023: 10.0}},
+        parametric_matrix_quantity={"productA": np.array([[0.1, 0.2], [0.3, 0.4]])},
+        price_formation_matrix={"productA": np.array([[1.0, 0.5], [2.0, 1.0]])},
+        sector_registry=registry,
+    )
+
+    result = iom.generate_iom_array("productA", 2023)
+    expected = (20.0 * np.array([[1.0, 0.5], [2.0, 1.0]])) * (10.0 * np.array([[0.1, 0.2], [0.3, 0.4]]))
+
+    np.testing.assert_allclose(result, expected)
+    np.testing.assert_allclose(iom.generate_iom("productA", 2023).to_numpy(), expected)
+
+
+def test_generate_iom_with_matrices_output():
+    """
+    Matrices outputs are labeled by their index: generate_iom must keep it,
+    and match quantity rows to price rows by label, not by position.
+    """
+    from matrices.matrices import Matrices
+
+    matrices = Matrices()
+    matrices.dataframe = pd.read_excel('tbextensa.xls', engine='xlrd')
+    pricing = matrices.format_pricing('AcaiFruto', 'Quantidade', 'Valor')
+    parametric = matrices.format_parametric('AcaiFruto')
+
+    iom = InputOutputMatrix(
+        value_forecast_data={"AcaiFruto": {2023: 200.0}},
+        quantity_forecast_data={"AcaiFruto": {2023: 10.0}},
+        parametric_matrix_quantity={"AcaiFruto": parametric.iloc[::-1]},
+        price_formation_matrix={"AcaiFruto": pricing},
+    )
+    result = iom.generate_iom("AcaiFruto", 2023)
+
+    expected = (20.0 * pricing) * (10.0 * parametric)
+    pd.testing.assert_index_equal(result.index, pricing.index)
+    pd.testing.assert_frame_equal(result, expected.loc[result.index, result.columns])
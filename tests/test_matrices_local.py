@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import pytest
+import numpy as np
 import pandas as pd
 from matrices.matrices_local import MatricesLocal
 
@@ -155,3 +156,136 @@ def test_format_pricing_with_location(matrices_local_instance):
         seller_location=seller_location
     )
     assert not result.empty  
+
+def test_location_fields_are_categorical(matrices_local_instance):
+    df = matrices_local_instance._table
+    assert df['LocalDoAgenteQueVende'].cat.categories.equals(df['LocalDoAgenteQueCompra'].cat.categories)
+
+def test_format_implicit_price_with_location_matches_separate_matrices(matrices_local_instance):
+    seller_location = 'Cametá'
+    quantity = matrices_local_instance.create_matrices(product='AcaiFruto', matrice_type='Quantidade', seller_location=seller_location).to_numpy()
+    value = matrices_local_instance.create_matrices(product='AcaiFruto', matrice_type='Valor', seller_location=seller_location).to_numpy()
+    result = matrices_local_instance.format_implicit_price(product='AcaiFruto', seller_location=seller_location)
+
+    nonzero = quantity != 0
+    assert (result.to_numpy()[nonzero] == value[nonzero] / quantity[nonzero]).all()
+
+def test_create_matrices_sparse_backend_with_location(matrices_local_instance):
+    kwargs = dict(product='AcaiFruto', matrice_type='Quantidade', seller_location='Cametá')
+    dense = matrices_local_instance.create_matrices(**kwargs)
+    sparse = matrices_local_instance.create_matrices(backend='sparse', **kwargs)
+    pd.testing.assert_frame_equal(dense, sparse.to_pandas(), check_dtype=False)
+
+def test_matrix_cache_is_keyed_by_location(sample_data):
+    instance = MatricesLocal(cache_size=8)
+    instance.dataframe = sample_data
+
+    by_seller = instance.format_quantity(product='AcaiFruto', seller_location='Cametá')
+    by_buyer = instance.format_quantity(product='AcaiFruto', buyer_location='Cametá')
+    assert instance.cache_info()['misses'] == 2
+    assert not by_seller.equals(by_buyer)
+
+    instance.format_pricing(product='AcaiFruto', seller_location='Cametá')
+    instance.format_pricing(product='AcaiFruto', seller_location='Cametá')
+    assert instance.cache_info()['hits'] == 2
+
+@pytest.mark.parametrize('backend', ['dense', 'sparse'])
+def test_location_tensor_slices_match_create_matrices(matrices_local_instance, backend):
+    tensor = matrices_local_instance.create_location_tensor(product='AcaiFruto', backend=backend)
+    for aggregate_method in ['sum', 'mean']:
+        for location in ['Cametá', 'Belém', 'NowhereLocation']:
+            for side in ['seller_location', 'buyer_location']:
+                expected = matrices_local_instance.create_matrices(product='AcaiFruto', matrice_type='Valor',
+                                                                   aggregate_method=aggregate_method, **{side: location})
+                result = tensor.matrix('Valor', aggregate_method=aggregate_method, **{side: location})
+                pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('backend', ['dense', 'sparse'])
+def test_location_tensor_seller_and_buyer_slice(matrices_local_instance, sample_data, backend):
+    tensor = matrices_local_instance.create_location_tensor(backend=backend)
+    subset = sample_data[(sample_data['LocalDoAgenteQueVende'] == 'Cametá') & (sample_data['LocalDoAgenteQueCompra'] == 'Belém')]
+
+    result = tensor.matrix('Quantidade', seller_location='Cametá', buyer_location='Belém')
+    expected = matrices_local_instance.create_matrices(matrice_type='Quantidade', df=subset, seller_location='Cametá')
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_location_tensor_rejects_median(matrices_local_instance):
+    tensor = matrices_local_instance.create_location_tensor(product='AcaiFruto')
+    assert tensor.sparse
+    with pytest.raises(ValueError):
+        tensor.matrix('Quantidade', seller_location='Cametá', aggregate_method='median')
+
+
+@pytest.mark.parametrize('side', ['seller', 'buyer'])
+def test_format_by_location_matches_single_location(matrices_local_instance, side):
+    for method in ['quantity', 'value', 'implicit_price', 'pricing']:
+        result = getattr(matrices_local_instance, f'format_{method}_by_location')(product='AcaiFruto', side=side)
+        assert len(result) > 1
+        for location, matrix in result.items():
+            expected = getattr(matrices_local_instance, f'format_{method}')(product='AcaiFruto', **{f'{side}_location': location})
+            pd.testing.assert_frame_equal(matrix, expected, check_dtype=False)
+
+
+def test_format_pricing_by_location_with_workers(matrices_local_instance):
+    expected = matrices_local_instance.format_pricing_by_location(product='AcaiFruto')
+    result = matrices_local_instance.format_pricing_by_location(product='AcaiFruto', n_workers=2)
+    assert list(result) == list(expected)
+    for location in expected:
+        pd.testing.assert_frame_equal(result[location], expected[location])
+
+
+def test_format_by_location_invalid_side(matrices_local_instance):
+    with pytest.raises(ValueError):
+        matrices_local_instance.format_quantity_by_location(product='AcaiFruto', side='middleman')
+
+
+def test_append_transactions_with_location(matrices_local_instance, sample_data):
+    instance = MatricesLocal()
+    instance.dataframe = sample_data.iloc[:800]
+    instance.append_transactions(sample_data.iloc[800:])
+
+    result = instance.create_matrices(matrice_type='Valor', seller_location='Cametá')
+    expected = matrices_local_instance.create_matrices(matrice_type='Valor', seller_location='Cametá')
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    by_location = instance.format_quantity_by_location(product='AcaiFruto', side='buyer')
+    expected_by_location = matrices_local_instance.format_quantity_by_location(product='AcaiFruto', side='buyer')
+    for location, matrix in expected_by_location.items():
+        pd.testing.assert_frame_equal(by_location[location], matrix, check_dtype=False)
+
+
+def test_append_transactions_keeps_missing_locations(sample_data):
+    rows = sample_data.index[sample_data['Produto'] == 'AcaiFruto'][:5]
+    sample_data.loc[rows, 'LocalDoAgenteQueCompra'] = None
+
+    expected = MatricesLocal()
+    expected.dataframe = sample_data
+    instance = MatricesLocal()
+    instance.dataframe = sample_data.iloc[:800]
+    instance.append_transactions(sample_data.iloc[800:])
+
+    pd.testing.assert_frame_equal(instance.create_matrices('AcaiFruto', 'Valor'),
+                                  expected.create_matrices('AcaiFruto', 'Valor'), check_dtype=False)
+
+
+def test_sector_array_by_location(matrices_local_instance, sample_data):
+    product = sample_data['Produto'].iloc[0]
+    registry = matrices_local_instance.sector_registry
+
+    array = matrices_local_instance.create_sector_array(product, 'Quantidade', seller_location='Cametá')
+    expected = matrices_local_instance.create_matrices(product, 'Quantidade', 'sum', insert_total=False, seller_location='Cametá')
+
+    assert array.shape == (len(registry), len(registry))
+    np.testing.assert_allclose(registry.select(array, expected.index, expected.columns), expected.to_numpy())
+
+
+def test_create_matrices_stacks_fields_by_location(matrices_local_instance, sample_data):
+    product = sample_data['Produto'].iloc[0]
+    tensor = matrices_local_instance.create_matrices(product, aggregate_method='mean', seller_location='Cametá',
+                                                     fields=['Quantidade', 'Valor'])
+
+    for field in ['Quantidade', 'Valor']:
+        expected = matrices_local_instance.create_matrices(product, field, 'mean', seller_location='Cametá')
+        pd.testing.assert_frame_equal(tensor.matrix(field), expected, check_dtype=False)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from matrices.quantile import GroupedQuantileSketch, QuantileSketch
+
+
+def test_sketch_is_exact_below_capacity():
+    values = np.random.default_rng(0).normal(size=150)
+    sketch = QuantileSketch(k=200).update(values)
+    assert sketch.is_exact
+    assert sketch.quantile(0.5) == pytest.approx(np.median(values))
+    assert sketch.quantile(0.9) == pytest.approx(np.quantile(values, 0.9))
+
+
+def test_sketch_rank_error_on_a_stream():
+    values = np.random.default_rng(1).lognormal(size=200_000)
+    sketch = QuantileSketch(QuantileSketch.k_for_error(0.01))
+    for chunk in np.array_split(values, 20):
+        sketch.update(chunk)
+
+    assert not sketch.is_exact
+    assert sketch.count == len(values)
+    for q in [0.1, 0.5, 0.9]:
+        assert abs((values <= sketch.quantile(q)).mean() - q) < 0.01
+
+
+def test_merged_sketches_cover_both_streams():
+    values = np.random.default_rng(2).uniform(size=100_000)
+    left = QuantileSketch(k=100).update(values[:50_000])
+    right = QuantileSketch(k=100).update(values[50_000:])
+    merged = left.merge(right)
+
+    assert merged.count == len(values)
+    assert abs((values <= merged.quantile(0.5)).mean() - 0.5) < 0.02
+
+
+def test_sketch_ignores_missing_values():
+    sketch = QuantileSketch().update([1.0, np.nan, 3.0])
+    assert sketch.count == 2
+    assert sketch.quantile(0.5) == 2.0
+    assert np.isnan(QuantileSketch().quantile(0.5))
+
+
+def test_invalid_quantile_and_error():
+    with pytest.raises(ValueError):
+        QuantileSketch().update([1.0]).quantile(1.5)
+    with pytest.raises(ValueError):
+        QuantileSketch.k_for_error(0)
+
+
+def test_grouped_sketch_matches_groupby_quantile():
+    df = pd.DataFrame({'seller': list('aabbb'), 'buyer': list('xxyyz'), 'value': [1.0, 3.0, 2.0, 4.0, 5.0]})
+    sketch = GroupedQuantileSketch(['seller', 'buyer'], 'value')
+    sketch.update(df.iloc[:3]).merge(GroupedQuantileSketch(['seller', 'buyer'], 'value').update(df.iloc[3:]))
+
+    expected = df.groupby(['seller', 'buyer'])['value'].median()
+    pd.testing.assert_series_equal(sketch.quantiles(0.5).sort_index(), expected)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from matrices.registry import SectorRegistry
+
+
+def test_positions_are_stable():
+    registry = SectorRegistry(['A', 'B'])
+    assert registry.register(['C', 'A', np.nan]).tolist() == [2, 0, -1]
+    assert registry.positions(['B', 'C']).tolist() == [1, 2]
+    assert list(registry.sectors) == ['A', 'B', 'C']
+
+    with pytest.raises(KeyError):
+        registry.positions(['D'])
+
+
+def test_align_lays_matrices_on_one_axis():
+    registry = SectorRegistry(['A', 'B', 'C'])
+    first = registry.align(pd.DataFrame([[1.0, 2.0], [3.0, 4.0]], index=['C', 'A'], columns=['C', 'A']))
+    second = registry.align(np.array([[5.0]]), ['B'])
+
+    assert first.tolist() == [[4.0, 0.0, 3.0], [0.0, 0.0, 0.0], [2.0, 0.0, 1.0]]
+    assert (first + second)[1, 1] == 5.0
+
+    stacked = registry.align(np.ones((2, 1, 1)), ['D'])
+    assert stacked.shape == (2, 4, 4)
+    assert stacked[:, 3, 3].tolist() == [1.0, 1.0]
+
+
+def test_arrays_aligned_before_new_sectors_are_padded():
+    registry = SectorRegistry(['A', 'B'])
+    aligned = registry.align(np.array([[1.0]]), ['B'])
+    registry.register(['C'])
+
+    assert registry.select(aligned, ['B', 'C']).tolist() == [[1.0, 0.0], [0.0, 0.0]]
+    assert registry.to_pandas(aligned).shape == (3, 3)
+
+    with pytest.raises(ValueError):
+        registry.to_pandas(np.zeros((4, 4)))
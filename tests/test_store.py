@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from matrices.flow_matrix import SparseFlowMatrix
+from matrices.matrices import Matrices
+from matrices.store import MatrixStore
+
+
+@pytest.fixture
+def matrices_instance():
+    instance = Matrices()
+    instance.dataframe = pd.read_excel('tbextensa.xls', engine='xlrd')
+    return instance
+
+
+def test_store_round_trip(tmp_path):
+    first = pd.DataFrame([[1.0, 2.0], [3.0, 4.0]], index=pd.Index(['A', 'B'], name='seller'), columns=pd.Index(['A', 'B'], name='buyer'))
+    second = SparseFlowMatrix.from_coordinates([0], [1], [5.0], ['X', 'Y'])
+
+    store = MatrixStore.write(str(tmp_path / 'store'), {'first': first, 'nested': {'second': second}})
+
+    assert store.keys() == ['first', ('nested', 'second')]
+    pd.testing.assert_frame_equal(store['first'], first)
+    pd.testing.assert_frame_equal(store['nested', 'second'], second.to_pandas(), check_names=False)
+
+
+def test_store_is_memory_mapped(tmp_path):
+    matrix = pd.DataFrame(np.arange(6.0).reshape(2, 3), index=['a', 'b'], columns=['x', 'y', 'z'])
+    MatrixStore.write(str(tmp_path / 'store'), {'matrix': matrix})
+
+    store = MatrixStore(str(tmp_path / 'store'))
+    assert isinstance(store.values, np.memmap)
+    assert np.shares_memory(store.array('matrix'), store.values)
+    with pytest.raises(KeyError):
+        store['missing']
+
+
+def test_save_product_matrices(matrices_instance, tmp_path):
+    store = matrices_instance.save_product_matrices(str(tmp_path / 'store'), ['AcaiFruto', 'CacauFruto'])
+
+    assert len(store) == 10
+    expected = matrices_instance.format_pricing('AcaiFruto', 'Quantidade', 'Valor')
+    pd.testing.assert_frame_equal(store['AcaiFruto', 'pricing'], expected, check_dtype=False)
+
+
+def test_rewrite_replaces_the_version(tmp_path):
+    path = str(tmp_path / 'store')
+    first = MatrixStore.write(path, {'matrix': pd.DataFrame([[1.0]], index=['a'], columns=['a'])})
+    second = MatrixStore.write(path, {'other': pd.DataFrame([[2.0, 3.0], [4.0, 5.0]], index=['a', 'b'], columns=['a', 'b'])})
+
+    assert first.version != second.version
+    assert first['matrix'].iloc[0, 0] == 1.0
+    assert sorted(os.listdir(path)) == ['index.json', f'values-{second.version}.npy']
+
+    store = MatrixStore(path)
+    assert store.version == second.version and store.keys() == ['other']
+    assert store['other'].loc['b', 'b'] == 5.0
+
+
+def test_missing_values_raise(tmp_path):
+    path = str(tmp_path / 'store')
+    store = MatrixStore.write(path, {'matrix': pd.DataFrame([[1.0]], index=['a'], columns=['a'])})
+    del store
+    os.remove(os.path.join(path, [name for name in os.listdir(path) if name.endswith('.npy')][0]))
+
+    with pytest.raises(FileNotFoundError):
+        MatrixStore(path)
+
+
+def test_write_keeps_newer_versions(tmp_path):
+    path = str(tmp_path / 'store')
+    os.makedirs(path)
+    newer = os.path.join(path, f"values-{'9' * 20}-00000000.npy")
+    np.save(newer, np.zeros(1))
+
+    store = MatrixStore.write(path, {'matrix': pd.DataFrame([[1.0]], index=['a'], columns=['a'])})
+    assert os.path.exists(newer)
+    assert sorted(os.listdir(path)) == sorted(['index.json', os.path.basename(newer), f'values-{store.version}.npy'])
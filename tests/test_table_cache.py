@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from matrices.matrices import Matrices
+from matrices.table_cache import cache_path, file_digest, read_table
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    path = tmp_path / 'tbextensa.xls'
+    shutil.copy('tbextensa.xls', path)
+    return str(path)
+
+
+def test_read_table_without_cache_does_not_write(table_path):
+    read_table(table_path)
+    assert not os.path.exists(cache_path(table_path, file_digest(table_path)))
+
+
+def test_read_table_writes_and_reuses_cache(table_path, monkeypatch):
+    first = read_table(table_path, use_cache=True)
+    assert os.path.exists(cache_path(table_path, file_digest(table_path)))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The source should not be parsed again.")
+
+    second = read_table(table_path, use_cache=True, reader=fail)
+    pd.testing.assert_frame_equal(first, second)
+    assert not [name for name in os.listdir(os.path.dirname(table_path)) if name.endswith('.tmp')]
+
+
+def test_read_table_rebuilds_unreadable_cache(table_path):
+    expected = read_table(table_path)
+    with open(cache_path(table_path, file_digest(table_path)), 'wb') as truncated:
+        truncated.write(b'PAR1')
+
+    with pytest.warns(UserWarning, match='rebuilding'):
+        result = read_table(table_path, use_cache=True)
+    pd.testing.assert_frame_equal(result, expected)
+    pd.testing.assert_frame_equal(read_table(table_path, use_cache=True), expected)
+
+
+def test_read_table_replaces_stale_cache(table_path, tmp_path):
+    read_table(table_path, use_cache=True)
+    stale = cache_path(table_path, file_digest(table_path))
+
+    shutil.copy('extensainsumos.xlsx', table_path)
+    read_table(table_path, use_cache=True)
+
+    assert not os.path.exists(stale)
+    assert os.path.exists(cache_path(table_path, file_digest(table_path)))
+
+
+def test_matrices_with_cache(table_path):
+    cold = Matrices(table_path=table_path, use_cache=True)
+    warm = Matrices(table_path=table_path, use_cache=True)
+    pd.testing.assert_frame_equal(cold.format_quantity('AcaiFruto'), warm.format_quantity('AcaiFruto'))